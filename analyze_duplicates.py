@@ -1,5 +1,57 @@
-import csv
+import argparse
+import sys
 from collections import Counter
+from dca_daemon import forward_to_daemon
+from dca_io import find_csv
+from dca_neardup import (BLOCK_PRESETS, DEFAULT_BLOCK_KEYS, DEFAULT_NORMALIZE, NORMALIZERS, find_near_duplicates,
+                         parse_block_key)
+from dca_profile import Profiler
+from dca_records import CSV_HEADER, key_string, load_records
+
+def report_duplicates(label, records, counter):
+    """Print duplicate statistics and every row of each duplicated ID"""
+    duplicates = {k: v for k, v in counter.items() if v > 1}
+
+    print(f"{label} file: {len(records)} total rows, {len(counter)} unique IDs")
+    print(f"{label} duplicates: {len(duplicates)} duplicate IDs, {sum(duplicates.values()) - len(duplicates)} extra rows")
+
+    # Group the rows of duplicated IDs in one pass instead of rescanning per ID
+    duplicate_rows = {}
+    for record in records:
+        key = record.key
+        if key in duplicates:
+            duplicate_rows.setdefault(key, []).append(record)
+
+    for duplicate_id, count in duplicates.items():
+        print(f"\nDuplicate {label} ID '{key_string(duplicate_id)}' appears {count} times:")
+        for record in duplicate_rows[duplicate_id]:
+            print(f"  Row {record.row_number}: \"xfdcawkFilename\":\"{record.filename}\", \"xfdcawkFiscalyear\":\"{record.fiscalyear}\"")
+
+def report_near_duplicates(label, records, options):
+    """Print clusters of near-duplicate rows with their similarity scores"""
+    clusters, stats = find_near_duplicates(records, options.normalize, options.block_key,
+                                           options.threshold, options.max_block)
+    variants = [cluster for cluster in clusters if not cluster.exact]
+    print(f"{label} file: {len(records)} rows, {stats['blocks']} blocks, {stats['pairs_scored']} pairs scored")
+    print(f"{label} near duplicates: {len(clusters)} clusters ({len(variants)} with differing keys)")
+    if stats['oversized_blocks']:
+        print(f"⚠️  {stats['oversized_blocks']} blocks larger than {options.max_block} rows were skipped")
+
+    for number, cluster in enumerate(variants if options.variants_only else clusters, 1):
+        kind = "exact key" if cluster.exact else "key variants"
+        print(f"\n{label} cluster {number}: {len(cluster.records)} rows, score {cluster.score:.2f}, "
+              f"{kind}, blocked on {', '.join(cluster.blocks)}")
+        for record in cluster.records:
+            print(f"  Row {record.row_number}: \"xfdcawkFilename\":\"{record.filename}\", "
+                  f"\"xfdcawkFiscalyear\":\"{record.fiscalyear}\", \"xfdcawkDepno\":\"{record.get('xfdcawkDepno')}\", "
+                  f"\"xfdcawkTotaldep\":\"{record.get('xfdcawkTotaldep')}\"")
+
+def analyze_near_duplicates(options):
+    """Near-duplicate clusters of both files, compared only within blocking keys"""
+    for label, base in (("PROD", 'xdcawk_2025_prod.csv'), ("TEST", 'xdcawk_2025_test.csv')):
+        print(f"=== NEAR DUPLICATES IN {label} FILE ===")
+        report_near_duplicates(label, list(load_records(find_csv(base))), options)
+        print()
 
 def analyze_duplicates_detailed():
     """
@@ -8,59 +60,19 @@ def analyze_duplicates_detailed():
     
     # Analyze PROD file duplicates
     print("=== ANALYZING PROD FILE DUPLICATES ===")
-    prod_ids = []
-    prod_rows = []
-    
-    with open('xdcawk_2025_prod.csv', 'r') as file:
-        reader = csv.DictReader(file)
-        for i, row in enumerate(reader):
-            prod_id = row['xfdcawkFilename'] + '|' + row['xfdcawkFiscalyear']
-            prod_id = prod_id.strip()
-            prod_ids.append(prod_id)
-            prod_rows.append((i+1, row, prod_id))
-    
-    prod_counter = Counter(prod_ids)
-    prod_duplicates = {k: v for k, v in prod_counter.items() if v > 1}
-    
-    print(f"PROD file: {len(prod_ids)} total rows, {len(set(prod_ids))} unique IDs")
-    print(f"PROD duplicates: {len(prod_duplicates)} duplicate IDs, {sum(prod_duplicates.values()) - len(prod_duplicates)} extra rows")
-    
-    # Show detailed duplicate info for PROD
-    for duplicate_id, count in prod_duplicates.items():
-        print(f"\nDuplicate PROD ID '{duplicate_id}' appears {count} times:")
-        for row_num, row, row_id in prod_rows:
-            if row_id == duplicate_id:
-                print(f"  Row {row_num}: \"xfdcawkFilename\":\"{row['xfdcawkFilename']}\", \"xfdcawkFiscalyear\":\"{row['xfdcawkFiscalyear']}\"")
+    prod_rows = list(load_records(find_csv('xdcawk_2025_prod.csv')))
+    prod_counter = Counter(record.key for record in prod_rows)
+    report_duplicates("PROD", prod_rows, prod_counter)
 
     # Analyze TEST file duplicates
     print("\n=== ANALYZING TEST FILE DUPLICATES ===")
-    test_ids = []
-    test_rows = []
-    
-    with open('xdcawk_2025_test.csv', 'r') as file:
-        reader = csv.DictReader(file)
-        for i, row in enumerate(reader):
-            test_id = row['xfdcawkFilename'] + '|' + row['xfdcawkFiscalyear']
-            test_id = test_id.strip()
-            test_ids.append(test_id)
-            test_rows.append((i+1, row, test_id))
-    
-    test_counter = Counter(test_ids)
-    test_duplicates = {k: v for k, v in test_counter.items() if v > 1}
-    
-    print(f"TEST file: {len(test_ids)} total rows, {len(set(test_ids))} unique IDs")
-    print(f"TEST duplicates: {len(test_duplicates)} duplicate IDs, {sum(test_duplicates.values()) - len(test_duplicates)} extra rows")
-    
-    # Show detailed duplicate info for TEST
-    for duplicate_id, count in test_duplicates.items():
-        print(f"\nDuplicate TEST ID '{duplicate_id}' appears {count} times:")
-        for row_num, row, row_id in test_rows:
-            if row_id == duplicate_id:
-                print(f"  Row {row_num}: \"xfdcawkFilename\":\"{row['xfdcawkFilename']}\", \"xfdcawkFiscalyear\":\"{row['xfdcawkFiscalyear']}\"")
+    test_rows = list(load_records(find_csv('xdcawk_2025_test.csv')))
+    test_counter = Counter(record.key for record in test_rows)
+    report_duplicates("TEST", test_rows, test_counter)
 
     # Calculate expected vs actual differences
-    unique_prod = len(set(prod_ids))
-    unique_test = len(set(test_ids))
+    unique_prod = len(prod_counter)
+    unique_test = len(test_counter)
     expected_diff = unique_prod - unique_test
     
     print(f"\n=== SUMMARY ===")
@@ -69,7 +81,7 @@ def analyze_duplicates_detailed():
     
     # Check for IDs that appear in both files but with different frequencies
     print(f"\n=== CHECKING FOR FREQUENCY MISMATCHES ===")
-    common_ids = set(prod_ids) & set(test_ids)
+    common_ids = prod_counter.keys() & test_counter.keys()
     frequency_mismatches = []
     
     for common_id in common_ids:
@@ -81,9 +93,50 @@ def analyze_duplicates_detailed():
     if frequency_mismatches:
         print(f"Found {len(frequency_mismatches)} IDs with different frequencies:")
         for id_val, p_count, t_count in frequency_mismatches:
-            print(f"  ID '{id_val}': PROD={p_count}, TEST={t_count}, diff={p_count - t_count}")
+            print(f"  ID '{key_string(id_val)}': PROD={p_count}, TEST={t_count}, diff={p_count - t_count}")
     else:
         print("No frequency mismatches found.")
 
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Detailed duplicate analysis of the PROD and TEST extracts")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    parser.add_argument('--near', action='store_true',
+                        help="report near-duplicate clusters (case/whitespace key variants, same deposit under another filename)")
+    parser.add_argument('--normalize', default=','.join(DEFAULT_NORMALIZE),
+                        help=f"comma-separated normalization steps from {', '.join(NORMALIZERS)} "
+                             f"(default {','.join(DEFAULT_NORMALIZE)})")
+    parser.add_argument('--block-key', action='append',
+                        help=f"blocking key: a preset ({', '.join(BLOCK_PRESETS)}) or fields joined with '+' "
+                             f"(repeatable; default {' and '.join(DEFAULT_BLOCK_KEYS)})")
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help="minimum similarity (0-1) for two rows to be linked (default 0.8)")
+    parser.add_argument('--max-block', type=int, default=100,
+                        help="skip blocks with more rows than this (default 100)")
+    parser.add_argument('--variants-only', action='store_true',
+                        help="only print clusters whose rows have differing keys")
+    args = parser.parse_args()
+    args.normalize = [step.strip() for step in args.normalize.split(',') if step.strip()]
+    args.block_key = args.block_key or list(DEFAULT_BLOCK_KEYS)
+    unknown = [step for step in args.normalize if step not in NORMALIZERS]
+    if unknown:
+        parser.error(f"unknown normalization step(s): {', '.join(unknown)}")
+    unknown = sorted({field for spec in args.block_key for field in parse_block_key(spec) if field not in CSV_HEADER})
+    if unknown:
+        parser.error(f"unknown blocking field(s): {', '.join(unknown)} (not in the extract header)")
+    return args
+
+def main(args):
+    with Profiler(enabled=args.profile).stage('analyze_duplicates'):
+        if args.near:
+            analyze_near_duplicates(args)
+        else:
+            analyze_duplicates_detailed()
+
 if __name__ == "__main__":
-    analyze_duplicates_detailed()
+    # A running dca_daemon.py answers from its warm record cache
+    exit_code = forward_to_daemon('analyze', sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+    main(parse_args())
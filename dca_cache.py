@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+DCA Page Cache
+Optional on-disk cache of raw query_table responses, so reruns during an
+investigation do not download every page again:
+
+- Entries are keyed by environment, resource, offset, limit and criteria and
+  stored gzip-compressed under .dca_cache/ with a small JSON header
+  (ETag, Last-Modified, time stored)
+- Within --cache-ttl seconds an entry is served without any request
+- Older entries are revalidated with If-None-Match/If-Modified-Since; a 304
+  serves the cached page and restarts its TTL, a 200 replaces it
+- When the cache grows past --cache-max-mb the least recently used entries
+  are evicted
+
+The cache is off unless --cache is given (or DCA_PAGE_CACHE=1 is set).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_DIR = '.dca_cache'
+DEFAULT_TTL = 900
+DEFAULT_MAX_MB = 512
+
+class PageCache:
+    """LRU, TTL-bounded store of raw response pages shared by the worker threads"""
+
+    def __init__(self, enabled=False, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_mb=DEFAULT_MAX_MB):
+        self._lock = threading.Lock()
+        self.configure(enabled, cache_dir, ttl, max_mb)
+
+    def configure(self, enabled, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_mb=DEFAULT_MAX_MB):
+        self.enabled = enabled
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = self.revalidated = self.misses = self.evicted = 0
+        self._size = None
+
+    def key(self, env, resource, params):
+        """Cache key of one page request"""
+        identity = json.dumps({'env': env, 'resource': resource, 'params': params}, sort_keys=True)
+        return hashlib.sha1(identity.encode()).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + '.json', base + '.gz'
+
+    def _load(self, key):
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with gzip.open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError, EOFError):
+            return None, None
+        os.utime(body_path)  # last use, for LRU eviction
+        return meta, body
+
+    def _write_meta(self, key, meta):
+        meta_path, _ = self._paths(key)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _store(self, key, response):
+        meta_path, body_path = self._paths(key)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        previous = sum(os.path.getsize(path) for path in (meta_path, body_path) if os.path.exists(path))
+        tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            f.write(response.content)
+        os.replace(tmp_path, body_path)
+        self._write_meta(key, {'etag': response.headers.get('ETag'),
+                               'last_modified': response.headers.get('Last-Modified'),
+                               'stored_at': time.time()})
+        added = os.path.getsize(meta_path) + os.path.getsize(body_path) - previous
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += added
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """(last use, size, key) of every stored entry"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.gz'):
+                    key = name[:-3]
+                    meta_path, body_path = self._paths(key)
+                    try:
+                        size = os.path.getsize(body_path) + os.path.getsize(meta_path)
+                        entries.append((os.path.getmtime(body_path), size, key))
+                    except OSError:
+                        continue
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is 10% under its limit"""
+        target = self.max_bytes * 0.9
+        for _, size, key in sorted(self._entries()):
+            if self._size <= target:
+                break
+            self._remove(key)
+            self._size -= size
+            self.evicted += 1
+
+    def discard(self, key):
+        """Drop one entry, e.g. a page whose body turned out to be unusable"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._remove(key)
+            self._size = None  # rescanned on the next store
+
+    def fetch(self, key, send):
+        """Raw page body for `key` and where it came from ('cache', 'revalidated' or 'network');
+        send(extra_headers) performs the GET, raising on HTTP errors, and returns the response"""
+        if not self.enabled:
+            return send({}).content, 'network'
+        meta, body = self._load(key)
+        if meta is not None and time.time() - meta['stored_at'] < self.ttl:
+            with self._lock:
+                self.hits += 1
+            return body, 'cache'
+
+        conditional = {}
+        if meta is not None:
+            if meta.get('etag'):
+                conditional['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                conditional['If-Modified-Since'] = meta['last_modified']
+        response = send(conditional)
+        if response.status_code == 304 and meta is not None:
+            meta['stored_at'] = time.time()
+            self._write_meta(key, meta)
+            with self._lock:
+                self.revalidated += 1
+            return body, 'revalidated'
+
+        self._store(key, response)
+        with self._lock:
+            self.misses += 1
+        return response.content, 'network'
+
+    def print_summary(self):
+        if self.enabled:
+            print(f"🗄️  Page cache: {self.hits} fresh hits, {self.revalidated} revalidated (304), "
+                  f"{self.misses} downloaded, {self.evicted} evicted")
+
+def add_cache_arguments(parser):
+    """Add the --cache options to a script's argument parser"""
+    parser.add_argument('--cache', action='store_true', default=os.getenv('DCA_PAGE_CACHE') == '1',
+                        help="serve pages from the on-disk page cache (also DCA_PAGE_CACHE=1)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"page cache directory (default {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                        help=f"seconds a cached page is used without revalidation (default {DEFAULT_TTL})")
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_MB,
+                        help=f"evict least recently used pages above this size (default {DEFAULT_MAX_MB})")
+
+def configure_cache(cache, args):
+    """Apply the parsed --cache options to a PageCache"""
+    cache.configure(args.cache, args.cache_dir, args.cache_ttl, args.cache_max_mb)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+DCA Columnar Snapshots
+A compact column-oriented snapshot format (.dcol) for the 31-column
+x-xfdcawk extracts. Rows are written in row groups; within a row group
+each column is stored as its own zlib-compressed chunk using the most
+compact encoding that round-trips every value exactly:
+- date:    YYYY-MM-DD values packed as int32 days since 1970-01-01
+- decimal: fixed-scale amounts such as 123.45 packed as int64 scaled integers
+- dict:    everything else (names, Y/N flags, keys) as a value dictionary
+           plus uint8/uint16/uint32 codes
+
+The footer records the offset of every chunk, so readers seek straight to
+the columns they need; dcawk_compare.py --columnar reads only
+xfdcawkFilename and xfdcawkFiscalyear from the TEST snapshot.
+
+Layout: MAGIC, chunks..., footer JSON, footer length (uint64 LE), MAGIC
+
+Usage:
+    python dca_columnar.py convert xdcawk_2025_prod.csv [xdcawk_2025_prod.dcol]
+    python dca_columnar.py info xdcawk_2025_prod.dcol
+    python dca_columnar.py export xdcawk_2025_prod.dcol out.csv [--columns a,b]
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+
+from dca_io import open_csv, strip_compression
+
+MAGIC = b'DCACOL1\n'
+ROW_GROUP_SIZE = 100000
+
+DATE_EPOCH = datetime.date(1970, 1, 1)
+DATE_NULL = -2 ** 31
+DECIMAL_NULL = -2 ** 63
+DECIMAL_PATTERN = re.compile(r'^-?\d+\.(\d+)$')
+
+def snapshot_path(csv_file):
+    """Columnar snapshot path that sits alongside a CSV artifact"""
+    base = strip_compression(csv_file)
+    return (base[:-4] if base.endswith('.csv') else base) + '.dcol'
+
+def snapshot_is_current(snapshot, csv_file):
+    """True if the snapshot exists and is no older than the CSV it mirrors"""
+    if not os.path.exists(snapshot):
+        return False
+    return not os.path.exists(csv_file) or os.path.getmtime(snapshot) >= os.path.getmtime(csv_file)
+
+def _to_le_bytes(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_le_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def _code_typecode(cardinality):
+    if cardinality <= 0xFF:
+        return 'B'
+    if cardinality <= 0xFFFF:
+        return 'H'
+    return 'I'
+
+def _encode_date(values):
+    days = array('i')
+    for value in values:
+        if value == '':
+            days.append(DATE_NULL)
+            continue
+        if len(value) != 10:
+            return None
+        try:
+            parsed = datetime.date.fromisoformat(value)
+        except ValueError:
+            return None
+        if parsed.isoformat() != value:
+            return None
+        days.append((parsed - DATE_EPOCH).days)
+    return {'encoding': 'date'}, _to_le_bytes(days)
+
+def _format_scaled(scaled, scale):
+    sign = '-' if scaled < 0 else ''
+    whole, fraction = divmod(abs(scaled), 10 ** scale)
+    return f"{sign}{whole}.{fraction:0{scale}d}"
+
+def _encode_decimal(values):
+    scale = None
+    scaled_values = array('q')
+    for value in values:
+        if value == '':
+            scaled_values.append(DECIMAL_NULL)
+            continue
+        match = DECIMAL_PATTERN.match(value)
+        if not match:
+            return None
+        value_scale = len(match.group(1))
+        if scale is None:
+            scale = value_scale
+        if value_scale != scale:
+            return None
+        scaled = int(value.replace('.', ''))
+        # Only exact round trips qualify (rejects leading zeros, "-0.00", overflow)
+        if abs(scaled) >= 2 ** 63 - 1 or _format_scaled(scaled, scale) != value:
+            return None
+        scaled_values.append(scaled)
+    if scale is None:
+        return None
+    return {'encoding': 'decimal', 'scale': scale}, _to_le_bytes(scaled_values)
+
+def _encode_dict(values):
+    dictionary = {}
+    codes = [dictionary.setdefault(value, len(dictionary)) for value in values]
+    typecode = _code_typecode(len(dictionary))
+    dictionary_bytes = json.dumps(list(dictionary)).encode('utf-8')
+    payload = struct.pack('<I', len(dictionary_bytes)) + dictionary_bytes + _to_le_bytes(array(typecode, codes))
+    return {'encoding': 'dict', 'codes': typecode, 'cardinality': len(dictionary)}, payload
+
+def encode_column(values):
+    """Encode one column chunk with the most compact exact encoding; returns (meta, payload)"""
+    if any(values):
+        for encoder in (_encode_date, _encode_decimal):
+            encoded = encoder(values)
+            if encoded is not None:
+                return encoded
+    return _encode_dict(values)
+
+def decode_column(meta, payload):
+    """Decode one column chunk back into a list of strings"""
+    encoding = meta['encoding']
+    if encoding == 'date':
+        return ['' if days == DATE_NULL else (DATE_EPOCH + datetime.timedelta(days=days)).isoformat()
+                for days in _from_le_bytes('i', payload)]
+    if encoding == 'decimal':
+        scale = meta['scale']
+        return ['' if scaled == DECIMAL_NULL else _format_scaled(scaled, scale)
+                for scaled in _from_le_bytes('q', payload)]
+    if encoding == 'dict':
+        (dictionary_length,) = struct.unpack_from('<I', payload)
+        dictionary = json.loads(payload[4:4 + dictionary_length].decode('utf-8'))
+        codes = _from_le_bytes(meta['codes'], payload[4 + dictionary_length:])
+        return [dictionary[code] for code in codes]
+    raise ValueError(f"Unknown column encoding: {encoding}")
+
+class ColumnarWriter:
+    """Writes rows (lists in `fields` order) to a .dcol snapshot, one row group at a time"""
+
+    def __init__(self, path, fields, row_group_size=ROW_GROUP_SIZE):
+        self.path = path
+        self.fields = list(fields)
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(MAGIC)
+        self._columns = [[] for _ in self.fields]
+        self._row_groups = []
+
+    def writerow(self, row):
+        for column, value in zip(self._columns, row):
+            column.append('' if value is None else str(value))
+        if len(self._columns[0]) >= self.row_group_size:
+            self._flush_row_group()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def _flush_row_group(self):
+        group_rows = len(self._columns[0])
+        if not group_rows:
+            return
+        columns = {}
+        for field, values in zip(self.fields, self._columns):
+            meta, payload = encode_column(values)
+            compressed = zlib.compress(payload, 6)
+            meta.update(offset=self._file.tell(), length=len(compressed))
+            self._file.write(compressed)
+            columns[field] = meta
+        self._row_groups.append({'rows': group_rows, 'columns': columns})
+        self.rows += group_rows
+        self._columns = [[] for _ in self.fields]
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._flush_row_group()
+        footer = json.dumps({'version': 1, 'fields': self.fields, 'rows': self.rows,
+                             'row_groups': self._row_groups}).encode('utf-8')
+        self._file.write(footer)
+        self._file.write(struct.pack('<Q', len(footer)))
+        self._file.write(MAGIC)
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp_path)
+
+def read_footer(f):
+    """Read and validate the footer of an open .dcol file"""
+    f.seek(0)
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{f.name} is not a DCA columnar snapshot")
+    f.seek(-(len(MAGIC) + 8), os.SEEK_END)
+    (footer_length,) = struct.unpack('<Q', f.read(8))
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{f.name} is truncated")
+    f.seek(-(len(MAGIC) + 8 + footer_length), os.SEEK_END)
+    return json.loads(f.read(footer_length).decode('utf-8'))
+
+def read_schema(path):
+    """Return (fields, total rows) of a snapshot"""
+    with open(path, 'rb') as f:
+        footer = read_footer(f)
+    return footer['fields'], footer['rows']
+
+def iter_row_groups(path, columns=None):
+    """Yield {field: values} for each row group, reading only the requested columns"""
+    with open(path, 'rb') as f:
+        footer = read_footer(f)
+        wanted = list(columns) if columns else footer['fields']
+        missing = [field for field in wanted if field not in footer['fields']]
+        if missing:
+            raise KeyError(f"Columns not in snapshot: {', '.join(missing)}")
+        for group in footer['row_groups']:
+            decoded = {}
+            for field in wanted:
+                meta = group['columns'][field]
+                f.seek(meta['offset'])
+                payload = zlib.decompress(f.read(meta['length']))
+                decoded[field] = decode_column(meta, payload)
+            yield decoded
+
+def iter_rows(path, columns=None):
+    """Yield row tuples containing only the requested columns"""
+    for group in iter_row_groups(path, columns):
+        yield from zip(*group.values())
+
+def read_rows_at(path, row_indices):
+    """Yield (row_index, row tuple) for the given row indices, decoding only the row groups that hold them"""
+    wanted = sorted(set(row_indices))
+    if not wanted:
+        return
+    with open(path, 'rb') as f:
+        footer = read_footer(f)
+        group_start = 0
+        position = 0
+        for group in footer['row_groups']:
+            group_end = group_start + group['rows']
+            in_group = []
+            while position < len(wanted) and wanted[position] < group_end:
+                in_group.append(wanted[position])
+                position += 1
+            if in_group:
+                columns = []
+                for field in footer['fields']:
+                    meta = group['columns'][field]
+                    f.seek(meta['offset'])
+                    columns.append(decode_column(meta, zlib.decompress(f.read(meta['length']))))
+                for row_index in in_group:
+                    yield row_index, tuple(column[row_index - group_start] for column in columns)
+            group_start = group_end
+
+def convert_csv(csv_file, dcol_file=None, row_group_size=ROW_GROUP_SIZE):
+    """Convert a (possibly compressed) CSV to a columnar snapshot; returns the snapshot path"""
+    dcol_file = dcol_file or snapshot_path(csv_file)
+    with open_csv(csv_file) as f:
+        reader = csv.reader(f)
+        fields = next(reader)
+        with ColumnarWriter(dcol_file, fields, row_group_size) as writer:
+            writer.writerows(reader)
+    return dcol_file
+
+def print_info(path):
+    """Print the schema, size and per-column encodings of a snapshot"""
+    with open(path, 'rb') as f:
+        footer = read_footer(f)
+    size = os.path.getsize(path)
+    print(f"📦 {path}: {footer['rows']} rows, {len(footer['row_groups'])} row group(s), {size:,} bytes")
+    for field in footer['fields']:
+        chunks = [group['columns'][field] for group in footer['row_groups']]
+        encodings = sorted({chunk['encoding'] for chunk in chunks})
+        stored = sum(chunk['length'] for chunk in chunks)
+        print(f"  {field:<28} {'/'.join(encodings):<16} {stored:>12,} bytes")
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="DCA columnar snapshot tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert', help="convert a CSV extract to a .dcol snapshot")
+    convert_parser.add_argument('csv_file')
+    convert_parser.add_argument('dcol_file', nargs='?')
+    info_parser = subparsers.add_parser('info', help="show snapshot schema and column encodings")
+    info_parser.add_argument('dcol_file')
+    export_parser = subparsers.add_parser('export', help="write a snapshot (or some of its columns) as CSV")
+    export_parser.add_argument('dcol_file')
+    export_parser.add_argument('csv_file')
+    export_parser.add_argument('--columns', help="comma-separated columns to export")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'convert':
+        output = convert_csv(args.csv_file, args.dcol_file)
+        print(f"✅ Wrote {output}")
+        print_info(output)
+    elif args.command == 'info':
+        print_info(args.dcol_file)
+    elif args.command == 'export':
+        columns = args.columns.split(',') if args.columns else read_schema(args.dcol_file)[0]
+        with open_csv(args.csv_file, 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(iter_rows(args.dcol_file, columns))
+        print(f"✅ Wrote {args.csv_file}")
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+DCA Worker Daemon
+Keeps the expensive state of the tools warm between runs, so follow-up
+questions after a workflow run answer in milliseconds instead of paying
+for a new interpreter, TLS connections, a token and re-parsed CSVs:
+
+- one HTTP session per environment; extracts run the query script's own
+  main() over it, so pooled keep-alive connections are reused
+- the parsed records of the latest extracts (dca_records.RECORD_CACHE)
+  for compare and analyze
+- open memory-mapped CSV indexes (dca_index.IndexCache) for lookup
+
+Everything is reloaded automatically when a CSV changes on disk. The
+daemon listens on a Unix socket in the working directory
+(.dca_daemon.sock, or DCA_DAEMON_SOCKET). While it is running,
+dcawk_compare.py, analyze_duplicates.py, dca_lookup.py and the query
+scripts (when run without options) act as thin clients: they send their
+arguments over the socket and print the streamed output. A command the
+daemon cannot serve (no API key in its environment or api_config.json,
+authentication failing) is declined before it prints anything, and the
+script runs locally instead. Set DCA_NO_DAEMON=1 to always run locally.
+
+Usage:
+    python dca_daemon.py serve &          # start in the directory holding the extracts
+    python dca_daemon.py status
+    python dca_daemon.py stop
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+
+DAEMON_SOCKET = '.dca_daemon.sock'
+FLUSH_BYTES = 8192
+FLUSH_SECONDS = 0.2
+
+def socket_path():
+    return os.getenv('DCA_DAEMON_SOCKET', DAEMON_SOCKET)
+
+class DaemonDeclined(Exception):
+    """Raised by a command, before it prints anything, when the caller should run it locally"""
+
+def forward_to_daemon(command, argv):
+    """Run a command in the daemon and print its output; None if no daemon is running or it declined"""
+    path = socket_path()
+    if os.getenv('DCA_NO_DAEMON') == '1' or not os.path.exists(path):
+        return None
+    try:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+    except OSError:
+        # A stale socket left by a daemon that did not shut down cleanly
+        return None
+    with connection, connection.makefile('rb') as replies:
+        connection.sendall((json.dumps({'command': command, 'argv': argv}) + '\n').encode('utf-8'))
+        for line in replies:
+            message = json.loads(line)
+            if 'out' in message:
+                sys.stdout.write(message['out'])
+                sys.stdout.flush()
+            elif 'exit' in message:
+                return message['exit']
+            elif 'decline' in message:
+                print(f"ℹ️  DCA daemon cannot run {command} ({message['decline']}); running locally")
+                return None
+    print("❌ The DCA daemon closed the connection before the command finished")
+    return 1
+
+class ReplyWriter(io.TextIOBase):
+    """stdout replacement that streams a command's output to the client in JSON lines"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.pending = []
+        self.size = 0
+        self.flushed = time.monotonic()
+        # The query scripts print from their worker threads
+        self.lock = threading.RLock()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        with self.lock:
+            self.pending.append(text)
+            self.size += len(text)
+            if self.size >= FLUSH_BYTES or time.monotonic() - self.flushed >= FLUSH_SECONDS:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        with self.lock:
+            if self.pending:
+                self.send({'out': ''.join(self.pending)})
+                self.pending = []
+                self.size = 0
+            self.flushed = time.monotonic()
+
+    def send(self, message):
+        with self.lock:
+            self.wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+class WarmState:
+    """Sessions, caches and indexes shared by every command the daemon runs"""
+
+    def __init__(self):
+        from dca_index import IndexCache
+        from dca_records import RECORD_CACHE
+        RECORD_CACHE.enabled = True
+        self.records = RECORD_CACHE
+        self.indexes = IndexCache()
+        self.sessions = {}
+        self.started = time.time()
+        self.commands = 0
+        # Commands swap sys.stdout and sys.argv, so they run one at a time
+        self.lock = threading.Lock()
+
+    def session(self, env, script):
+        """Warm page session of an environment's query script, created on first use"""
+        if env not in self.sessions:
+            from dca_transport import TunedSession
+            self.sessions[env] = TunedSession(pool_size=script.MAX_WORKERS, stats=script.TRANSPORT)
+        return self.sessions[env]
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
+        self.indexes.close()
+
+def parse_script_args(module, name, argv):
+    """Run a script's own parse_args() on the forwarded arguments"""
+    saved = sys.argv
+    sys.argv = [name] + list(argv)
+    try:
+        return module.parse_args()
+    finally:
+        sys.argv = saved
+
+def run_lookup(state, argv):
+    import dca_lookup
+    dca_lookup.main(parse_script_args(dca_lookup, 'dca_lookup.py', argv), indexes=state.indexes)
+
+def run_compare(state, argv):
+    import dcawk_compare
+    dcawk_compare.main(parse_script_args(dcawk_compare, 'dcawk_compare.py', argv))
+
+def run_analyze(state, argv):
+    import analyze_duplicates
+    analyze_duplicates.main(parse_script_args(analyze_duplicates, 'analyze_duplicates.py', argv))
+
+def run_extract(state, argv):
+    """Run a query script's own main() for one environment over the warm session"""
+    from dca_cache import PageCache, configure_cache
+    from dca_fingerprint import get_env_api_key
+    from dca_metrics import MetricsRecorder
+
+    parser = argparse.ArgumentParser(prog='extract')
+    parser.add_argument('env', choices=['prod', 'test'])
+    args = parser.parse_args(argv)
+    # A script that exits while it is being imported cannot be run here, but still runs locally
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        try:
+            script = importlib.import_module(f"dcawk_query_{args.env}")
+        except SystemExit:
+            raise DaemonDeclined(output.getvalue().strip().removeprefix('❌ ')
+                                 or f"dcawk_query_{args.env}.py exited while loading")
+
+    # The script would prompt for a missing key; only a key found without prompting is used here
+    api_key = get_env_api_key(args.env)
+    if not api_key:
+        raise DaemonDeclined(f"no {args.env} API key in the daemon's environment or api_config.json")
+    # Fresh per-run state, exactly as a new process would start with
+    script.METRICS = MetricsRecorder(args.env)
+    script.PAGE_CACHE = PageCache()
+    configure_cache(script.PAGE_CACHE, parse_script_args(script, f"dcawk_query_{args.env}.py", []))
+    script.TRANSPORT.reset()
+    script.RATE_LIMITER.configure(args.env, api_key)
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        try:
+            bearer_token = script.get_token(api_key)
+        except SystemExit:
+            raise DaemonDeclined(output.getvalue().strip().removeprefix('❌ ') or "authentication failed")
+
+    reused = args.env in state.sessions
+    print(f"♻️  Running dcawk_query_{args.env}.py in the DCA daemon ({'warm' if reused else 'new'} session)")
+    script.main(api_key=api_key, bearer_token=bearer_token, session=state.session(args.env, script))
+
+def run_status(state, argv):
+    print(f"🟢 DCA daemon pid {os.getpid()} serving {os.getcwd()}")
+    print(f"⏱️  Up {time.time() - state.started:.0f}s, {state.commands} command(s) served")
+    for env, session in sorted(state.sessions.items()):
+        print(f"🔌 {env.upper()} session warm ({session.stats.requests} request(s) "
+              f"over {session.stats.connections} connection(s) in the last extract)")
+    for path, rows in state.records.cached():
+        print(f"📄 {path}: {rows} records in memory")
+    for path in state.indexes.paths():
+        print(f"🗂️  {path}: index open")
+    print(f"📊 Record cache: {state.records.hits} hit(s), {state.records.loads} load(s)")
+
+COMMANDS = {
+    'lookup': run_lookup,
+    'compare': run_compare,
+    'analyze': run_analyze,
+    'extract': run_extract,
+    'status': run_status,
+}
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """One connection: a JSON request line in, streamed output and an exit code out"""
+
+    def handle(self):
+        request = json.loads(self.rfile.readline() or b'{}')
+        reply = ReplyWriter(self.wfile)
+        if request.get('command') == 'stop':
+            reply.send({'out': "🛑 DCA daemon stopping\n"})
+            reply.send({'exit': 0})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        command = COMMANDS.get(request.get('command'))
+        if command is None:
+            reply.send({'out': f"❌ Unknown command {request.get('command')!r}\n"})
+            reply.send({'exit': 2})
+            return
+        state = self.server.state
+        exit_code = 0
+        declined = None
+        with state.lock, contextlib.redirect_stdout(reply), contextlib.redirect_stderr(reply):
+            try:
+                command(state, request.get('argv', []))
+            except DaemonDeclined as e:
+                declined = str(e)
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if isinstance(e.code, str):
+                    print(e.code)
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+            state.commands += 1
+            reply.flush()
+        reply.send({'decline': declined} if declined is not None else {'exit': exit_code})
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve(path):
+    """Listen on the socket until stopped"""
+    if os.path.exists(path):
+        if forward_to_daemon('status', []) is not None:
+            print(f"❌ A DCA daemon is already listening on {path}")
+            sys.exit(1)
+        os.remove(path)
+    server = DaemonServer(path, DaemonHandler)
+    os.chmod(path, 0o600)
+    server.state = WarmState()
+    print(f"🟢 DCA daemon listening on {path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.state.close()
+        if os.path.exists(path):
+            os.remove(path)
+        print("🛑 DCA daemon stopped")
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Long-lived DCA worker with warm sessions, records and indexes")
+    parser.add_argument('action', choices=['serve', 'status', 'stop'])
+    parser.add_argument('--socket', help=f"socket path (default DCA_DAEMON_SOCKET or {DAEMON_SOCKET})")
+    return parser.parse_args()
+
+def main(args):
+    if args.socket:
+        os.environ['DCA_DAEMON_SOCKET'] = args.socket
+    if args.action == 'serve':
+        serve(socket_path())
+        return
+    exit_code = forward_to_daemon(args.action, [])
+    if exit_code is None:
+        print(f"⚪ No DCA daemon is running on {socket_path()}")
+        sys.exit(1)
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+DCA Multi-Resource Extraction
+Extracts several Ethos custom resources (see dca_resources.py) from one
+environment in a single run. All resources share one bearer token, one
+HTTP session/connection pool and one worker pool, so the concurrency
+budget is the same however many resources are requested:
+
+    python dca_extract.py --env prod x-xfdcawk x-xfdcawd x-xfdcawe
+
+The first page of each resource supplies its record count and, when the
+resource has no field list, its schema. Each resource is written to its
+own CSV in page order.
+"""
+
+import argparse
+import csv
+import math
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from dca_fingerprint import get_env_api_key
+from dca_io import csv_path, open_csv
+from dca_metrics import MetricsRecorder
+from dca_profile import Profiler
+from dca_ratelimit import THROTTLE_ATTEMPTS, RateLimiter
+from dca_resources import RESOURCES_FILE, infer_fields, record_row, resolve_resources
+from dca_trace import Tracer
+from dca_transport import TunedSession
+
+BASE_URL = "https://integrate.elluciancloud.com"
+PAGE_SIZE = 1000
+
+# Disabled unless --profile / --trace is given
+PROFILER = Profiler()
+TRACER = Tracer()
+
+class EthosClient:
+    """Shared Ethos session: one bearer token and connection pool for every worker"""
+
+    def __init__(self, api_key, metrics, limiter=None, pool_size=10, tracer=None, label=None, env=None):
+        self.api_key = api_key
+        self.metrics = metrics
+        # Host-wide tenant/environment budgets, plus the caller's own bucket if given
+        self.limiter = RateLimiter(env, api_key, local=limiter)
+        self.tracer = tracer or Tracer()
+        self.trace_args = {'tenant': label} if label else {}
+        # Pool sized to the workers sharing this client, gzip negotiated, reuse counted in self.transport
+        self.session = TunedSession(pool_size=pool_size)
+        self.transport = self.session.stats
+        self.session.headers.update({'content-type': 'application/json', 'Accept': 'application/json'})
+        self._token_lock = threading.Lock()
+        self.token = None
+
+    def authenticate(self, stale_token=None):
+        """Fetch a bearer token (once per expiry, however many workers notice the 401)"""
+        with self._token_lock:
+            if self.token is not None and self.token != stale_token:
+                return
+            with self.metrics.track('get_token') as sample, self.tracer.span('get_token', **self.trace_args):
+                response = self.limiter.send(lambda: self.session.post(f"{BASE_URL}/auth", timeout=30, headers={
+                    'Authorization': 'Basic ' + self.api_key, 'Content-Type': 'text/plain'}), sample=sample)
+                sample.observe_response(response)
+                response.raise_for_status()
+            self.token = response.text
+            self.session.headers['Authorization'] = f"Bearer {self.token}"
+
+    def request(self, method, path, operation, **kwargs):
+        """Rate-limited request; backs off on 429 and re-authenticates once if the token has expired"""
+        reauthenticated = False
+        for attempt in range(THROTTLE_ATTEMPTS):
+            token = self.token
+            self.limiter.acquire()
+            with self.metrics.track(operation) as sample:
+                sample.retries = attempt
+                response = self.session.request(method, f"{BASE_URL}{path}", timeout=60, **kwargs)
+                sample.observe_response(response)
+                retry = ((response.status_code == 401 and not reauthenticated)
+                         or (response.status_code == 429 and attempt + 1 < THROTTLE_ATTEMPTS))
+                if not retry:
+                    response.raise_for_status()
+            if not retry:
+                return response
+            if response.status_code == 429:
+                self.limiter.throttle(response)
+            else:
+                reauthenticated = True
+                self.authenticate(stale_token=token)
+
+    def get(self, path, operation, params=None):
+        return self.request('GET', path, operation, params=params)
+
+    def close(self):
+        self.session.close()
+        self.limiter.close()
+
+class ResourceRun:
+    """Schema, record count and fetched pages of one resource"""
+
+    def __init__(self, resource, client, env):
+        self.resource = resource
+        self.client = client
+        self.fields = resource.fields
+        self.output_file = csv_path(resource.output.format(env=env))
+        self.total_count = None
+        self.pages = 0
+        self.remaining = 0
+        self.batches = {}
+        self.failed_pages = []
+        self.unknown_fields = set()
+        self.record_count = 0
+        self.error = None
+
+    def fetch_page(self, page):
+        """Fetch one page of raw records"""
+        with TRACER.span('page_request', resource=self.resource.name, offset=page * PAGE_SIZE):
+            response = self.client.get(self.resource.path, f"query_{self.resource.name}",
+                                       {'limit': str(PAGE_SIZE), 'offset': str(page * PAGE_SIZE)})
+        with TRACER.span('decode', resource=self.resource.name, offset=page * PAGE_SIZE):
+            return response, response.json()
+
+    def build_rows(self, records):
+        """Convert raw records to CSV rows, noting fields the schema does not cover"""
+        for record in records:
+            self.unknown_fields.update(field for field in record if field not in self.fields)
+        return [record_row(record, self.fields) for record in records]
+
+    def start(self):
+        """Fetch the first page: record count, inferred schema (if needed) and the first batch"""
+        response, records = self.fetch_page(0)
+        self.total_count = int(response.headers['x-total-count'])
+        self.pages = self.remaining = math.ceil(self.total_count / PAGE_SIZE)
+        if self.fields is None:
+            self.fields = infer_fields(records)
+            print(f"🔎 {self.resource.name}: inferred {len(self.fields)} fields from the first page")
+        if self.pages:
+            self.batches[0] = self.build_rows(records)
+            self.remaining -= 1
+        return self.pages
+
+    def next_page(self, page):
+        """Fetch and convert one of the remaining pages"""
+        _, records = self.fetch_page(page)
+        return self.build_rows(records)
+
+    def write_output(self):
+        """Write the resource CSV in page order"""
+        with open_csv(self.output_file, 'w') as f_write, TRACER.span('csv_write', resource=self.resource.name):
+            csvwrite = csv.writer(f_write)
+            csvwrite.writerow(self.fields or [])
+            for page in range(self.pages):
+                if page in self.batches:
+                    csvwrite.writerows(self.batches[page])
+                    self.record_count += len(self.batches[page])
+        self.batches = {}
+
+def run_extraction(resources, client, env, workers=8):
+    """Extract every resource through one shared worker pool; returns the ResourceRuns"""
+    runs = [ResourceRun(resource, client, env) for resource in resources]
+
+    def finish(run):
+        if run.error is None:
+            run.write_output()
+        if run.unknown_fields:
+            dropped = sorted(run.unknown_fields)
+            print(f"⚠️  {run.resource.name}: {len(dropped)} field(s) not in the schema were dropped: "
+                  f"{', '.join(dropped[:5])}{', ...' if len(dropped) > 5 else ''}")
+        if run.error is not None:
+            print(f"❌ {run.resource.name}: {run.error}")
+        else:
+            print(f"✅ {run.resource.name}: {run.record_count}/{run.total_count} records written to {run.output_file}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(PROFILER.wrap(run.start)): (run, None) for run in runs}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                run, page = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if page is None:
+                        run.error = f"could not start extraction: {e}"
+                        finish(run)
+                        continue
+                    print(f"❌ {run.resource.name}: batch {page+1} failed: {e}")
+                    run.failed_pages.append(page)
+                    result = None
+
+                if page is None:
+                    print(f"📊 {run.resource.name}: {run.total_count} records, {run.pages} batches")
+                    for i in range(1, run.pages):
+                        pending[executor.submit(PROFILER.wrap(run.next_page), i)] = (run, i)
+                    if run.remaining == 0:
+                        finish(run)
+                    continue
+
+                if result is not None:
+                    run.batches[page] = result
+                run.remaining -= 1
+                if run.remaining == 0:
+                    finish(run)
+    return runs
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Extract several Ethos custom resources in one run")
+    parser.add_argument('resources', nargs='+', metavar='RESOURCE', help="resource names, e.g. x-xfdcawk")
+    parser.add_argument('--env', choices=['prod', 'test'], default='prod', help="environment (default prod)")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="worker pool and connection pool size shared by all resources (default 8)")
+    parser.add_argument('--resources-file', default=RESOURCES_FILE, help="resource definitions JSON file")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write a Chrome trace-event JSON timeline of this run to FILE")
+    return parser.parse_args()
+
+def main(args):
+    """Resolve the resources, authenticate once and extract them all"""
+    try:
+        resources = resolve_resources(args.resources, args.resources_file)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    api_key = get_env_api_key(args.env)
+    if not api_key:
+        print(f"❌ No {args.env} API key found (set ELLUCIAN_API_KEY_{args.env.upper()} or api_config.json)")
+        sys.exit(1)
+
+    print(f"🚀 Extracting {len(resources)} resource(s) from {args.env.upper()} with {args.workers} shared workers...")
+    start_time = time.time()
+    metrics = MetricsRecorder(f"extract_{args.env}")
+    client = EthosClient(api_key, metrics, pool_size=args.workers, tracer=TRACER, env=args.env)
+    try:
+        client.authenticate()
+        print("✅ Authentication successful")
+        runs = run_extraction(resources, client, args.env, args.workers)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Failed to get authentication token: {e}")
+        sys.exit(1)
+    finally:
+        client.close()
+
+    duration = time.time() - start_time
+    record_count = sum(run.record_count for run in runs)
+    print(f"\n🎉 Extraction completed!")
+    for run in runs:
+        status = "failed" if run.error else ("incomplete" if run.failed_pages else "complete")
+        print(f"📁 {run.resource.name}: {run.output_file} ({run.record_count} records, {status})")
+    print(f"⏱️  Total time: {duration:.2f} seconds")
+    print(f"🚀 Average speed: {record_count/duration:.1f} records/second")
+
+    client.transport.print_summary()
+    metrics.print_summary()
+    json_file, prom_file = metrics.write()
+    print(f"📈 Metrics written to {json_file} and {prom_file}")
+
+    if any(run.error or run.failed_pages for run in runs):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    args = parse_args()
+    PROFILER.enabled = args.profile
+    TRACER.enabled = bool(args.trace)
+    try:
+        with PROFILER.stage('extract'):
+            main(args)
+    finally:
+        if args.trace:
+            TRACER.write(args.trace)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+DCA Multi-Tenant Fan-Out
+Extracts x-xfdcawk for every college in the tenant registry
+(dca_tenants.json, see dca_tenants.py) concurrently:
+- One global worker pool shared by all tenants (--workers)
+- A token-bucket rate limiter per tenant, so one college's API budget is
+  never exceeded however many workers are free; each tenant only queues
+  as many pages as its rate can use, so a throttled college cannot tie up
+  the workers other colleges need
+- Per-tenant output, metrics and manifest under <output-dir>/<tenant>/
+- A combined summary (printed and written to dca_fanout_summary.json)
+
+Usage:
+    python dca_fanout.py [--tenants dca_tenants.json] [--only "Wake Tech"] [--workers 16]
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dca_extract import EthosClient
+from dca_fingerprint import file_digest
+from dca_io import csv_path, open_csv
+from dca_metrics import MetricsRecorder
+from dca_profile import Profiler
+from dca_ratelimit import TokenBucket
+from dca_records import CSV_HEADER
+from dca_tenants import TENANTS_FILE, load_tenants
+from dca_trace import Tracer
+from dcawk_query_prod import process_record
+
+RESOURCE_PATH = "/api/x-xfdcawk"
+PAGE_SIZE = 1000
+SUMMARY_FILE = 'dca_fanout_summary.json'
+
+# Disabled unless --profile / --trace is given
+PROFILER = Profiler()
+TRACER = Tracer()
+
+class TenantRun:
+    """Ethos client, rate limiter and fetched pages of one tenant's extraction"""
+
+    def __init__(self, tenant, output_dir):
+        self.tenant = tenant
+        self.output_dir = os.path.join(output_dir, tenant.slug)
+        self.limiter = TokenBucket(tenant.rate)
+        self.metrics = MetricsRecorder(f"fanout_{tenant.slug}")
+        self.total_count = None
+        self.pages = 0
+        self.remaining = 0
+        self.next_page = 0
+        self.inflight = 0
+        # Enough queued pages to use the tenant's full rate, but no more
+        self.max_inflight = max(2, math.ceil(tenant.rate))
+        self.client = EthosClient(tenant.api_key, self.metrics, self.limiter, pool_size=self.max_inflight,
+                                  tracer=TRACER, label=tenant.name)
+        self.batches = {}
+        self.failed_pages = []
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self.output_file = None
+        self.record_count = 0
+
+    def start(self):
+        """Authenticate and count; returns the number of pages to fetch"""
+        self.client.authenticate()
+        with TRACER.span('query_count', tenant=self.tenant.name):
+            response = self.client.get(RESOURCE_PATH, 'query_count', {'limit': '1'})
+        self.total_count = int(response.headers['x-total-count'])
+        self.pages = self.remaining = math.ceil(self.total_count / PAGE_SIZE)
+        return self.pages
+
+    def fetch_page(self, page):
+        """Fetch and convert one page of records"""
+        with TRACER.span('page_request', tenant=self.tenant.name, offset=page * PAGE_SIZE):
+            response = self.client.get(RESOURCE_PATH, 'query_table',
+                                       {'limit': str(PAGE_SIZE), 'offset': str(page * PAGE_SIZE)})
+            return [process_record(line) for line in response.json()]
+
+    def write_outputs(self):
+        """Write the tenant CSV in page order, its metrics and its manifest"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.error is None:
+            self.output_file = csv_path(os.path.join(self.output_dir, f"xdcawk_2025_{self.tenant.slug}.csv"))
+            with open_csv(self.output_file, 'w') as f_write, TRACER.span('csv_write', tenant=self.tenant.name):
+                csvwrite = csv.writer(f_write)
+                csvwrite.writerow(CSV_HEADER)
+                for page in range(self.pages):
+                    if page in self.batches:
+                        csvwrite.writerows(self.batches[page])
+                        self.record_count += len(self.batches[page])
+        self.batches = {}
+        self.finished = time.time()
+        self.metrics.write(self.output_dir)
+        self.client.close()
+
+        manifest = self.manifest()
+        tmp_file = os.path.join(self.output_dir, 'manifest.json.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_file, os.path.join(self.output_dir, 'manifest.json'))
+        return manifest
+
+    def status(self):
+        if self.error is not None:
+            return 'failed'
+        if self.failed_pages or self.record_count != self.total_count:
+            return 'incomplete'
+        return 'complete'
+
+    def manifest(self):
+        """Summary of this tenant's run, as written to manifest.json"""
+        operations = self.metrics.snapshot()['operations']
+        return {
+            'tenant': self.tenant.name,
+            'slug': self.tenant.slug,
+            'status': self.status(),
+            'error': self.error,
+            'started': datetime.datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'finished': datetime.datetime.fromtimestamp(self.finished).isoformat(timespec='seconds'),
+            'seconds': round(self.finished - self.started, 3),
+            'expected_records': self.total_count,
+            'records': self.record_count,
+            'pages': self.pages,
+            'failed_pages': sorted(self.failed_pages),
+            'output_file': self.output_file,
+            'sha256': file_digest(self.output_file) if self.output_file else None,
+            'rate_limit_per_sec': self.tenant.rate,
+            'rate_limit_wait_seconds': round(self.limiter.waited, 3),
+            'requests': sum(stats['count'] for stats in operations.values()),
+            'retries': sum(stats['retries'] for stats in operations.values()),
+        }
+
+def run_fanout(tenants, output_dir='tenants', workers=16):
+    """Extract every tenant over one shared pool; returns the list of tenant manifests"""
+    runs = [TenantRun(tenant, output_dir) for tenant in tenants]
+    manifests = []
+
+    def finish(run):
+        manifest = run.write_outputs()
+        manifests.append(manifest)
+        icon = {'complete': '✅', 'incomplete': '⚠️ ', 'failed': '❌'}[manifest['status']]
+        expected = manifest['expected_records'] if manifest['expected_records'] is not None else '?'
+        print(f"{icon} {run.tenant.name}: {manifest['records']}/{expected} records "
+              f"in {manifest['seconds']:.1f}s ({manifest['status']})")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(PROFILER.wrap(run.start)): (run, None) for run in runs}
+
+        def submit_pages(run):
+            # Cap each tenant's queued pages so a throttled tenant cannot park every shared worker on its limiter
+            while run.inflight < run.max_inflight and run.next_page < run.pages:
+                pending[executor.submit(PROFILER.wrap(run.fetch_page), run.next_page)] = (run, run.next_page)
+                run.next_page += 1
+                run.inflight += 1
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                run, page = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if page is None:
+                        run.error = str(e)
+                        print(f"❌ {run.tenant.name}: could not start extraction: {e}")
+                        finish(run)
+                        continue
+                    print(f"❌ {run.tenant.name}: batch {page+1} failed: {e}")
+                    run.failed_pages.append(page)
+                    result = None
+
+                if page is None:
+                    print(f"📊 {run.tenant.name}: {run.total_count} records, {run.pages} batches")
+                    submit_pages(run)
+                    if run.pages == 0:
+                        finish(run)
+                    continue
+
+                if result is not None:
+                    run.batches[page] = result
+                run.inflight -= 1
+                run.remaining -= 1
+                if run.remaining == 0:
+                    finish(run)
+                else:
+                    submit_pages(run)
+
+    manifests.sort(key=lambda manifest: manifest['tenant'])
+    return manifests
+
+def print_summary(manifests, duration):
+    """Print the combined per-tenant summary"""
+    print("\n=== FAN-OUT SUMMARY ===")
+    for manifest in manifests:
+        print(f"{manifest['tenant']:<32} {manifest['status']:<10} {manifest['records']:>9} records "
+              f"{manifest['seconds']:>8.1f}s {manifest['requests']:>6} requests "
+              f"{manifest['rate_limit_wait_seconds']:>7.1f}s throttled")
+    total_records = sum(manifest['records'] for manifest in manifests)
+    counts = {status: sum(1 for m in manifests if m['status'] == status)
+              for status in ('complete', 'incomplete', 'failed')}
+    print(f"\n🎉 {len(manifests)} tenant(s): {counts['complete']} complete, {counts['incomplete']} incomplete, "
+          f"{counts['failed']} failed")
+    print(f"📊 Total records: {total_records}")
+    print(f"⏱️  Total time: {duration:.2f} seconds")
+    if duration > 0:
+        print(f"🚀 Average speed: {total_records/duration:.1f} records/second")
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Extract x-xfdcawk for many college tenants concurrently")
+    parser.add_argument('--tenants', default=TENANTS_FILE, help="tenant registry JSON file")
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        help="extract only this tenant (repeatable)")
+    parser.add_argument('--workers', type=int, default=16,
+                        help="size of the worker pool shared by all tenants (default 16)")
+    parser.add_argument('--output-dir', default='tenants', help="directory for per-tenant outputs")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write a Chrome trace-event JSON timeline of this run to FILE")
+    return parser.parse_args()
+
+def main(args):
+    """Load the registry, run the fan-out and write the combined summary"""
+    try:
+        tenants = load_tenants(args.tenants, args.only)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if not tenants:
+        print("❌ No tenants to extract")
+        sys.exit(1)
+
+    print(f"🚀 Extracting {len(tenants)} tenant(s) with {args.workers} shared workers...")
+    start_time = time.time()
+    manifests = run_fanout(tenants, args.output_dir, args.workers)
+    duration = time.time() - start_time
+    print_summary(manifests, duration)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary_file = os.path.join(args.output_dir, SUMMARY_FILE)
+    with open(summary_file, 'w') as f:
+        json.dump({'duration_seconds': round(duration, 3), 'workers': args.workers, 'tenants': manifests}, f, indent=2)
+    print(f"📁 Summary written to {summary_file}")
+
+    if any(manifest['status'] != 'complete' for manifest in manifests):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    args = parse_args()
+    PROFILER.enabled = args.profile
+    TRACER.enabled = bool(args.trace)
+    try:
+        with PROFILER.stage('fanout'):
+            main(args)
+    finally:
+        if args.trace:
+            TRACER.write(args.trace)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+DCA Stage Fingerprints
+Records a fingerprint of each workflow stage's inputs and outputs so the
+orchestrator can skip stages whose inputs have not changed since the last
+successful run:
+- Extraction stages are fingerprinted by the remote x-total-count plus a
+  hash of a small sample page from the start and end of the resource
+- The compare stage is fingerprinted by the hashes of both CSV inputs
+- Every stage also records the hash of its own script and of its outputs
+"""
+
+import hashlib
+import json
+import os
+
+import requests
+
+from dca_ratelimit import RateLimiter
+
+STATE_FILE = '.dca_workflow_state.json'
+SAMPLE_SIZE = 25
+
+ENV_KEY_SETTINGS = {
+    'prod': ('ELLUCIAN_API_KEY_PROD', 'prod_api_key'),
+    'test': ('ELLUCIAN_API_KEY_TEST', 'test_api_key'),
+}
+
+def load_state(state_file=STATE_FILE):
+    """Load the fingerprints recorded by the last successful stages"""
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(state, state_file=STATE_FILE):
+    """Persist stage fingerprints atomically"""
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, state_file)
+
+def file_digest(filename):
+    """Return the SHA-256 of a file, or None if it does not exist"""
+    digest = hashlib.sha256()
+    try:
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+def get_env_api_key(env):
+    """Resolve an API key without prompting (environment first, then config file)"""
+    env_var, config_key = ENV_KEY_SETTINGS[env]
+    api_key = os.getenv(env_var) or os.getenv('ELLUCIAN_API_KEY')
+    if api_key:
+        return api_key
+
+    config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_config.json')
+    try:
+        with open(config_file, 'r') as f:
+            api_key = json.load(f).get(config_key)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return api_key.strip() if api_key and api_key.strip() else None
+
+def remote_fingerprint(env, sample_size=SAMPLE_SIZE):
+    """Fingerprint the remote x-xfdcawk resource: total count plus a sample page hash"""
+    api_key = get_env_api_key(env)
+    if not api_key:
+        raise RuntimeError(f"no {env} API key available without prompting")
+
+    limiter = RateLimiter(env, api_key)
+    try:
+        auth = limiter.send(lambda: requests.post("https://integrate.elluciancloud.com/auth",
+                                                  headers={'Authorization': 'Basic ' + api_key,
+                                                           'Content-Type': 'text/plain'},
+                                                  timeout=30))
+        auth.raise_for_status()
+
+        url = "https://integrate.elluciancloud.com/api/x-xfdcawk"
+        headers = {
+            'content-type': 'application/json',
+            'Accept': 'application/json',
+            "Authorization": f"Bearer {auth.text}"
+        }
+
+        with requests.Session() as session:
+            session.headers.update(headers)
+            first = limiter.send(lambda: session.get(url, params={"limit": str(sample_size), "offset": "0"}, timeout=30))
+            first.raise_for_status()
+            total_count = int(first.headers['x-total-count'])
+
+            sample = hashlib.sha256(first.content)
+            # The tail page catches appends that leave the first page untouched
+            if total_count > sample_size:
+                tail_offset = total_count - sample_size
+                last = limiter.send(lambda: session.get(url, params={"limit": str(sample_size),
+                                                                     "offset": str(tail_offset)}, timeout=30))
+                last.raise_for_status()
+                sample.update(last.content)
+    finally:
+        limiter.close()
+
+    return {'total_count': total_count, 'sample_sha256': sample.hexdigest()}
+
+def output_digests(outputs):
+    """Map each output file to its current digest"""
+    return {filename: file_digest(filename) for filename in outputs}
+
+def stage_is_current(state, stage, inputs, outputs):
+    """Return (is_current, reason) comparing the current fingerprint with the recorded one"""
+    recorded = state.get(stage)
+    if not recorded:
+        return False, "no previous successful run recorded"
+    if recorded.get('inputs') != inputs:
+        return False, "inputs changed since last successful run"
+
+    recorded_outputs = recorded.get('outputs', {})
+    for filename, digest in output_digests(outputs).items():
+        if digest is None:
+            return False, f"output {filename} is missing"
+        if recorded_outputs.get(filename) != digest:
+            return False, f"output {filename} was modified since last successful run"
+
+    return True, f"fingerprint matches run from {recorded.get('completed', 'unknown time')}"
+
+def record_stage(state, stage, inputs, outputs, completed):
+    """Record the fingerprint of a stage that just completed successfully"""
+    state[stage] = {
+        'inputs': inputs,
+        'outputs': output_digests(outputs),
+        'completed': completed,
+    }
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+DCA Financial Reconciliation
+Checks whether the dollars match, not just the keys: PROD and TEST are
+each streamed once and summed per group of institution × fiscal year ×
+fiscal period × processed flag, and the groups whose row counts or totals
+differ are reported.
+
+- Amounts are parsed into scaled integers (cents), so sums are exact;
+  values with more decimal places than --scale are rounded half-even and
+  counted, unparseable values are counted and treated as zero
+- Counts and sums live in flat array('q') accumulators indexed by group
+  number, so memory grows with the number of groups, never with the
+  number of rows; each file is read once, row by row
+
+Usage:
+    python dca_finrecon.py                       # after both extractions
+    python dca_finrecon.py --group-by xfdcawkInstname,xfdcawkFiscalyear
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+from array import array
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+
+from dca_io import csv_path, find_csv, open_csv
+from dca_profile import Profiler
+
+AMOUNT_FIELDS = ('xfdcawkTotaldep', 'xfdcawkTotalrev', 'xfdcawkCaprefund', 'xfdcawkCurrefund', 'xfdcawkPyrlrefund')
+GROUP_FIELDS = ('xfdcawkInstname', 'xfdcawkFiscalyear', 'xfdcawkFiscalperiod', 'xfdcawkIsprocessed')
+REPORT_FILE = 'dca_finrecon.csv'
+SIMPLE_AMOUNT = re.compile(r'^-?\d*(\.\d*)?$')
+
+class AmountParser:
+    """Converts amount strings into integers scaled by 10**scale, counting inexact and bad values"""
+
+    def __init__(self, scale=2):
+        self.scale = scale
+        self.quantum = Decimal(1).scaleb(-scale)
+        self.rounded = 0
+        self.invalid = 0
+
+    def parse(self, text):
+        text = text.strip()
+        if not text:
+            return 0
+        if SIMPLE_AMOUNT.match(text) and text not in ('-', '.', '-.'):
+            whole, _, fraction = text.partition('.')
+            if len(fraction) <= self.scale:
+                negative = whole.startswith('-')
+                value = int(whole.lstrip('-') or '0') * 10 ** self.scale + int(fraction.ljust(self.scale, '0') or '0')
+                return -value if negative else value
+        try:
+            amount = Decimal(text)
+            scaled = amount.quantize(self.quantum, rounding=ROUND_HALF_EVEN)
+        except (InvalidOperation, ValueError):
+            self.invalid += 1
+            return 0
+        if scaled != amount:
+            self.rounded += 1
+        return int(scaled.scaleb(self.scale))
+
+    def format(self, value):
+        """Scaled integer back to a decimal string"""
+        sign = '-' if value < 0 else ''
+        whole, fraction = divmod(abs(value), 10 ** self.scale)
+        return f"{sign}{whole}.{fraction:0{self.scale}d}" if self.scale else f"{sign}{whole}"
+
+class GroupTotals:
+    """Per-group row counts and amount sums of both environments in flat int64 arrays"""
+
+    def __init__(self, group_fields=GROUP_FIELDS, amount_fields=AMOUNT_FIELDS, parser=None):
+        self.group_fields = group_fields
+        self.amount_fields = amount_fields
+        self.parser = parser or AmountParser()
+        self.groups = {}
+        self.labels = []
+        # Per environment: counts[group], sums[group * len(amount_fields) + field]
+        self.counts = {'prod': array('q'), 'test': array('q')}
+        self.sums = {'prod': array('q'), 'test': array('q')}
+        self.rows = {'prod': 0, 'test': 0}
+
+    def group_number(self, label):
+        number = self.groups.get(label)
+        if number is None:
+            number = self.groups[label] = len(self.labels)
+            self.labels.append(label)
+            zeros = array('q', [0] * len(self.amount_fields))
+            for env in self.counts:
+                self.counts[env].append(0)
+                self.sums[env].extend(zeros)
+        return number
+
+    def add_file(self, env, path):
+        """Stream one extract into the accumulators of `env`"""
+        counts, sums, parse = self.counts[env], self.sums[env], self.parser.parse
+        width = len(self.amount_fields)
+        with open_csv(path) as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            missing = [field for field in self.group_fields + self.amount_fields if field not in header]
+            if missing:
+                raise ValueError(f"{path} has no column(s) {', '.join(missing)}")
+            group_positions = [header.index(field) for field in self.group_fields]
+            amount_positions = [header.index(field) for field in self.amount_fields]
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) < len(header):
+                    row.extend([''] * (len(header) - len(row)))
+                number = self.group_number(tuple(row[position].strip() for position in group_positions))
+                counts[number] += 1
+                base = number * width
+                for offset, position in enumerate(amount_positions):
+                    sums[base + offset] += parse(row[position])
+                self.rows[env] += 1
+
+    def differences(self):
+        """(label, prod count, test count, [(prod sum, test sum)] per amount) of every group that differs"""
+        width = len(self.amount_fields)
+        differing = []
+        for number, label in enumerate(self.labels):
+            base = number * width
+            pairs = [(self.sums['prod'][base + offset], self.sums['test'][base + offset]) for offset in range(width)]
+            prod_count, test_count = self.counts['prod'][number], self.counts['test'][number]
+            if prod_count != test_count or any(prod != test for prod, test in pairs):
+                differing.append((label, prod_count, test_count, pairs))
+        differing.sort(key=lambda item: item[0])
+        return differing
+
+    def totals(self, env):
+        """Grand total of each amount field for one environment"""
+        width = len(self.amount_fields)
+        sums = self.sums[env]
+        return [sum(sums[offset::width]) for offset in range(width)]
+
+def write_report(path, totals, differing):
+    """One row per differing group: counts plus PROD, TEST and difference of every amount"""
+    fmt = totals.parser.format
+    with open_csv(path, 'w') as f:
+        writer = csv.writer(f)
+        header = list(totals.group_fields) + ['prod_count', 'test_count']
+        for field in totals.amount_fields:
+            header += [f"{field}_prod", f"{field}_test", f"{field}_diff"]
+        writer.writerow(header)
+        for label, prod_count, test_count, pairs in differing:
+            row = list(label) + [prod_count, test_count]
+            for prod, test in pairs:
+                row += [fmt(prod), fmt(test), fmt(prod - test)]
+            writer.writerow(row)
+
+def print_report(totals, differing, limit):
+    fmt = totals.parser.format
+    short = [field.replace('xfdcawk', '') for field in totals.amount_fields]
+    print(f"📊 PROD: {totals.rows['prod']} rows, TEST: {totals.rows['test']} rows, {len(totals.labels)} groups")
+    for env in ('prod', 'test'):
+        print(f"💰 {env.upper()} totals: " + ", ".join(f"{name}={fmt(value)}"
+                                                    for name, value in zip(short, totals.totals(env))))
+    if totals.parser.rounded or totals.parser.invalid:
+        print(f"⚠️  {totals.parser.rounded} amount(s) rounded to {totals.parser.scale} decimals, "
+              f"{totals.parser.invalid} unparseable amount(s) counted as zero")
+    if not differing:
+        print("✅ Every group matches: counts and totals are identical")
+        return
+    print(f"❌ {len(differing)} of {len(totals.labels)} groups differ:")
+    for label, prod_count, test_count, pairs in differing[:limit]:
+        details = [f"count {prod_count} vs {test_count}"] if prod_count != test_count else []
+        details += [f"{name} {fmt(prod)} vs {fmt(test)} (diff {fmt(prod - test)})"
+                    for name, (prod, test) in zip(short, pairs) if prod != test]
+        print(f"  {' | '.join(label)}: {'; '.join(details)}")
+    if len(differing) > limit:
+        print(f"  ... {len(differing) - limit} more in the report file")
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Reconcile grouped counts and dollar totals between PROD and TEST")
+    parser.add_argument('--prod-file', help="PROD extract (default xdcawk_2025_prod.csv)")
+    parser.add_argument('--test-file', help="TEST extract (default xdcawk_2025_test.csv)")
+    parser.add_argument('--group-by', default=','.join(GROUP_FIELDS),
+                        help=f"comma-separated grouping columns (default {','.join(GROUP_FIELDS)})")
+    parser.add_argument('--scale', type=int, default=2, help="decimal places kept exactly (default 2)")
+    parser.add_argument('--output', help=f"report CSV of differing groups (default {REPORT_FILE})")
+    parser.add_argument('--limit', type=int, default=50, help="differing groups to print (default 50)")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    return parser.parse_args()
+
+def main(args):
+    prod_file = args.prod_file or find_csv('xdcawk_2025_prod.csv')
+    test_file = args.test_file or find_csv('xdcawk_2025_test.csv')
+    for path in (prod_file, test_file):
+        if not os.path.exists(path):
+            print(f"❌ {path} not found; run the extractions first")
+            sys.exit(1)
+    group_fields = tuple(field.strip() for field in args.group_by.split(',') if field.strip())
+    totals = GroupTotals(group_fields, AMOUNT_FIELDS, AmountParser(args.scale))
+    try:
+        totals.add_file('prod', prod_file)
+        totals.add_file('test', test_file)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    differing = totals.differences()
+    print_report(totals, differing, args.limit)
+    output = args.output or csv_path(REPORT_FILE)
+    write_report(output, totals, differing)
+    print(f"📁 Reconciliation report written to {output}")
+
+if __name__ == "__main__":
+    args = parse_args()
+    with Profiler(enabled=args.profile).stage('finrecon'):
+        main(args)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+DCA Run History
+Appends a summary of every dca_workflow.py run to a local SQLite database
+(dca_run_history.db) so performance can be tracked across runs:
+- Per-stage status, duration, record count, rows/sec, requests and retries
+- Record counts, difference counts and expected vs. actual differences
+
+Usage:
+    python dca_history.py report [--threshold 0.25] [--window 5] [--estimate]
+
+The report flags runs whose stage throughput dropped more than the
+threshold below the rolling baseline (mean of the previous --window runs
+of that stage) and, with --estimate, predicts the next run's extraction
+time from the current remote record count.
+"""
+
+import argparse
+import json
+from contextlib import closing
+import os
+import sqlite3
+import sys
+
+HISTORY_DB = 'dca_run_history.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started TEXT NOT NULL,
+    finished TEXT NOT NULL,
+    forced INTEGER NOT NULL,
+    prod_records INTEGER,
+    test_records INTEGER,
+    diff_count INTEGER,
+    expected_diff INTEGER,
+    matches_expected INTEGER
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    seconds REAL,
+    records INTEGER,
+    rows_per_sec REAL,
+    requests INTEGER,
+    retries INTEGER,
+    PRIMARY KEY (run_id, stage)
+);
+"""
+
+def connect(db_file=HISTORY_DB):
+    """Open the history database, creating the schema if needed"""
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+def load_request_metrics(job, since):
+    """Return (requests, retries) from dca_metrics_<job>.json if written after `since`"""
+    metrics_file = os.path.join(os.getenv('DCA_METRICS_DIR') or '.', f"dca_metrics_{job}.json")
+    try:
+        if os.path.getmtime(metrics_file) < since:
+            return None, None
+        with open(metrics_file, 'r') as f:
+            operations = json.load(f).get('operations', {})
+    except (OSError, json.JSONDecodeError):
+        return None, None
+    requests_made = sum(stats.get('count', 0) for stats in operations.values())
+    retries = sum(stats.get('retries', 0) for stats in operations.values())
+    return requests_made, retries
+
+def record_run(run, db_file=HISTORY_DB):
+    """Append one workflow run (as built by dca_workflow.py) and return its id"""
+    # closing() closes the connection; the inner `with conn` commits or rolls back
+    with closing(connect(db_file)) as conn, conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (started, finished, forced, prod_records, test_records,"
+            " diff_count, expected_diff, matches_expected) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (run['started'], run['finished'], int(run['forced']), run.get('prod_records'),
+             run.get('test_records'), run.get('diff_count'), run.get('expected_diff'),
+             None if run.get('matches_expected') is None else int(run['matches_expected'])))
+        run_id = cursor.lastrowid
+        for stage, result in run['stages'].items():
+            seconds = result.get('seconds')
+            records = result.get('records')
+            rows_per_sec = records / seconds if records and seconds else None
+            conn.execute(
+                "INSERT INTO stages (run_id, stage, status, seconds, records, rows_per_sec, requests, retries)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, stage, result['status'], seconds, records, rows_per_sec,
+                 result.get('requests'), result.get('retries')))
+    return run_id
+
+def stage_history(conn, stage):
+    """All completed runs of a stage with a measured throughput, oldest first"""
+    return conn.execute(
+        "SELECT runs.id AS run_id, runs.started, stages.seconds, stages.records, stages.rows_per_sec,"
+        " stages.retries FROM stages JOIN runs ON runs.id = stages.run_id"
+        " WHERE stages.stage = ? AND stages.status = 'ran' AND stages.rows_per_sec IS NOT NULL"
+        " ORDER BY runs.id", (stage,)).fetchall()
+
+def find_regressions(conn, threshold=0.25, window=5, run_id=None):
+    """Return stage runs whose throughput fell more than `threshold` below the rolling baseline"""
+    regressions = []
+    stages = [row['stage'] for row in conn.execute("SELECT DISTINCT stage FROM stages ORDER BY stage")]
+    for stage in stages:
+        history = stage_history(conn, stage)
+        for index, row in enumerate(history):
+            previous = history[max(0, index - window):index]
+            if not previous or (run_id is not None and row['run_id'] != run_id):
+                continue
+            baseline = sum(p['rows_per_sec'] for p in previous) / len(previous)
+            if row['rows_per_sec'] < baseline * (1 - threshold):
+                regressions.append({
+                    'run_id': row['run_id'],
+                    'started': row['started'],
+                    'stage': stage,
+                    'rows_per_sec': row['rows_per_sec'],
+                    'baseline': baseline,
+                    'drop': 1 - row['rows_per_sec'] / baseline,
+                })
+    return regressions
+
+def estimate_duration(conn, stage, record_count, window=5):
+    """Estimate seconds to extract `record_count` rows from the stage's rolling baseline"""
+    history = stage_history(conn, stage)[-window:]
+    if not history:
+        return None
+    baseline = sum(row['rows_per_sec'] for row in history) / len(history)
+    return record_count / baseline
+
+def print_regressions(regressions, threshold):
+    """Print flagged regressions"""
+    if not regressions:
+        print(f"✅ No throughput drops beyond {threshold:.0%} of the rolling baseline")
+        return
+    for item in regressions:
+        print(f"⚠️  Run {item['run_id']} ({item['started']}) {item['stage']}: "
+              f"{item['rows_per_sec']:.1f} rows/sec vs baseline {item['baseline']:.1f} "
+              f"({item['drop']:.0%} slower)")
+
+def report(args):
+    """Print recent runs, throughput regressions and optional duration estimates"""
+    if not os.path.exists(args.db):
+        print(f"❌ No run history found at {args.db}")
+        sys.exit(1)
+
+    with closing(connect(args.db)) as conn:
+        print("=== RECENT RUNS ===")
+        runs = conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (args.limit,)).fetchall()
+        for run in reversed(runs):
+            status = "MATCH" if run['matches_expected'] else "MISMATCH"
+            print(f"Run {run['id']} {run['started']}: PROD {run['prod_records']}, TEST {run['test_records']}, "
+                  f"diff {run['diff_count']} (expected {run['expected_diff']}, {status})")
+            for stage in conn.execute("SELECT * FROM stages WHERE run_id = ? ORDER BY rowid", (run['id'],)):
+                line = f"    {stage['stage']}: {stage['status']}"
+                if stage['seconds'] is not None:
+                    line += f", {stage['seconds']:.1f}s"
+                if stage['rows_per_sec'] is not None:
+                    line += f", {stage['rows_per_sec']:.1f} rows/sec"
+                if stage['retries']:
+                    line += f", {stage['retries']} retries"
+                print(line)
+
+        print(f"\n=== THROUGHPUT REGRESSIONS (threshold {args.threshold:.0%}, window {args.window}) ===")
+        print_regressions(find_regressions(conn, args.threshold, args.window), args.threshold)
+
+        if args.estimate:
+            # Imported lazily: the estimate is the only part of the report that touches the network
+            from dca_fingerprint import remote_fingerprint
+            print("\n=== NEXT RUN ESTIMATE ===")
+            for stage, env in (('dcawk_query_prod.py', 'prod'), ('dcawk_query_test.py', 'test')):
+                try:
+                    record_count = remote_fingerprint(env)['total_count']
+                except Exception as e:
+                    print(f"⚠️  {stage}: could not read remote record count ({e})")
+                    continue
+                seconds = estimate_duration(conn, stage, record_count, args.window)
+                if seconds is None:
+                    print(f"⚠️  {stage}: no throughput history yet")
+                else:
+                    print(f"⏱️  {stage}: {record_count} records, estimated {seconds:.1f} seconds")
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="DCA workflow run history")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    report_parser = subparsers.add_parser('report', help="show runs and flag throughput regressions")
+    report_parser.add_argument('--db', default=HISTORY_DB, help="history database file")
+    report_parser.add_argument('--threshold', type=float, default=0.25,
+                               help="flag drops larger than this fraction of the baseline (default 0.25)")
+    report_parser.add_argument('--window', type=int, default=5,
+                               help="number of previous runs in the rolling baseline (default 5)")
+    report_parser.add_argument('--limit', type=int, default=10, help="number of recent runs to list")
+    report_parser.add_argument('--estimate', action='store_true',
+                               help="estimate the next extraction durations from the remote record counts")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'report':
+        report(args)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+DCA CSV Index
+Memory-mapped access to large x-xfdcawk CSVs without reading them into
+memory. One pass over the file builds:
+
+- the byte offset of every data row (quoted fields spanning lines are
+  handled), so any row can be read directly by number
+- a key table: 64-bit hashes of xfdcawkFilename sorted together with their
+  row numbers, so a filename (or filename|fiscalyear) is found by binary
+  search
+- an id table built the same way from the id column
+
+The index is saved next to the CSV as <file>.idx and reused while the CSV
+size and modification time are unchanged; it is memory-mapped too, so
+opening an indexed file costs almost nothing. Compressed CSVs cannot be
+memory-mapped and are not supported.
+"""
+
+import bisect
+import csv
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+
+from dca_io import compression_of
+from dca_records import KEY_FIELDS, record_key
+
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'DCAIDX02'
+# magic, CSV size, CSV mtime_ns, data rows
+INDEX_HEADER = struct.Struct('<8sQQQ')
+
+def hash64(text):
+    """Stable 64-bit hash of a key string"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def parse_row(data):
+    """CSV values of one row given as bytes"""
+    return next(csv.reader([data.decode('utf-8')]), [])
+
+def scan_rows(buffer):
+    """Yield (start, end) byte ranges of every non-blank CSV row, header included"""
+    position = 0
+    size = len(buffer)
+    while position < size:
+        start = position
+        quotes = 0
+        while True:
+            newline = buffer.find(b'\n', position)
+            end = size if newline == -1 else newline + 1
+            quotes += buffer[position:end].count(b'"')
+            position = end
+            # An odd number of quotes means the row continues on the next line
+            if quotes % 2 == 0 or position >= size:
+                break
+        if buffer[start:end].strip(b'\r\n'):
+            yield start, end
+
+class CsvIndex:
+    """Row offsets plus filename and id hash tables of one CSV, built once and memory-mapped"""
+
+    def __init__(self, path, rebuild=False):
+        if compression_of(path):
+            raise ValueError(f"{path} is compressed; indexed access needs a plain CSV")
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self._file = open(path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._stat = (stat.st_size, stat.st_mtime_ns)
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+        self._index_file = self._index_map = None
+        self._views = []
+        self.built = False
+        if rebuild or not self._load():
+            self._build()
+            self.built = True
+        self.fields = parse_row(self._buffer[:self.offsets[0]]) if self.offsets[0] else []
+        self.field_index = {field: position for position, field in enumerate(self.fields)}
+
+    def _view(self, data, start, count):
+        view = memoryview(data)[start:start + count * 8].cast('Q')
+        self._views.append(view)
+        return view
+
+    def _load(self):
+        """Map a saved index; False if there is none or it is stale"""
+        try:
+            self._index_file = open(self.index_path, 'rb')
+        except OSError:
+            return False
+        self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._index_map) < INDEX_HEADER.size:
+            return self._discard_index()
+        magic, size, mtime_ns, rows = INDEX_HEADER.unpack_from(self._index_map)
+        if magic != INDEX_MAGIC or (size, mtime_ns) != self._stat \
+                or len(self._index_map) != INDEX_HEADER.size + (5 * rows + 1) * 8:
+            return self._discard_index()
+        position = INDEX_HEADER.size
+        self.rows = rows
+        self.offsets = self._view(self._index_map, position, rows + 1)
+        position += (rows + 1) * 8
+        self.key_hashes = self._view(self._index_map, position, rows)
+        position += rows * 8
+        self.key_rows = self._view(self._index_map, position, rows)
+        position += rows * 8
+        self.id_hashes = self._view(self._index_map, position, rows)
+        position += rows * 8
+        self.id_rows = self._view(self._index_map, position, rows)
+        return True
+
+    def _discard_index(self):
+        self._index_map.close()
+        self._index_file.close()
+        self._index_file = self._index_map = None
+        return False
+
+    def _build(self):
+        """One pass over the CSV: row offsets and the sorted filename and id hash tables"""
+        offsets = array('Q')
+        keys = []
+        ids = []
+        positions = None
+        for start, end in scan_rows(self._buffer):
+            if positions is None:
+                fields = parse_row(self._buffer[start:end])
+                positions = [fields.index(field) if field in fields else -1 for field in (KEY_FIELDS[0], 'id')]
+                offsets.append(end)
+                continue
+            offsets.append(end)
+            values = parse_row(self._buffer[start:end])
+            filename, record_id = (values[position] if 0 <= position < len(values) else '' for position in positions)
+            keys.append((hash64(filename.lstrip()), len(offsets) - 1))
+            ids.append((hash64(record_id), len(offsets) - 1))
+        if not offsets:
+            offsets.append(0)
+        keys.sort()
+        ids.sort()
+        self.rows = len(offsets) - 1
+        self.offsets = offsets
+        self.key_hashes = array('Q', (key_hash for key_hash, _ in keys))
+        self.key_rows = array('Q', (row for _, row in keys))
+        self.id_hashes = array('Q', (id_hash for id_hash, _ in ids))
+        self.id_rows = array('Q', (row for _, row in ids))
+        self._save()
+
+    def _save(self):
+        """Write the index next to the CSV (silently skipped if that is not possible)"""
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, self._stat[0], self._stat[1], self.rows))
+                f.write(self.offsets.tobytes())
+                f.write(self.key_hashes.tobytes())
+                f.write(self.key_rows.tobytes())
+                f.write(self.id_hashes.tobytes())
+                f.write(self.id_rows.tobytes())
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    def row_bytes(self, row):
+        """Raw bytes of data row `row` (1-based)"""
+        if not 1 <= row <= self.rows:
+            raise IndexError(f"row {row} is outside 1..{self.rows}")
+        return bytes(self._buffer[self.offsets[row - 1]:self.offsets[row]]).strip(b'\r\n')
+
+    def row(self, row):
+        """Values of data row `row` (1-based), padded to the header width"""
+        values = parse_row(self.row_bytes(row))
+        if len(values) < len(self.fields):
+            values.extend([''] * (len(self.fields) - len(values)))
+        return values
+
+    def _candidates(self, hashes, rows, text):
+        """Rows whose hash in a sorted hash table equals the hash of `text`"""
+        target = hash64(text)
+        position = bisect.bisect_left(hashes, target)
+        while position < self.rows and hashes[position] == target:
+            yield rows[position]
+            position += 1
+
+    def find_filename(self, filename, fiscalyear=None):
+        """Row numbers whose xfdcawkFilename (and fiscal year, if given) match"""
+        if KEY_FIELDS[0] not in self.field_index or KEY_FIELDS[1] not in self.field_index:
+            return []
+        filename_index = self.field_index[KEY_FIELDS[0]]
+        fiscalyear_index = self.field_index[KEY_FIELDS[1]]
+        matches = []
+        for row in self._candidates(self.key_hashes, self.key_rows, filename.lstrip()):
+            values = self.row(row)
+            key = record_key(values[filename_index], values[fiscalyear_index])
+            if key[0] == filename.lstrip() and (fiscalyear is None or key[1] == fiscalyear.rstrip()):
+                matches.append(row)
+        return sorted(matches)
+
+    def find_id(self, record_id):
+        """Row numbers whose id matches"""
+        if 'id' not in self.field_index:
+            return []
+        id_index = self.field_index['id']
+        return sorted(row for row in self._candidates(self.id_hashes, self.id_rows, record_id)
+                      if self.row(row)[id_index] == record_id)
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        self.offsets = self.key_hashes = self.key_rows = self.id_hashes = self.id_rows = None
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_file.close()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class IndexCache:
+    """Open CsvIndexes kept for reuse while their CSV is unchanged (used by dca_daemon.py)"""
+
+    def __init__(self):
+        self._indexes = {}
+
+    def get(self, path):
+        stat = os.stat(path)
+        index = self._indexes.get(path)
+        if index is not None and index._stat == (stat.st_size, stat.st_mtime_ns):
+            return index
+        if index is not None:
+            index.close()
+        index = self._indexes[path] = CsvIndex(path)
+        return index
+
+    def paths(self):
+        return sorted(self._indexes)
+
+    def close(self):
+        for index in self._indexes.values():
+            index.close()
+        self._indexes = {}
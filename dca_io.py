@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+DCA CSV File I/O
+Transparent gzip/xz support for every CSV artifact. Compression is chosen
+by file extension (.gz / .xz) or, for the standard artifact names, by the
+DCA_CSV_COMPRESSION setting (gz, xz or none):
+
+    DCA_CSV_COMPRESSION=gz python dca_workflow.py
+
+writes xdcawk_2025_prod.csv.gz etc., and every reader picks up whichever
+variant of an artifact exists. Compressed writes hand their data to a
+background thread, so the fetch pipeline never waits on the compressor.
+Gzip output is written with a zero timestamp so identical data always
+produces identical bytes (the workflow fingerprints depend on this).
+"""
+
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+
+COMPRESSION_SUFFIXES = {'gz': '.gz', 'xz': '.xz'}
+
+# Strings are batched into chunks of this size before being queued for compression
+WRITE_CHUNK_SIZE = 256 * 1024
+
+def configured_compression():
+    """Return the configured compression ('gz', 'xz' or None)"""
+    setting = os.getenv('DCA_CSV_COMPRESSION', '').strip().lower().lstrip('.')
+    if setting in ('', 'none', 'csv'):
+        return None
+    if setting in ('gzip', 'gz'):
+        return 'gz'
+    if setting in ('xz', 'lzma'):
+        return 'xz'
+    raise ValueError(f"Unsupported DCA_CSV_COMPRESSION setting: {setting}")
+
+def compression_of(path):
+    """Return the compression implied by a file name ('gz', 'xz' or None)"""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if str(path).endswith(suffix):
+            return compression
+    return None
+
+def strip_compression(path):
+    """Return the file name without a compression suffix"""
+    compression = compression_of(path)
+    return str(path)[:-len(COMPRESSION_SUFFIXES[compression])] if compression else str(path)
+
+def csv_path(base):
+    """Output path for a CSV artifact under the configured compression"""
+    compression = configured_compression()
+    base = strip_compression(base)
+    return base + COMPRESSION_SUFFIXES[compression] if compression else base
+
+def find_csv(base):
+    """Input path for a CSV artifact: the configured variant if present, else the newest existing one"""
+    preferred = csv_path(base)
+    if os.path.exists(preferred):
+        return preferred
+    base = strip_compression(base)
+    candidates = [path for path in [base] + [base + suffix for suffix in COMPRESSION_SUFFIXES.values()]
+                  if os.path.exists(path)]
+    if not candidates:
+        return preferred
+    return max(candidates, key=os.path.getmtime)
+
+class BackgroundCompressedWriter(io.TextIOBase):
+    """Text file whose data is encoded here and compressed/written by a background thread"""
+
+    def __init__(self, path, compression, encoding='utf-8'):
+        super().__init__()
+        self.name = path
+        self._encoding = encoding
+        self._pending = []
+        self._pending_size = 0
+        self._queue = queue.Queue(maxsize=64)
+        self._error = None
+        raw = open(path, 'wb')
+        if compression == 'gz':
+            self._stream = gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0)
+        else:
+            self._stream = lzma.LZMAFile(raw, 'wb')
+        self._raw = raw
+        self._thread = threading.Thread(target=self._run, name=f"compress-{os.path.basename(path)}",
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._error is None:
+                try:
+                    self._stream.write(chunk)
+                except Exception as e:
+                    self._error = e
+
+    def _check(self):
+        if self._error is not None:
+            raise OSError(f"Background compression of {self.name} failed: {self._error}")
+
+    def _flush_pending(self):
+        if self._pending:
+            self._queue.put(''.join(self._pending).encode(self._encoding))
+            self._pending = []
+            self._pending_size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._check()
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= WRITE_CHUNK_SIZE:
+            self._flush_pending()
+        return len(text)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._flush_pending()
+            self._queue.put(None)
+            self._thread.join()
+            self._stream.close()
+            self._raw.close()
+        finally:
+            super().close()
+        self._check()
+
+def open_csv(path, mode='r'):
+    """Open a CSV artifact for text reading ('r') or writing ('w'), compressed or not"""
+    path = str(path)
+    compression = compression_of(path)
+    if mode == 'r':
+        if compression == 'gz':
+            return gzip.open(path, 'rt', encoding='utf-8', newline='')
+        if compression == 'xz':
+            return lzma.open(path, 'rt', encoding='utf-8', newline='')
+        return open(path, 'r', newline='')
+    if mode == 'w':
+        if compression:
+            return BackgroundCompressedWriter(path, compression)
+        return open(path, 'w', newline='')
+    raise ValueError(f"Unsupported mode: {mode}")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+DCA Compact Key Set
+Set of (xfdcawkFilename, xfdcawkFiscalyear) keys for the low-memory
+compare. A Python set of key tuples costs about 200 bytes per key (the
+tuple, both strings and the set slot); this one stores each key as a
+128-bit BLAKE2b fingerprint in two flat array('Q') tables with open
+addressing (linear probing, at most 2/3 full), 24-48 bytes per key.
+
+Slots are found by the first 64 bits of the fingerprint; probing goes
+on past a slot whose second 64 bits differ. Membership is decided by the
+fingerprint alone, the exact keys are never kept or re-checked: two
+different keys whose 128-bit fingerprints collide are treated as equal.
+For n keys the chance of any such collision is about n^2 / 2^129, around
+1e-23 for 100 million keys.
+"""
+
+import hashlib
+from array import array
+
+MAX_LOAD = 2 / 3
+
+def fingerprint(key):
+    """(slot hash, check hash) of a key tuple; the slot hash is never 0, which marks an empty slot"""
+    digest = hashlib.blake2b('\0'.join(key).encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little') or 1, int.from_bytes(digest[8:], 'little')
+
+class KeyHashSet:
+    """Open-addressing set of key fingerprints, usable in place of set() for key tuples"""
+
+    def __init__(self, capacity=1024):
+        size = 8
+        while size * MAX_LOAD < capacity:
+            size *= 2
+        self._allocate(size)
+        self.count = 0
+
+    def _allocate(self, size):
+        self.mask = size - 1
+        self.slots = array('Q', bytes(8 * size))
+        self.checks = array('Q', bytes(8 * size))
+
+    def _find(self, slot_hash, check_hash):
+        """(position, found) of a fingerprint: its slot, or the empty slot where it belongs"""
+        slots, checks, mask = self.slots, self.checks, self.mask
+        position = slot_hash & mask
+        while True:
+            current = slots[position]
+            if current == 0:
+                return position, False
+            if current == slot_hash and checks[position] == check_hash:
+                return position, True
+            position = (position + 1) & mask
+
+    def _grow(self):
+        slots, checks = self.slots, self.checks
+        self._allocate(len(slots) * 2)
+        for slot_hash, check_hash in zip(slots, checks):
+            if slot_hash:
+                position = slot_hash & self.mask
+                while self.slots[position]:
+                    position = (position + 1) & self.mask
+                self.slots[position] = slot_hash
+                self.checks[position] = check_hash
+
+    def add(self, key):
+        """Add a key; returns False if it was already present"""
+        slot_hash, check_hash = fingerprint(key)
+        position, found = self._find(slot_hash, check_hash)
+        if found:
+            return False
+        self.slots[position] = slot_hash
+        self.checks[position] = check_hash
+        self.count += 1
+        if self.count > len(self.slots) * MAX_LOAD:
+            self._grow()
+        return True
+
+    def __contains__(self, key):
+        return self._find(*fingerprint(key))[1]
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        """Bytes held by the tables"""
+        return self.slots.itemsize * len(self.slots) + self.checks.itemsize * len(self.checks)
+
+def describe_memory(label, keys):
+    """One-line memory report of a KeyHashSet"""
+    per_key = keys.nbytes / len(keys) if len(keys) else 0
+    return (f"🧮 {label} keys: {len(keys)} fingerprints in {keys.nbytes / 1024 / 1024:.1f} MiB "
+            f"({per_key:.0f} bytes/key)")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+DCA Point Lookup
+Shows where one record appears: every matching row of the PROD, TEST and
+DIFF CSVs (and their partition files) for a key or an id:
+
+    python dca_lookup.py "TOM_844_227.1X_20634.SEQ|2324"
+    python dca_lookup.py TOM_844_227.1X_20634.SEQ          # every fiscal year
+    python dca_lookup.py 73893741-cd1e-4256-a040-a94f27364ca6
+
+Each plain CSV is searched through its persisted hash index (dca_index.py),
+built on first use and reused until the file changes, so a lookup is a
+binary search per file. Compressed CSVs cannot be indexed and are scanned.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+from dca_daemon import forward_to_daemon
+from dca_index import CsvIndex
+from dca_io import compression_of, find_csv
+from dca_partitions import discover_partitions, partition_path
+from dca_records import iter_records, key_string, parse_key, record_key
+from dca_viewer import CsvViewer
+
+SNAPSHOTS = (('PROD', 'xdcawk_2025_prod.csv'), ('TEST', 'xdcawk_2025_test.csv'), ('DIFF', 'xdcawk_2025_diff.csv'))
+UUID_PATTERN = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+
+def available_snapshots(extra_files=()):
+    """(label, path) of every extract, diff and partition file on disk"""
+    snapshots = []
+    for label, base in SNAPSHOTS:
+        path = find_csv(base)
+        if os.path.exists(path):
+            snapshots.append((label, path))
+        for name in discover_partitions(base):
+            snapshots.append((f"{label} {name}", find_csv(partition_path(base, name))))
+    snapshots.extend((os.path.basename(path), path) for path in extra_files)
+    return snapshots
+
+def parse_query(text, force_id=False):
+    """('id', id) or ('key', filename, fiscalyear-or-None) for a lookup argument"""
+    text = text.strip()
+    if force_id or UUID_PATTERN.match(text):
+        return ('id', text)
+    if '|' in text:
+        filename, fiscalyear = parse_key(text)
+        return ('key', filename, fiscalyear)
+    return ('key', text, None)
+
+def matches_record(record, query):
+    if query[0] == 'id':
+        return record.get('id') == query[1]
+    key = record_key(query[1], query[2] or '')
+    return record.key[0] == key[0] and (query[2] is None or record.key[1] == key[1])
+
+def lookup_indexed(path, query, indexes=None):
+    """Matching row numbers through the file's hash index (kept open in `indexes` if given); returns (index, rows)"""
+    index = indexes.get(path) if indexes is not None else CsvIndex(path)
+    if query[0] == 'id':
+        return index, index.find_id(query[1])
+    return index, index.find_filename(query[1], query[2])
+
+def lookup_scanned(path, query):
+    """Matching records of a compressed CSV, found by a full scan"""
+    return [record for record in iter_records(path) if matches_record(record, query)]
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Find a key or id in every available DCA snapshot")
+    parser.add_argument('query', help="FILENAME|FISCALYEAR, FILENAME or an id")
+    parser.add_argument('--id', action='store_true', help="treat the query as an id even if it is not a UUID")
+    parser.add_argument('--file', action='append', default=[], help="also search this CSV (repeatable)")
+    parser.add_argument('--columns', help="columns to show (as in dca_viewer.py; default a compact set)")
+    parser.add_argument('--full', action='store_true', help="show every field of each matching row")
+    return parser.parse_args()
+
+def main(args, indexes=None):
+    query = parse_query(args.query, args.id)
+    snapshots = available_snapshots(args.file)
+    if not snapshots:
+        print("❌ No snapshots found; run the extractions first")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    found = 0
+    for label, path in snapshots:
+        file_started = time.perf_counter()
+        if compression_of(path):
+            records = lookup_scanned(path, query)
+            elapsed = (time.perf_counter() - file_started) * 1000
+            print(f"\n📁 {label} ({path}): {len(records)} row(s), scanned in {elapsed:.1f} ms")
+            for record in records:
+                print(f"  row {record.row_number}: {key_string(record.key)} id={record.get('id')}")
+            found += len(records)
+            continue
+        index, rows = lookup_indexed(path, query, indexes)
+        try:
+            elapsed = (time.perf_counter() - file_started) * 1000
+            note = ", index built" if index.built else ""
+            print(f"\n📁 {label} ({path}): {len(rows)} row(s) in {elapsed:.1f} ms{note}")
+            if rows and args.full:
+                viewer = CsvViewer(index)
+                for row in rows:
+                    viewer.print_record(row)
+            elif rows:
+                CsvViewer(index, args.columns).print_rows(rows)
+        finally:
+            if indexes is None:
+                index.close()
+        found += len(rows)
+
+    print(f"\n🔍 {found} row(s) across {len(snapshots)} file(s) in {(time.perf_counter() - started) * 1000:.1f} ms")
+    if not found:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    # A running dca_daemon.py answers from its open indexes
+    exit_code = forward_to_daemon('lookup', sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+    main(parse_args())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+DCA Request Metrics
+Thread-safe per-request metrics for the Ethos API calls made by the query
+and load scripts:
+- Latency histograms with p50/p95/p99 per operation
+- Bytes sent/received, retry counts and status-code counts
+- In-flight concurrency sampled every time a request starts or finishes
+
+Metrics are written as a JSON file and as a Prometheus textfile-collector
+file (dca_metrics_<job>.json / dca_metrics_<job>.prom). Set DCA_METRICS_DIR
+to write them somewhere other than the current directory, e.g. the
+node_exporter textfile directory.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class RequestSample:
+    """Mutable result of a single tracked request"""
+
+    def __init__(self):
+        self.status = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+
+    def observe_response(self, response):
+        """Capture status code and payload sizes from a requests.Response"""
+        self.status = response.status_code
+        self.bytes_received += len(response.content)
+        body = getattr(response.request, 'body', None)
+        if body:
+            self.bytes_sent += len(body.encode() if isinstance(body, str) else body)
+
+class MetricsRecorder:
+    """Collects per-request metrics for one job (prod, test, create_test, ...)"""
+
+    def __init__(self, job):
+        self.job = job
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._operations = {}
+        self._inflight = 0
+        self._max_inflight = 0
+        self._timeline = []
+
+    def _operation(self, name):
+        if name not in self._operations:
+            self._operations[name] = {
+                'latencies': [],
+                'status_counts': {},
+                'bytes_sent': 0,
+                'bytes_received': 0,
+                'retries': 0,
+            }
+        return self._operations[name]
+
+    def _sample_inflight(self, delta):
+        self._inflight += delta
+        self._max_inflight = max(self._max_inflight, self._inflight)
+        self._timeline.append((round(time.time() - self.started, 4), self._inflight))
+
+    @contextmanager
+    def track(self, operation):
+        """Time one request; the caller fills in the yielded RequestSample"""
+        sample = RequestSample()
+        with self._lock:
+            self._sample_inflight(1)
+        start = time.perf_counter()
+        try:
+            yield sample
+        except Exception:
+            if sample.status is None:
+                sample.status = 'error'
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._sample_inflight(-1)
+                stats = self._operation(operation)
+                stats['latencies'].append(elapsed)
+                status = str(sample.status if sample.status is not None else 'unknown')
+                stats['status_counts'][status] = stats['status_counts'].get(status, 0) + 1
+                stats['bytes_sent'] += sample.bytes_sent
+                stats['bytes_received'] += sample.bytes_received
+                stats['retries'] += sample.retries
+
+    def snapshot(self):
+        """Return a JSON-serialisable summary of everything recorded so far"""
+        with self._lock:
+            operations = {}
+            for name, stats in self._operations.items():
+                latencies = sorted(stats['latencies'])
+                operations[name] = {
+                    'count': len(latencies),
+                    'latency_seconds': {
+                        'p50': round(percentile(latencies, 50), 4),
+                        'p95': round(percentile(latencies, 95), 4),
+                        'p99': round(percentile(latencies, 99), 4),
+                        'max': round(latencies[-1], 4) if latencies else 0.0,
+                        'sum': round(sum(latencies), 4),
+                    },
+                    'latency_histogram': {
+                        str(bound): sum(1 for value in latencies if value <= bound)
+                        for bound in LATENCY_BUCKETS
+                    },
+                    'status_counts': dict(stats['status_counts']),
+                    'bytes_sent': stats['bytes_sent'],
+                    'bytes_received': stats['bytes_received'],
+                    'retries': stats['retries'],
+                }
+            return {
+                'job': self.job,
+                'started': self.started,
+                'duration_seconds': round(time.time() - self.started, 4),
+                'max_inflight': self._max_inflight,
+                'inflight_timeline': list(self._timeline),
+                'operations': operations,
+            }
+
+    def to_prometheus(self, summary=None):
+        """Render the summary in Prometheus text exposition format"""
+        summary = summary or self.snapshot()
+        job = summary['job']
+        lines = [
+            "# HELP dca_request_duration_seconds Ethos API request latency",
+            "# TYPE dca_request_duration_seconds histogram",
+        ]
+        for name, stats in summary['operations'].items():
+            labels = f'job="{job}",operation="{name}"'
+            for bound, count in stats['latency_histogram'].items():
+                lines.append(f'dca_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'dca_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+            lines.append(f'dca_request_duration_seconds_sum{{{labels}}} {stats["latency_seconds"]["sum"]}')
+            lines.append(f'dca_request_duration_seconds_count{{{labels}}} {stats["count"]}')
+
+        lines.append("# HELP dca_request_duration_quantile_seconds Ethos API request latency quantiles")
+        lines.append("# TYPE dca_request_duration_quantile_seconds gauge")
+        for name, stats in summary['operations'].items():
+            for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+                lines.append(f'dca_request_duration_quantile_seconds{{job="{job}",operation="{name}",'
+                             f'quantile="{quantile}"}} {stats["latency_seconds"][key]}')
+
+        lines.append("# HELP dca_requests_total Ethos API requests by status code")
+        lines.append("# TYPE dca_requests_total counter")
+        for name, stats in summary['operations'].items():
+            for status, count in stats['status_counts'].items():
+                lines.append(f'dca_requests_total{{job="{job}",operation="{name}",status="{status}"}} {count}')
+
+        for metric, key, help_text in (
+            ('dca_request_bytes_sent_total', 'bytes_sent', "Request body bytes sent"),
+            ('dca_request_bytes_received_total', 'bytes_received', "Response body bytes received"),
+            ('dca_request_retries_total', 'retries', "Request retries"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, stats in summary['operations'].items():
+                lines.append(f'{metric}{{job="{job}",operation="{name}"}} {stats[key]}')
+
+        lines.append("# HELP dca_inflight_requests_max Peak concurrent in-flight requests")
+        lines.append("# TYPE dca_inflight_requests_max gauge")
+        lines.append(f'dca_inflight_requests_max{{job="{job}"}} {summary["max_inflight"]}')
+        lines.append("# HELP dca_run_duration_seconds Wall time covered by these metrics")
+        lines.append("# TYPE dca_run_duration_seconds gauge")
+        lines.append(f'dca_run_duration_seconds{{job="{job}"}} {summary["duration_seconds"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_dir=None):
+        """Write the JSON and Prometheus files; returns their paths"""
+        metrics_dir = metrics_dir or os.getenv('DCA_METRICS_DIR') or '.'
+        summary = self.snapshot()
+        json_file = os.path.join(metrics_dir, f"dca_metrics_{self.job}.json")
+        prom_file = os.path.join(metrics_dir, f"dca_metrics_{self.job}.prom")
+
+        # Write to a temp file and rename so the textfile collector never sees a partial file
+        for filename, content in ((json_file, json.dumps(summary, indent=2)),
+                                  (prom_file, self.to_prometheus(summary))):
+            tmp_file = f"{filename}.tmp"
+            with open(tmp_file, 'w') as f:
+                f.write(content)
+            os.replace(tmp_file, filename)
+        return json_file, prom_file
+
+    def print_summary(self):
+        """Print a short per-operation latency summary"""
+        summary = self.snapshot()
+        for name, stats in summary['operations'].items():
+            latency = stats['latency_seconds']
+            print(f"📈 {name}: {stats['count']} requests, "
+                  f"p50 {latency['p50']:.3f}s / p95 {latency['p95']:.3f}s / p99 {latency['p99']:.3f}s, "
+                  f"{stats['bytes_received']:,} bytes received, {stats['retries']} retries")
+        print(f"📈 Peak in-flight requests: {summary['max_inflight']}")
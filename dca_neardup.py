@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+DCA Near-Duplicate Detection
+Finds records that are probably the same deposit even though their
+(xfdcawkFilename, xfdcawkFiscalyear) keys differ: case and whitespace
+variants of a filename, or the same deposit filed under another filename.
+
+- Values are normalized with configurable steps (case, space, punct,
+  zeros, amount) before they are blocked or compared
+- Each blocking key (e.g. the normalized key, or depno + bank account +
+  deposit date + total) puts records with equal values in one block;
+  pairs are only scored inside a block, so the work grows with the number
+  of records, not their square. Blocks larger than max_block are skipped
+  and reported (usually a blocking field that is blank for many rows)
+- A pair scoring at least the threshold (mean per-field similarity) is
+  linked, and linked records are grouped into clusters with union-find
+"""
+
+import re
+from decimal import Decimal, InvalidOperation
+from difflib import SequenceMatcher
+
+def _amount(value):
+    try:
+        return str(Decimal(value).normalize()) if value else value
+    except InvalidOperation:
+        return value
+
+NORMALIZERS = {
+    'case': str.lower,
+    'space': lambda value: ''.join(value.split()),
+    'punct': lambda value: re.sub(r'[^0-9A-Za-z]', '', value),
+    'zeros': lambda value: re.sub(r'(?<![0-9])0+(?=[0-9])', '', value),
+    'amount': _amount,
+}
+DEFAULT_NORMALIZE = ('case', 'space')
+
+BLOCK_PRESETS = {
+    'key': ('xfdcawkFilename', 'xfdcawkFiscalyear'),
+    'filename': ('xfdcawkFilename',),
+    'deposit': ('xfdcawkDepno', 'xfdcawkBankacct', 'xfdcawkDepdate', 'xfdcawkTotaldep'),
+}
+DEFAULT_BLOCK_KEYS = ('key', 'deposit')
+
+# Fields scored for every candidate pair; filenames get partial credit by edit similarity
+COMPARE_FIELDS = ('xfdcawkFilename', 'xfdcawkFiscalyear', 'xfdcawkDepno', 'xfdcawkBankacct',
+                  'xfdcawkDepdate', 'xfdcawkTotaldep', 'xfdcawkTotalrev', 'xfdcawkInstname')
+FUZZY_FIELDS = {'xfdcawkFilename'}
+
+def make_normalizer(steps):
+    """Compose the named normalization steps into one function"""
+    unknown = [step for step in steps if step not in NORMALIZERS]
+    if unknown:
+        raise ValueError(f"Unknown normalization(s): {', '.join(unknown)} (choose from {', '.join(NORMALIZERS)})")
+    functions = [NORMALIZERS[step] for step in steps]
+
+    def normalize(value):
+        for function in functions:
+            value = function(value)
+        return value
+    return normalize
+
+def parse_block_key(spec):
+    """Fields of a blocking key: a preset name or field names joined with '+'"""
+    if spec in BLOCK_PRESETS:
+        return BLOCK_PRESETS[spec]
+    return tuple(field.strip() for field in spec.split('+') if field.strip())
+
+class UnionFind:
+    """Disjoint sets over record positions 0..n-1 (path halving, union by size)"""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+def similarity(left, right):
+    """Mean per-field similarity of two normalized value tuples (COMPARE_FIELDS order)"""
+    total = 0.0
+    for field, a, b in zip(COMPARE_FIELDS, left, right):
+        if a == b:
+            total += 1.0
+        elif field in FUZZY_FIELDS and a and b:
+            total += SequenceMatcher(None, a, b).ratio()
+    return total / len(COMPARE_FIELDS)
+
+class NearDuplicateCluster:
+    """Records linked by near-duplicate pairs, with the lowest linking score"""
+
+    __slots__ = ('records', 'score', 'blocks')
+
+    def __init__(self, records, score, blocks):
+        self.records = records
+        self.score = score
+        self.blocks = blocks
+
+    @property
+    def exact(self):
+        """True when every record has the same raw key"""
+        return len({record.key for record in self.records}) == 1
+
+def find_near_duplicates(records, normalize=DEFAULT_NORMALIZE, block_keys=DEFAULT_BLOCK_KEYS,
+                         threshold=0.8, max_block=100):
+    """Cluster near-duplicate records; returns (clusters sorted by score, stats)"""
+    normalizer = make_normalizer(normalize)
+    key_fields = {spec: parse_block_key(spec) for spec in block_keys}
+    if records:
+        # A misspelled field would read as blank in every row and silently build no blocks
+        header = records[0].layout.fields
+        unknown = sorted({field for fields in key_fields.values() for field in fields if field not in header})
+        if unknown:
+            raise ValueError(f"Unknown blocking field(s): {', '.join(unknown)} (not in the file header)")
+    compared = {}
+
+    def values(position):
+        # Only records that share a block with another record are ever compared
+        if position not in compared:
+            compared[position] = tuple(normalizer(records[position].get(field)) for field in COMPARE_FIELDS)
+        return compared[position]
+
+    blocks = {}
+    for position, record in enumerate(records):
+        for spec, fields in key_fields.items():
+            block_values = tuple(normalizer(record.get(field)) for field in fields)
+            if any(block_values):
+                blocks.setdefault((spec, block_values), []).append(position)
+
+    union_find = UnionFind(len(records))
+    pair_scores = {}
+    pair_blocks = {}
+    oversized = 0
+    for (spec, _), members in blocks.items():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block:
+            oversized += 1
+            continue
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                pair = (a, b)
+                if pair not in pair_scores:
+                    pair_scores[pair] = similarity(values(a), values(b))
+                if pair_scores[pair] >= threshold:
+                    union_find.union(a, b)
+                    pair_blocks.setdefault(pair, set()).add(spec)
+
+    groups = {}
+    for a, b in pair_blocks:
+        root = union_find.find(a)
+        group = groups.setdefault(root, {'members': set(), 'score': 1.0, 'blocks': set()})
+        group['members'].update((a, b))
+        group['score'] = min(group['score'], pair_scores[(a, b)])
+        group['blocks'].update(pair_blocks[(a, b)])
+
+    clusters = [NearDuplicateCluster([records[position] for position in sorted(group['members'])],
+                                     group['score'], sorted(group['blocks']))
+                for group in groups.values()]
+    clusters.sort(key=lambda cluster: (-cluster.score, cluster.records[0].row_number))
+    stats = {'blocks': len(blocks), 'oversized_blocks': oversized, 'pairs_scored': len(pair_scores),
+             'pairs_linked': len(pair_blocks)}
+    return clusters, stats
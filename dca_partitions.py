@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+DCA Partitioned Extraction
+Splits an x-xfdcawk extraction into partitions that are filtered on the
+server with Ethos `criteria` queries, so a partial refresh such as
+"just FY 2425" fetches only that slice of the data:
+
+    python dcawk_query_prod.py --fiscal-year 2425
+    python dcawk_query_prod.py --fiscal-year 2324,2425 --institution "Wake Tech"
+    python dcawk_query_prod.py --date-range 2024-07-01:2024-12-31
+
+Each dimension given adds a filter; partitions are every combination of
+the values. All partitions share one worker pool, and each is written to
+its own file, e.g. xdcawk_2025_prod.fy2425.csv. dcawk_compare.py accepts
+the same options (or --partitioned) to diff matching partitions.
+"""
+
+import argparse
+import csv
+import glob
+import itertools
+import json
+import math
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dca_columnar import ColumnarWriter, snapshot_path
+from dca_io import COMPRESSION_SUFFIXES, csv_path, open_csv, strip_compression
+from dca_trace import Tracer
+
+PAGE_SIZE = 1000
+DEFAULT_DATE_FIELD = 'xfdcawkDepdate'
+
+Partition = namedtuple('Partition', ['name', 'criteria'])
+
+def slug(value):
+    """File-name-safe form of a partition value"""
+    return re.sub(r'[^a-z0-9]+', '-', value.strip().lower()).strip('-')
+
+def split_values(values):
+    """Flatten repeated and comma-separated option values"""
+    return [value.strip() for item in values or [] for value in item.split(',') if value.strip()]
+
+def build_partitions(fiscal_years=None, institutions=None, date_ranges=None, date_field=DEFAULT_DATE_FIELD):
+    """Return one Partition per combination of the requested fiscal years, institutions and date ranges"""
+    dimensions = []
+    if fiscal_years:
+        dimensions.append([(f"fy{slug(year)}", {'xfdcawkFiscalyear': year}) for year in fiscal_years])
+    if institutions:
+        dimensions.append([(f"inst-{slug(name)}", {'xfdcawkInstname': name}) for name in institutions])
+    if date_ranges:
+        ranges = []
+        field_name = slug(date_field.replace('xfdcawk', '', 1))
+        for date_range in date_ranges:
+            start, _, end = date_range_arg(date_range).partition(':')
+            bounds = {}
+            if start:
+                bounds['$gte'] = start
+            if end:
+                bounds['$lte'] = end
+            name = f"{field_name}-{start.replace('-', '') or 'min'}-{end.replace('-', '') or 'max'}"
+            ranges.append((name, {date_field: bounds}))
+        dimensions.append(ranges)
+
+    partitions = []
+    for combination in itertools.product(*dimensions):
+        if not combination:
+            continue
+        criteria = {}
+        for _, part in combination:
+            criteria.update(part)
+        partitions.append(Partition('.'.join(name for name, _ in combination), criteria))
+    return partitions
+
+def date_range_arg(value):
+    """argparse type for START:END date ranges (either end may be left open)"""
+    start, separator, end = value.partition(':')
+    if not separator or not (start or end):
+        raise argparse.ArgumentTypeError(f"date range must look like START:END, got {value!r}")
+    return value
+
+def add_partition_arguments(parser):
+    """Add the --fiscal-year/--institution/--date-range options shared by the extract and compare scripts"""
+    group = parser.add_argument_group('partitions')
+    group.add_argument('--fiscal-year', action='append', metavar='FY',
+                       help="extract/compare only this xfdcawkFiscalyear (repeatable or comma-separated)")
+    group.add_argument('--institution', action='append', metavar='NAME',
+                       help="extract/compare only this xfdcawkInstname (repeatable)")
+    group.add_argument('--date-range', action='append', metavar='START:END', type=date_range_arg,
+                       help="extract/compare only records with the date field in this range (repeatable)")
+    group.add_argument('--date-field', default=DEFAULT_DATE_FIELD,
+                       help=f"date field used by --date-range (default {DEFAULT_DATE_FIELD})")
+
+def partitions_from_args(args):
+    """Partitions selected on the command line (empty when no partition option was given)"""
+    return build_partitions(split_values(args.fiscal_year), args.institution, args.date_range, args.date_field)
+
+def partition_path(base_file, partition):
+    """Output path of one partition of an artifact, e.g. xdcawk_2025_prod.fy2425.csv(.gz)"""
+    base = strip_compression(base_file)
+    stem, extension = os.path.splitext(base)
+    name = partition.name if isinstance(partition, Partition) else partition
+    return csv_path(f"{stem}.{name}{extension}")
+
+def discover_partitions(base_file):
+    """Names of the partitions of an artifact that exist on disk"""
+    stem, extension = os.path.splitext(strip_compression(base_file))
+    names = set()
+    for suffix in [''] + list(COMPRESSION_SUFFIXES.values()):
+        for path in glob.glob(f"{glob.escape(stem)}.*{extension}{suffix}"):
+            names.add(strip_compression(path)[len(stem) + 1:-len(extension)])
+    return sorted(names)
+
+def criteria_param(criteria):
+    """Ethos `criteria` query-string value for a partition filter"""
+    return json.dumps(criteria, separators=(',', ':'))
+
+def extract_partitions(partitions, base_file, fields, count_records, fetch_batch,
+                       max_workers=5, columnar=False, tracer=None, wrap=None):
+    """
+    Fetch every partition through one shared worker pool and write one CSV per partition.
+    count_records(criteria) returns a record count; fetch_batch(page, criteria) returns rows or None.
+    Returns a list of (partition, output file, records written, batches that could not be fetched).
+    """
+    tracer = tracer or Tracer()
+    wrap = wrap or (lambda func: func)
+    results = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Partition counts are independent, so they go through the pool too
+        totals = list(executor.map(wrap(count_records), [partition.criteria for partition in partitions]))
+        pages = {}
+        for partition, total in zip(partitions, totals):
+            pages[partition.name] = math.ceil(total / PAGE_SIZE)
+            print(f"📊 Partition {partition.name}: {total} records, {pages[partition.name]} batches")
+
+        def write_partition(partition, batches):
+            write_file = partition_path(base_file, partition)
+            record_count = 0
+            failed = pages[partition.name] - len(batches)
+            with open_csv(write_file, 'w') as f_write, tracer.span('csv_write', partition=partition.name):
+                csvwrite = csv.writer(f_write)
+                csvwrite.writerow(fields)
+                columnar_writer = ColumnarWriter(snapshot_path(write_file), fields) if columnar else None
+                for page in range(pages[partition.name]):
+                    if page in batches:
+                        csvwrite.writerows(batches[page])
+                        if columnar_writer:
+                            columnar_writer.writerows(batches[page])
+                        record_count += len(batches[page])
+            # Finished after the CSV is closed, so a current snapshot is never older than its CSV
+            if columnar_writer:
+                columnar_writer.close()
+            print(f"✅ Partition {partition.name}: {record_count} records written to {write_file}")
+            results.append((partition, write_file, record_count, failed))
+
+        # Queue every page of every partition at once; a partition is written as soon as its last page lands
+        future_to_page = {}
+        for partition in partitions:
+            for page in range(pages[partition.name]):
+                future = executor.submit(wrap(fetch_batch), page, partition.criteria)
+                future_to_page[future] = (partition, page)
+
+        batch_results = {partition.name: {} for partition in partitions}
+        remaining = dict(pages)
+        for partition in partitions:
+            if remaining[partition.name] == 0:
+                write_partition(partition, {})
+
+        with tracer.span('await_batches'):
+            for future in as_completed(future_to_page):
+                partition, page = future_to_page[future]
+                try:
+                    batch_rows = future.result()
+                    if batch_rows:
+                        batch_results[partition.name][page] = batch_rows
+                    else:
+                        print(f"⚠️  Failed to fetch batch {page+1} of partition {partition.name}")
+                except Exception as e:
+                    print(f"❌ Error in batch {page+1} of partition {partition.name}: {e}")
+                remaining[partition.name] -= 1
+                if remaining[partition.name] == 0:
+                    write_partition(partition, batch_results.pop(partition.name))
+
+    return results
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+DCA Stage Profiler
+Optional cProfile + tracemalloc capture for a script stage. When enabled,
+each stage writes next to the workflow log:
+- dca_profile_<stage>.prof - raw cProfile stats (load with pstats/snakeviz)
+- dca_profile_<stage>.txt  - hot functions and top memory allocations
+and prints a short hot-function summary.
+
+Before Python 3.12 cProfile only sees the thread it was enabled in, so
+work submitted to a thread pool must be wrapped with Profiler.wrap(); the
+per-thread profiles are merged into the stage report. From 3.12 cProfile
+runs on sys.monitoring, so the stage profiler already sees every thread
+and wrap() adds no second profiler (one could not be enabled anyway).
+When disabled, stage() is a null context and wrap() returns the function
+unchanged, so profiling costs nothing.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# cProfile on sys.monitoring: one profiler sees all threads and a second cannot be enabled
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+
+class Profiler:
+    """Profiles named stages of a script when enabled"""
+
+    def __init__(self, enabled=False, output_dir='.', top=15):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.top = top
+        self._lock = threading.Lock()
+        self._thread_profiles = []
+        self._active = False
+        self._stage_thread = None
+
+    def stage(self, name):
+        """Context manager profiling one stage (a no-op when disabled)"""
+        if not self.enabled:
+            return nullcontext()
+        return self._profile_stage(name)
+
+    def wrap(self, func):
+        """Profile func in whichever worker thread runs it (returns func when disabled)"""
+        if not self.enabled or PROFILES_ALL_THREADS:
+            return func
+
+        def profiled(*args, **kwargs):
+            # The stage profiler already sees its own thread; a second profiler there would displace it
+            if not self._active or threading.get_ident() == self._stage_thread:
+                return func(*args, **kwargs)
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiling tool is active; never lose the task over it
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self._thread_profiles.append(profile)
+        return profiled
+
+    @contextmanager
+    def _profile_stage(self, name):
+        profile = cProfile.Profile()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(10)
+        self._thread_profiles = []
+        self._active = True
+        self._stage_thread = threading.get_ident()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._active = False
+            self._stage_thread = None
+            snapshot = tracemalloc.take_snapshot()
+            traced_memory = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            self._report(name, profile, snapshot, traced_memory)
+
+    def _report(self, name, profile, snapshot, traced_memory):
+        stats = pstats.Stats(profile)
+        with self._lock:
+            thread_profiles, self._thread_profiles = self._thread_profiles, []
+        for thread_profile in thread_profiles:
+            stats.add(thread_profile)
+
+        prof_file = os.path.join(self.output_dir, f"dca_profile_{name}.prof")
+        text_file = os.path.join(self.output_dir, f"dca_profile_{name}.txt")
+        stats.dump_stats(prof_file)
+
+        buffer = io.StringIO()
+        stats.stream = buffer
+        buffer.write(f"=== HOT FUNCTIONS BY OWN TIME: {name} ===\n")
+        stats.sort_stats('tottime').print_stats(self.top)
+        buffer.write(f"\n=== HOT FUNCTIONS BY CUMULATIVE TIME: {name} ===\n")
+        stats.sort_stats('cumulative').print_stats(self.top)
+        buffer.write(f"\n=== TOP MEMORY ALLOCATIONS: {name} ===\n")
+        for allocation in snapshot.statistics('lineno')[:self.top]:
+            buffer.write(f"{allocation}\n")
+        current, peak = traced_memory
+        buffer.write(f"\nTraced memory: current {current:,} bytes, peak {peak:,} bytes\n")
+
+        with open(text_file, 'w') as f:
+            f.write(buffer.getvalue())
+
+        threads = "all threads" if PROFILES_ALL_THREADS else f"{len(thread_profiles)} worker task(s) merged"
+        print(f"\n🔬 Profile for {name} ({threads}):")
+        hot = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:5]
+        for (filename, line, function), (_, calls, tottime, cumtime, _) in hot:
+            location = f"{os.path.basename(filename)}:{line}" if line else filename
+            print(f"   {tottime:8.3f}s own {cumtime:8.3f}s cum {calls:>9} calls  {function} ({location})")
+        print(f"🔬 Profile saved to {prof_file} and {text_file}")
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+DCA Rate Limiting
+Thread-safe token bucket used to cap the request rate of one tenant (or
+environment) while many worker threads share a single pool, plus the
+host-wide RateLimiter every Ethos call goes through:
+
+- Each budget is a SharedTokenBucket whose state (tokens, last refill) is
+  a small file under DCA_RATE_DIR (default <tmp>/dca_ratelimit), updated
+  under an exclusive flock, so the PROD and TEST extractions, the loader
+  and any other script running at the same time draw from one bucket
+- There is a bucket per tenant (named by a hash of its API key) and,
+  when DCA_RATE_<ENV> is set, one per environment
+- A 429 drains every bucket of the limiter for its Retry-After, so all
+  processes back off together instead of each retrying into the throttle
+"""
+
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): buckets are still shared by the threads of one process
+    fcntl = None
+
+# tokens, last update (epoch seconds)
+BUCKET_STATE = struct.Struct('<dd')
+DEFAULT_TENANT_RATE = 25.0
+DEFAULT_RETRY_AFTER = 1.0
+THROTTLE_ATTEMPTS = 5
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.waited += waited
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class SharedTokenBucket:
+    """Token bucket whose state lives in a locked file, shared by every thread and process on the host"""
+
+    def __init__(self, name, rate, burst=None, state_dir=None):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self.path = os.path.join(state_dir or rate_state_dir(), f"{name}.bucket")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        # flock excludes other processes; threads of this one share the descriptor and need their own lock
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _update(self, change):
+        """Apply change(tokens, now) -> (tokens, delay) to the shared state under the lock"""
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                data = os.pread(self._fd, BUCKET_STATE.size, 0)
+                if len(data) == BUCKET_STATE.size:
+                    tokens, updated = BUCKET_STATE.unpack(data)
+                    tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                else:
+                    tokens = self.burst
+                tokens, delay = change(tokens, now)
+                os.pwrite(self._fd, BUCKET_STATE.pack(tokens, now), 0)
+                return delay
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available; returns the seconds spent waiting"""
+        def take(available, now):
+            if available >= tokens:
+                return available - tokens, 0.0
+            return available, (tokens - available) / self.rate
+
+        waited = 0.0
+        while True:
+            delay = self._update(take)
+            if not delay:
+                self.waited += waited
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Drain the bucket so nobody on the host gets a token for `seconds`"""
+        self._update(lambda available, now: (min(available, 0.0) - seconds * self.rate, 0.0))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+def rate_state_dir():
+    return os.getenv('DCA_RATE_DIR') or os.path.join(tempfile.gettempdir(), 'dca_ratelimit')
+
+def tenant_id(api_key):
+    """Short stable name for a tenant's API key that does not reveal the key"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+def configured_rate(name, default):
+    value = os.getenv(name)
+    try:
+        return float(value) if value else default
+    except ValueError:
+        raise ValueError(f"{name} must be a number of requests per second, got {value!r}")
+
+def retry_after(response, default=DEFAULT_RETRY_AFTER):
+    """Seconds to back off after a 429 (Retry-After header, else the default)"""
+    try:
+        return max(0.0, float(response.headers.get('Retry-After', default)))
+    except (TypeError, ValueError):
+        return default
+
+class RateLimiter:
+    """Host-wide request budgets: one shared bucket per tenant (API key) and per environment
+
+    Budgets come from DCA_RATE_TENANT (default 25/s) and DCA_RATE_<ENV>
+    (e.g. DCA_RATE_PROD; no environment budget unless set). An optional local
+    bucket (a script's own --rate) is honoured as well. DCA_RATE_LIMIT=0
+    turns the shared budgets off.
+    """
+
+    def __init__(self, env=None, api_key=None, local=None):
+        self.local = local
+        self.buckets = []
+        self.throttled = 0
+        self.configured = None
+        self.configure(env, api_key)
+
+    def configure(self, env=None, api_key=None):
+        """Use the budgets of this environment and tenant (a no-op if they are already in use)"""
+        if self.configured == (env, api_key):
+            return
+        self.configured = (env, api_key)
+        for bucket in self.buckets:
+            bucket.close()
+        self.buckets = []
+        if os.getenv('DCA_RATE_LIMIT', '1') == '0':
+            return
+        if api_key:
+            self.buckets.append(SharedTokenBucket(f"tenant-{tenant_id(api_key)}",
+                                                  configured_rate('DCA_RATE_TENANT', DEFAULT_TENANT_RATE)))
+        env_rate = configured_rate(f"DCA_RATE_{env.upper()}", None) if env else None
+        if env_rate:
+            self.buckets.append(SharedTokenBucket(f"env-{env}", env_rate))
+
+    @property
+    def waited(self):
+        return sum(bucket.waited for bucket in self.buckets) + (self.local.waited if self.local else 0.0)
+
+    def acquire(self, tokens=1):
+        waited = self.local.acquire(tokens) if self.local else 0.0
+        for bucket in self.buckets:
+            waited += bucket.acquire(tokens)
+        return waited
+
+    def throttle(self, response):
+        """Back every process off after a 429; returns the pause in seconds"""
+        seconds = retry_after(response)
+        self.throttled += 1
+        for bucket in self.buckets:
+            bucket.pause(seconds)
+        if not self.buckets:
+            time.sleep(seconds)
+        return seconds
+
+    def send(self, request, attempts=THROTTLE_ATTEMPTS, sample=None):
+        """Call request() under the budget, retrying while it answers 429; sample.retries counts the retries"""
+        for attempt in range(attempts):
+            if sample is not None:
+                sample.retries = attempt
+            self.acquire()
+            response = request()
+            if response.status_code != 429 or attempt + 1 == attempts:
+                return response
+            self.throttle(response)
+
+    def print_summary(self):
+        if self.throttled or self.waited >= 1:
+            print(f"🚦 Rate limit: waited {self.waited:.1f}s for tokens, {self.throttled} throttled (429) response(s)")
+
+    def close(self):
+        for bucket in self.buckets:
+            bucket.close()
+        self.buckets = []
+        self.configured = None
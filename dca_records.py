@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+DCA Compact Records
+Shared in-memory representation of x-xfdcawk rows for the analysis tools.
+
+A DcaRecord is a __slots__ object holding the row number and a tuple of
+values in file column order. Values of low-cardinality columns (bank and
+institution names, Y/N flags, fiscal years, dates) are interned, so
+millions of rows share one copy of each distinct string. Composite keys
+are (xfdcawkFilename, xfdcawkFiscalyear) tuples; they match the legacy
+"filename|fiscalyear".strip() strings exactly, except that a '|' inside a
+filename can no longer make two different keys collide.
+"""
+
+import csv
+import os
+import sys
+from collections import OrderedDict
+
+from dca_io import open_csv
+
+CSV_HEADER = [
+    "xfdcawkAltbranch", "xfdcawkBankacct", "xfdcawkBankcity", "xfdcawkBankname",
+    "xfdcawkBranch", "xfdcawkCaprefund", "xfdcawkCreatedon", "xfdcawkCurrefund",
+    "xfdcawkDcasubmitted", "xfdcawkDepaddoper", "xfdcawkDepdate", "xfdcawkDepno",
+    "xfdcawkErrormessage", "xfdcawkErrorstatus", "xfdcawkFilename", "xfdcawkFiscalperiod",
+    "xfdcawkFiscalyear", "xfdcawkFiscalyearendon", "xfdcawkFiscalyearstarton",
+    "xfdcawkInstname", "xfdcawkIsjvprocesseddate", "xfdcawkIsprocessed",
+    "xfdcawkIsprocesseddate", "xfdcawkJvnumber", "xfdcawkKeyeddate", "xfdcawkNspsubmitted",
+    "xfdcawkPyrlrefund", "xfdcawkRecdate", "xfdcawkTotaldep", "xfdcawkTotalrev", "id"
+]
+
+KEY_FIELDS = ('xfdcawkFilename', 'xfdcawkFiscalyear')
+
+# Columns with few distinct values; their strings are interned on load
+INTERNED_FIELDS = frozenset([
+    "xfdcawkAltbranch", "xfdcawkBankacct", "xfdcawkBankcity", "xfdcawkBankname",
+    "xfdcawkBranch", "xfdcawkCaprefund", "xfdcawkCreatedon", "xfdcawkCurrefund",
+    "xfdcawkDcasubmitted", "xfdcawkDepaddoper", "xfdcawkDepdate", "xfdcawkErrormessage",
+    "xfdcawkErrorstatus", "xfdcawkFiscalperiod", "xfdcawkFiscalyear", "xfdcawkFiscalyearendon",
+    "xfdcawkFiscalyearstarton", "xfdcawkInstname", "xfdcawkIsjvprocesseddate", "xfdcawkIsprocessed",
+    "xfdcawkIsprocesseddate", "xfdcawkKeyeddate", "xfdcawkNspsubmitted", "xfdcawkPyrlrefund",
+    "xfdcawkRecdate",
+])
+
+def record_key(filename, fiscalyear):
+    """Composite key equal to the legacy (filename + '|' + fiscalyear).strip()"""
+    return (filename.lstrip(), fiscalyear.rstrip())
+
+def csv_value(value):
+    """A fetched field value as csv.writer stores it: None becomes '', anything else str()"""
+    return '' if value is None else str(value)
+
+def key_string(key):
+    """Render a composite key the way the reports always have: filename|fiscalyear"""
+    return f"{key[0]}|{key[1]}"
+
+def parse_key(text):
+    """Composite key back from its filename|fiscalyear rendering (as written to the journals)"""
+    filename, _, fiscalyear = text.rpartition('|')
+    return (filename, fiscalyear)
+
+class RecordLayout:
+    """Column positions for one file header, shared by every record read from it"""
+
+    __slots__ = ('fields', 'index', 'filename_index', 'fiscalyear_index', 'interned_positions')
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.index = {field: position for position, field in enumerate(self.fields)}
+        self.filename_index = self.index[KEY_FIELDS[0]]
+        self.fiscalyear_index = self.index[KEY_FIELDS[1]]
+        self.interned_positions = tuple(position for position, field in enumerate(self.fields)
+                                        if field in INTERNED_FIELDS)
+
+    def make_record(self, row_number, values):
+        """Build a DcaRecord from one parsed CSV row, interning low-cardinality values"""
+        for position in self.interned_positions:
+            values[position] = sys.intern(values[position])
+        return DcaRecord(self, row_number, tuple(values))
+
+class DcaRecord:
+    """One x-xfdcawk row: row number plus a tuple of values in file column order"""
+
+    __slots__ = ('layout', 'row_number', 'values')
+
+    def __init__(self, layout, row_number, values):
+        self.layout = layout
+        self.row_number = row_number
+        self.values = values
+
+    def __getitem__(self, field):
+        return self.values[self.layout.index[field]]
+
+    def get(self, field, default=''):
+        position = self.layout.index.get(field)
+        return default if position is None else self.values[position]
+
+    @property
+    def filename(self):
+        return self.values[self.layout.filename_index]
+
+    @property
+    def fiscalyear(self):
+        return self.values[self.layout.fiscalyear_index]
+
+    @property
+    def key(self):
+        return record_key(self.filename, self.fiscalyear)
+
+    def as_dict(self):
+        return dict(zip(self.layout.fields, self.values))
+
+def iter_records(path):
+    """Yield DcaRecords (row numbers start at 1) from a plain, .gz or .xz CSV"""
+    with open_csv(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        layout = RecordLayout(header)
+        width = len(layout.fields)
+        row_number = 0
+        for values in reader:
+            # Blank lines are skipped without being counted, as csv.DictReader does
+            if not values:
+                continue
+            row_number += 1
+            if len(values) < width:
+                values.extend([''] * (width - len(values)))
+            yield layout.make_record(row_number, values)
+
+class RecordCache:
+    """Parsed records of recently read CSVs, reused while the file is unchanged (enabled by dca_daemon.py)"""
+
+    def __init__(self, enabled=False, max_files=4):
+        self.enabled = enabled
+        self.max_files = max_files
+        self._files = OrderedDict()
+        self.hits = 0
+        self.loads = 0
+
+    def records(self, path):
+        """A list of the file's records when enabled, else a streaming iterator"""
+        if not self.enabled:
+            return iter_records(path)
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        entry = self._files.get(path)
+        if entry is not None and entry[0] == signature:
+            self._files.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+        records = list(iter_records(path))
+        self._files[path] = (signature, records)
+        self._files.move_to_end(path)
+        self.loads += 1
+        while len(self._files) > self.max_files:
+            self._files.popitem(last=False)
+        return records
+
+    def cached(self):
+        """(path, record count) of every cached file, least recently used first"""
+        return [(path, len(records)) for path, (_, records) in self._files.items()]
+
+RECORD_CACHE = RecordCache()
+
+def load_records(path):
+    """Records of a CSV, streamed, or kept in memory by RECORD_CACHE when the daemon enables it"""
+    return RECORD_CACHE.records(path)
+
+def read_fieldnames(path):
+    """Return the header of a CSV artifact"""
+    with open_csv(path) as f:
+        return next(csv.reader(f), [])
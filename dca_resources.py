@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+DCA Resource Definitions
+Ethos custom resources the extraction engine (dca_extract.py) knows how to
+pull. x-xfdcawk is built in with its 31-column schema; sibling resources
+are listed in dca_resources.json next to the scripts:
+
+    {
+      "resources": [
+        {"name": "x-xfdcawd", "fields": ["xfdcawdFilename", "xfdcawdAmount", "id"]},
+        {"name": "x-xfdcawe", "path": "/api/x-xfdcawe", "output": "xdcawe_{env}.csv"}
+      ]
+    }
+
+A resource without "fields" has its schema inferred from the first page.
+Any x- resource name not in the file can also be extracted directly; it
+uses /api/<name>, an inferred schema and <name>_<env>.csv as output.
+"""
+
+import json
+import os
+from collections import namedtuple
+
+from dca_records import CSV_HEADER
+
+RESOURCES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dca_resources.json')
+
+Resource = namedtuple('Resource', ['name', 'path', 'fields', 'output'])
+
+BUILTIN_RESOURCES = {
+    'x-xfdcawk': Resource('x-xfdcawk', '/api/x-xfdcawk', tuple(CSV_HEADER), 'xdcawk_2025_{env}.csv'),
+}
+
+def make_resource(name, path=None, fields=None, output=None):
+    """Resource with the defaults used for resources that only give a name"""
+    return Resource(name, path or f"/api/{name}", tuple(fields) if fields else None,
+                    output or f"{name}_{{env}}.csv")
+
+def load_resources(resources_file=RESOURCES_FILE):
+    """Built-in resources plus those defined in the resources file (if it exists)"""
+    resources = dict(BUILTIN_RESOURCES)
+    if not os.path.exists(resources_file):
+        return resources
+    try:
+        with open(resources_file, 'r') as f:
+            definitions = json.load(f).get('resources', [])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in resource definitions {resources_file}: {e}")
+    for definition in definitions:
+        name = definition.get('name', '').strip()
+        if not name:
+            raise ValueError(f"Resource definition without a name in {resources_file}: {definition}")
+        resources[name] = make_resource(name, definition.get('path'), definition.get('fields'),
+                                        definition.get('output'))
+    return resources
+
+def resolve_resources(names, resources_file=RESOURCES_FILE):
+    """Resource definitions for the requested names (unknown names get an inferred schema)"""
+    resources = load_resources(resources_file)
+    return [resources.get(name) or make_resource(name) for name in names]
+
+def infer_fields(records):
+    """Field order from a page of records: first-seen order, with id last as in the DCA extracts"""
+    fields = {}
+    for record in records:
+        for field in record:
+            fields.setdefault(field, None)
+    ordered = [field for field in fields if field != 'id']
+    if 'id' in fields:
+        ordered.append('id')
+    return tuple(ordered)
+
+def record_row(record, fields):
+    """CSV row for one record; missing fields are blank and nested values are written as JSON"""
+    row = []
+    for field in fields:
+        value = record.get(field, '')
+        if value is None:
+            value = ''
+        elif isinstance(value, (dict, list)):
+            value = json.dumps(value, separators=(',', ':'), sort_keys=True)
+        row.append(value)
+    return row
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+DCA Snapshot History
+Keeps every extraction as a versioned snapshot without storing full copies:
+
+- The CSV is cut into row blocks at content-defined boundaries (a row
+  whose hash has its low bits clear ends a block), so an inserted or
+  deleted row only changes the block around it
+- Blocks are stored gzip-compressed under .dca_snapshots/blocks/ named by
+  their SHA-256, so a block shared by any number of snapshots (of either
+  environment) is stored once
+- A snapshot is a small manifest: the header plus the ordered list of
+  block hashes
+
+A delta between two snapshots only opens the blocks whose hashes differ;
+rows in shared blocks are unchanged by construction. The delta reports
+added, removed and changed ids. Rows are kept in extract order, so a
+reordered extract stores more new blocks but still deltas correctly.
+
+Usage:
+    python dca_snapshots.py save --env prod           # after dcawk_query_prod.py
+    python dca_snapshots.py list
+    python dca_snapshots.py delta --env prod 2026-10-13 latest
+    python dca_snapshots.py restore prod/20261013-070102 --output old_prod.csv
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+from datetime import datetime
+
+from dca_io import find_csv, open_csv
+
+STORE_DIR = '.dca_snapshots'
+# Average block of 256 rows, bounded so one block never gets tiny or huge
+BOUNDARY_MASK = (1 << 8) - 1
+MIN_BLOCK_ROWS = 32
+MAX_BLOCK_ROWS = 4096
+
+class SnapshotStore:
+    """Content-addressed row blocks plus one manifest per snapshot"""
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self.blocks_dir = os.path.join(store_dir, 'blocks')
+        self.manifests_dir = os.path.join(store_dir, 'manifests')
+
+    def block_path(self, block_hash):
+        return os.path.join(self.blocks_dir, block_hash[:2], f"{block_hash}.csv.gz")
+
+    def write_block(self, content):
+        """Store a block unless it already exists; returns (hash, bytes written)"""
+        block_hash = hashlib.sha256(content).hexdigest()
+        path = self.block_path(block_hash)
+        if os.path.exists(path):
+            return block_hash, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = gzip.compress(content, compresslevel=6, mtime=0)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        return block_hash, len(data)
+
+    def read_block(self, block_hash):
+        """Rows of a stored block"""
+        with gzip.open(self.block_path(block_hash), 'rt', encoding='utf-8', newline='') as f:
+            return list(csv.reader(f))
+
+    def save(self, env, source):
+        """Cut a CSV into blocks and write its manifest; returns the manifest"""
+        created = datetime.now()
+        snapshot_id = f"{env}/{created.strftime('%Y%m%d-%H%M%S')}"
+        path = os.path.join(self.manifests_dir, f"{snapshot_id}.json")
+        if os.path.exists(path):
+            raise ValueError(f"Snapshot {snapshot_id} already exists")
+        blocks = []
+        rows = 0
+        written = 0
+        with open_csv(source) as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            line_buffer = io.StringIO()
+            writer = csv.writer(line_buffer)
+            block = []
+            for row in reader:
+                if not row:
+                    continue
+                line_buffer.seek(0)
+                line_buffer.truncate()
+                writer.writerow(row)
+                line = line_buffer.getvalue().encode('utf-8')
+                block.append(line)
+                rows += 1
+                boundary = int.from_bytes(hashlib.blake2b(line, digest_size=8).digest(), 'little') & BOUNDARY_MASK == 0
+                if len(block) >= MAX_BLOCK_ROWS or (boundary and len(block) >= MIN_BLOCK_ROWS):
+                    block_hash, size = self.write_block(b''.join(block))
+                    blocks.append([block_hash, len(block)])
+                    written += size
+                    block = []
+            if block:
+                block_hash, size = self.write_block(b''.join(block))
+                blocks.append([block_hash, len(block)])
+                written += size
+
+        manifest = {'snapshot': snapshot_id, 'env': env, 'source': source,
+                    'created': created.isoformat(timespec='seconds'), 'header': header,
+                    'rows': rows, 'blocks': blocks, 'bytes_written': written}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(manifest, f)
+        return manifest
+
+    def snapshots(self, env=None):
+        """Snapshot ids, oldest first"""
+        ids = []
+        envs = [env] if env else sorted(os.listdir(self.manifests_dir)) if os.path.isdir(self.manifests_dir) else []
+        for name in envs:
+            directory = os.path.join(self.manifests_dir, name)
+            if os.path.isdir(directory):
+                ids.extend(f"{name}/{filename[:-5]}" for filename in sorted(os.listdir(directory))
+                           if filename.endswith('.json'))
+        return ids
+
+    def load(self, snapshot_id):
+        with open(os.path.join(self.manifests_dir, f"{snapshot_id}.json"), 'r') as f:
+            return json.load(f)
+
+    def resolve(self, env, reference):
+        """Snapshot id from 'latest', 'previous', an id, or a day (YYYY-MM-DD: the last snapshot that day)"""
+        ids = self.snapshots(env)
+        if not ids:
+            raise ValueError(f"No {env} snapshots in {self.store_dir}")
+        if reference == 'latest':
+            return ids[-1]
+        if reference == 'previous':
+            if len(ids) < 2:
+                raise ValueError(f"Only one {env} snapshot exists")
+            return ids[-2]
+        if reference in ids or f"{env}/{reference}" in ids:
+            return reference if reference in ids else f"{env}/{reference}"
+        day = reference.replace('-', '')
+        matches = [snapshot_id for snapshot_id in ids if snapshot_id.split('/', 1)[1].startswith(day)]
+        if not matches:
+            raise ValueError(f"No {env} snapshot matches {reference}")
+        return matches[-1]
+
+    def restore(self, snapshot_id, output):
+        """Write a snapshot back out as a CSV"""
+        manifest = self.load(snapshot_id)
+        with open_csv(output, 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow(manifest['header'])
+            for block_hash, _ in manifest['blocks']:
+                writer.writerows(self.read_block(block_hash))
+        return manifest['rows']
+
+    def store_size(self):
+        total = 0
+        for root, _, files in os.walk(self.store_dir):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+def delta(store, old_id, new_id):
+    """Added, removed and changed ids between two snapshots, opening only the blocks that differ"""
+    old, new = store.load(old_id), store.load(new_id)
+    old_hashes = {block_hash for block_hash, _ in old['blocks']}
+    new_hashes = {block_hash for block_hash, _ in new['blocks']}
+
+    def rows_by_id(manifest, hashes):
+        id_index = manifest['header'].index('id')
+        rows = {}
+        for block_hash in hashes:
+            for row in store.read_block(block_hash):
+                rows[row[id_index] if id_index < len(row) else ''] = row
+        return rows
+
+    old_rows = rows_by_id(old, old_hashes - new_hashes)
+    new_rows = rows_by_id(new, new_hashes - old_hashes)
+    added = sorted(set(new_rows) - set(old_rows))
+    removed = sorted(set(old_rows) - set(new_rows))
+    changed = sorted(record_id for record_id in set(old_rows) & set(new_rows)
+                     if old_rows[record_id] != new_rows[record_id])
+    stats = {'blocks_compared': len(old_hashes ^ new_hashes),
+             'blocks_shared': len(old_hashes & new_hashes)}
+    return added, removed, changed, old_rows, new_rows, stats
+
+def write_delta(path, header, added, removed, changed, old_rows, new_rows):
+    """One line per changed id: change type, key and (for changes) the fields that differ"""
+    filename_index = header.index('xfdcawkFilename') if 'xfdcawkFilename' in header else None
+    fiscalyear_index = header.index('xfdcawkFiscalyear') if 'xfdcawkFiscalyear' in header else None
+
+    def key(row):
+        return [row[filename_index] if filename_index is not None else '',
+                row[fiscalyear_index] if fiscalyear_index is not None else '']
+
+    with open_csv(path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(['change', 'id', 'xfdcawkFilename', 'xfdcawkFiscalyear', 'fields'])
+        for record_id in added:
+            writer.writerow(['added', record_id] + key(new_rows[record_id]) + [''])
+        for record_id in removed:
+            writer.writerow(['removed', record_id] + key(old_rows[record_id]) + [''])
+        for record_id in changed:
+            before, after = old_rows[record_id], new_rows[record_id]
+            fields = [field for position, field in enumerate(header)
+                      if (before[position:position + 1] or [''])[0] != (after[position:position + 1] or [''])[0]]
+            writer.writerow(['changed', record_id] + key(after) + [' '.join(fields)])
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Versioned DCA snapshots with deduplicated block storage")
+    parser.add_argument('--store', default=STORE_DIR, help=f"snapshot store directory (default {STORE_DIR})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    save = commands.add_parser('save', help="store the current extract as a snapshot")
+    save.add_argument('--env', choices=['prod', 'test'], default='prod')
+    save.add_argument('--file', help="CSV to store (default the environment's extract)")
+    listing = commands.add_parser('list', help="list snapshots")
+    listing.add_argument('--env', choices=['prod', 'test'])
+    changes = commands.add_parser('delta', help="added, removed and changed ids between two snapshots")
+    changes.add_argument('--env', choices=['prod', 'test'], default='prod')
+    changes.add_argument('old', nargs='?', default='previous', help="snapshot id, day or 'previous' (default)")
+    changes.add_argument('new', nargs='?', default='latest', help="snapshot id, day or 'latest' (default)")
+    changes.add_argument('--output', help="delta CSV (default dca_delta_<env>.csv)")
+    restore = commands.add_parser('restore', help="write a snapshot back out as a CSV")
+    restore.add_argument('snapshot', help="snapshot id, e.g. prod/20261013-070102")
+    restore.add_argument('--output', required=True)
+    return parser.parse_args()
+
+def main(args):
+    store = SnapshotStore(args.store)
+    try:
+        if args.command == 'save':
+            source = args.file or find_csv(f"xdcawk_2025_{args.env}.csv")
+            if not os.path.exists(source):
+                print(f"❌ {source} not found; run the {args.env} extraction first")
+                sys.exit(1)
+            manifest = store.save(args.env, source)
+            print(f"📸 Snapshot {manifest['snapshot']}: {manifest['rows']} rows in {len(manifest['blocks'])} blocks")
+            print(f"💾 {manifest['bytes_written']:,} new bytes stored; store is {store.store_size():,} bytes")
+
+        elif args.command == 'list':
+            for snapshot_id in store.snapshots(args.env):
+                manifest = store.load(snapshot_id)
+                print(f"{snapshot_id}  {manifest['created']}  {manifest['rows']:>9} rows  "
+                      f"{len(manifest['blocks']):>6} blocks  {manifest['bytes_written']:>12,} new bytes")
+            print(f"💾 Store size: {store.store_size():,} bytes")
+
+        elif args.command == 'delta':
+            old_id, new_id = store.resolve(args.env, args.old), store.resolve(args.env, args.new)
+            added, removed, changed, old_rows, new_rows, stats = delta(store, old_id, new_id)
+            output = args.output or f"dca_delta_{args.env}.csv"
+            write_delta(output, store.load(new_id)['header'], added, removed, changed, old_rows, new_rows)
+            print(f"🔀 {old_id} → {new_id}")
+            print(f"📦 Blocks shared: {stats['blocks_shared']}, opened: {stats['blocks_compared']}")
+            print(f"📊 Added: {len(added)}, removed: {len(removed)}, changed: {len(changed)}")
+            print(f"📁 Delta written to {output}")
+
+        elif args.command == 'restore':
+            rows = store.restore(args.snapshot, args.output)
+            print(f"📁 Restored {rows} rows of {args.snapshot} to {args.output}")
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(parse_args())
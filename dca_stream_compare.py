@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+DCA Streaming Compare
+Extracts PROD and TEST concurrently and compares them while the pages are
+still arriving, instead of writing both CSVs and only then starting
+dcawk_compare.py:
+- Every page is keyed by (xfdcawkFilename, xfdcawkFiscalyear) as soon as
+  it lands, from either environment, in any order
+- A PROD record whose key has already been seen in TEST is settled at
+  once; the rest wait until the last TEST page lands, after which every
+  waiting and every later PROD record without a TEST match is written to
+  the diff file immediately
+- The diff is complete the moment the last page arrives
+
+The PROD and TEST extracts are still written (in page order) unless
+--no-extracts is given, so the rest of the workflow works unchanged.
+Diff rows are written in the order they become certain, not PROD file
+order. dca_workflow.py --streaming runs this in place of the two query
+stages and the compare stage.
+"""
+
+import argparse
+import csv
+import math
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dca_extract import EthosClient
+from dca_fingerprint import get_env_api_key
+from dca_io import csv_path, open_csv
+from dca_metrics import MetricsRecorder
+from dca_profile import Profiler
+from dca_records import CSV_HEADER, csv_value, key_string, record_key
+from dca_trace import Tracer
+from dcawk_query_prod import process_record
+
+RESOURCE_PATH = "/api/x-xfdcawk"
+PAGE_SIZE = 1000
+FILENAME_INDEX = CSV_HEADER.index('xfdcawkFilename')
+FISCALYEAR_INDEX = CSV_HEADER.index('xfdcawkFiscalyear')
+
+def row_key(row):
+    """Composite key of a fetched row, from its values as the extract CSV stores them (None -> '')"""
+    return record_key(csv_value(row[FILENAME_INDEX]), csv_value(row[FISCALYEAR_INDEX]))
+
+# Disabled unless --profile / --trace is given
+PROFILER = Profiler()
+TRACER = Tracer()
+
+class OrderedPageWriter:
+    """Writes pages to a CSV in page order as soon as every earlier page has arrived"""
+
+    def __init__(self, csvwrite):
+        self.csvwrite = csvwrite
+        self.next_page = 0
+        self.waiting = {}
+
+    def add(self, page, rows):
+        self.waiting[page] = rows
+        while self.next_page in self.waiting:
+            self.csvwrite.writerows(self.waiting.pop(self.next_page))
+            self.next_page += 1
+
+    def skip(self, page):
+        """Record a page that failed so later pages are not held back"""
+        self.add(page, [])
+
+class StreamingCompare:
+    """Incremental PROD-vs-TEST key comparison fed one page at a time"""
+
+    def __init__(self, diff_writer):
+        self.diff_writer = diff_writer
+        self.test_ids = set()
+        self.test_rows = 0
+        self.prod_ids = set()
+        self.prod_rows = 0
+        self.waiting = {}
+        self.test_complete = False
+        self.diff_count = 0
+
+    def _emit(self, row_number, prod_id, row):
+        print(f"Row {row_number}: PROD ID='{key_string(prod_id)}' (missing in test)")
+        self.diff_writer.writerow(row)
+        self.diff_count += 1
+
+    def add_test_page(self, page, rows):
+        for index, row in enumerate(rows):
+            self.test_rows += 1
+            test_id = row_key(row)
+            if test_id in self.test_ids:
+                print(f"WARNING: Duplicate TEST ID found: \"xfdcawkFilename\":\"{csv_value(row[FILENAME_INDEX])}\", "
+                      f"\"xfdcawkFiscalyear\":\"{csv_value(row[FISCALYEAR_INDEX])}\" at row {page * PAGE_SIZE + index + 1}")
+            else:
+                self.test_ids.add(test_id)
+                # PROD rows waiting on this key are now known to have a match
+                self.waiting.pop(test_id, None)
+
+    def add_prod_page(self, page, rows):
+        for index, row in enumerate(rows):
+            self.prod_rows += 1
+            row_number = page * PAGE_SIZE + index + 1
+            prod_id = row_key(row)
+            if prod_id in self.prod_ids:
+                print(f"WARNING: Duplicate PROD ID found: \"xfdcawkFilename\":\"{csv_value(row[FILENAME_INDEX])}\", "
+                      f"\"xfdcawkFiscalyear\":\"{csv_value(row[FISCALYEAR_INDEX])}\" at row {row_number}")
+            else:
+                self.prod_ids.add(prod_id)
+            if prod_id in self.test_ids:
+                continue
+            if self.test_complete:
+                self._emit(row_number, prod_id, row)
+            else:
+                self.waiting.setdefault(prod_id, []).append((row_number, row))
+
+    def complete_test(self):
+        """The last TEST page has landed: every waiting PROD row is a difference"""
+        self.test_complete = True
+        for prod_id, rows in sorted(self.waiting.items(), key=lambda item: item[1][0][0]):
+            for row_number, row in rows:
+                self._emit(row_number, prod_id, row)
+        self.waiting = {}
+
+    def print_summary(self):
+        """Print the same statistics as dcawk_compare.py"""
+        print(f"Test file: {self.test_rows} rows, {len(self.test_ids)} unique IDs")
+        print(f"Prod file: {self.prod_rows} rows, {len(self.prod_ids)} unique IDs")
+        print(f"Differences found: {self.diff_count} out of {self.prod_rows} total rows")
+        if len(self.prod_ids) != self.prod_rows:
+            print(f"WARNING: Found {self.prod_rows - len(self.prod_ids)} duplicate IDs in PROD file")
+        if len(self.test_ids) != self.test_rows:
+            print(f"WARNING: Found {self.test_rows - len(self.test_ids)} duplicate IDs in TEST file")
+        expected_diff = len(self.prod_ids) - len(self.test_ids)
+        print(f"Expected differences based on unique IDs: {expected_diff}")
+        if self.diff_count != expected_diff:
+            print(f"MISMATCH: Found {self.diff_count} differences but expected {expected_diff}")
+            print("This suggests there might be duplicate IDs or other data issues.")
+
+def fetch_page(client, env, page):
+    """Fetch and convert one page of records from one environment"""
+    with TRACER.span('page_request', env=env, offset=page * PAGE_SIZE):
+        response = client.get(RESOURCE_PATH, f"query_table_{env}",
+                              {'limit': str(PAGE_SIZE), 'offset': str(page * PAGE_SIZE)})
+    with TRACER.span('row_build', env=env, offset=page * PAGE_SIZE):
+        return [process_record(line) for line in response.json()]
+
+def count_records(client, env):
+    """x-total-count of one environment"""
+    with TRACER.span('query_count', env=env):
+        response = client.get(RESOURCE_PATH, f"query_count_{env}", {'limit': '1'})
+    return int(response.headers['x-total-count'])
+
+def stream_compare(clients, diff_writer, extract_writers, workers=10):
+    """Fetch both environments over one pool and compare pages as they land; returns (compare, failed pages)"""
+    compare = StreamingCompare(diff_writer)
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        counts = {env: executor.submit(count_records, client, env) for env, client in clients.items()}
+        pages = {}
+        for env, future in counts.items():
+            pages[env] = math.ceil(future.result() / PAGE_SIZE)
+            print(f"📊 {env.upper()}: {future.result()} records, {pages[env]} batches")
+
+        # Interleave the environments so both progress together
+        pending = {}
+        for page in range(max(pages.values())):
+            for env in ('prod', 'test'):
+                if page < pages[env]:
+                    future = executor.submit(PROFILER.wrap(fetch_page), clients[env], env, page)
+                    pending[future] = (env, page)
+
+        remaining = dict(pages)
+        if remaining['test'] == 0:
+            compare.complete_test()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                env, page = pending.pop(future)
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    print(f"❌ {env.upper()} batch {page+1} failed: {e}")
+                    failed.append((env, page))
+                    rows = []
+                with TRACER.span('compare_page', env=env, page=page):
+                    if env == 'test':
+                        compare.add_test_page(page, rows)
+                    else:
+                        compare.add_prod_page(page, rows)
+                if extract_writers:
+                    extract_writers[env].add(page, rows)
+                remaining[env] -= 1
+                if env == 'test' and remaining['test'] == 0:
+                    print(f"✅ Last TEST page landed; remaining PROD pages are compared on arrival")
+                    compare.complete_test()
+    return compare, failed
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Extract PROD and TEST and compare them while pages arrive")
+    parser.add_argument('--workers', type=int, default=10,
+                        help="worker pool shared by both environments (default 10)")
+    parser.add_argument('--no-extracts', action='store_true',
+                        help="only write the diff file, not the PROD and TEST extracts")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write a Chrome trace-event JSON timeline of this run to FILE")
+    return parser.parse_args()
+
+def main(args):
+    """Authenticate both environments, run the streaming compare and write its outputs"""
+    print("🚀 Starting streaming PROD/TEST extraction and compare...")
+    start_time = time.time()
+    metrics = MetricsRecorder('stream')
+    clients = {}
+    for env in ('prod', 'test'):
+        api_key = get_env_api_key(env)
+        if not api_key:
+            print(f"❌ No {env} API key found (set ELLUCIAN_API_KEY_{env.upper()} or api_config.json)")
+            sys.exit(1)
+        clients[env] = EthosClient(api_key, metrics, pool_size=args.workers, tracer=TRACER, env=env)
+        clients[env].authenticate()
+    print("✅ Authentication successful")
+
+    diff_file = csv_path('xdcawk_2025_diff.csv')
+    extract_files = {env: csv_path(f"xdcawk_2025_{env}.csv") for env in ('prod', 'test')}
+    open_files = []
+    try:
+        diff_handle = open_csv(diff_file, 'w')
+        open_files.append(diff_handle)
+        diff_writer = csv.writer(diff_handle)
+        diff_writer.writerow(CSV_HEADER)
+        extract_writers = {}
+        if not args.no_extracts:
+            for env, filename in extract_files.items():
+                handle = open_csv(filename, 'w')
+                open_files.append(handle)
+                csvwrite = csv.writer(handle)
+                csvwrite.writerow(CSV_HEADER)
+                extract_writers[env] = OrderedPageWriter(csvwrite)
+        compare, failed = stream_compare(clients, diff_writer, extract_writers, args.workers)
+    finally:
+        for handle in open_files:
+            handle.close()
+        for client in clients.values():
+            client.close()
+
+    compare.print_summary()
+    duration = time.time() - start_time
+    print(f"\n🎉 Streaming compare completed!")
+    print(f"📁 Diff file: {diff_file}")
+    if not args.no_extracts:
+        print(f"📁 Extracts: {extract_files['prod']}, {extract_files['test']}")
+    print(f"⏱️  Total time: {duration:.2f} seconds")
+    for env, client in clients.items():
+        client.transport.print_summary(f"{env.upper()} transport")
+    metrics.print_summary()
+    json_file, prom_file = metrics.write()
+    print(f"📈 Metrics written to {json_file} and {prom_file}")
+
+    if failed:
+        print(f"❌ {len(failed)} batch(es) failed; the diff is incomplete")
+        sys.exit(1)
+    print("Comparison complete!")
+
+if __name__ == "__main__":
+    args = parse_args()
+    PROFILER.enabled = args.profile
+    TRACER.enabled = bool(args.trace)
+    try:
+        with PROFILER.stage('stream_compare'):
+            main(args)
+    finally:
+        if args.trace:
+            TRACER.write(args.trace)
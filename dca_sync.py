@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+DCA Sync Engine
+Brings TEST in line with PROD directly from the two extracts, without the
+diff-CSV hop through dcawk_create_test.py. Every key
+(xfdcawkFilename, xfdcawkFiscalyear) is classified once:
+
+- PROD-only keys are POSTed to TEST (same body rules as dcawk_create_test.py:
+  JV fields dropped, nil id, xfdcawkCreatedon set to today)
+- Keys whose synced fields differ are PUT over the TEST record, keeping
+  TEST's own JV fields and xfdcawkCreatedon
+- TEST-only keys, and every extra TEST row of a duplicated key, are DELETEd
+
+Without --apply only the plan is printed and written to dca_sync_plan.jsonl.
+With --apply the operations run concurrently under a token-bucket rate limit,
+in batches of --batch-size. Each operation is journaled (dca_sync_journal.jsonl)
+as pending before it is sent and again, flushed, the moment it finishes.
+A rerun against the same extracts skips the finished operations. One left
+pending by an interrupted run, or failed without an HTTP response (a
+timeout or reset connection), may or may not have reached TEST, so its key
+is looked up first and an existing record is not POSTed twice (a DELETE
+that finds the record gone counts as done). Afterwards the TEST record
+count is checked against the number of unique PROD keys.
+
+Usage:
+    python dca_sync.py                 # dry run: show the plan
+    python dca_sync.py --apply         # execute it
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import requests
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+
+from dca_extract import EthosClient
+from dca_fingerprint import get_env_api_key
+from dca_io import find_csv
+from dca_metrics import MetricsRecorder
+from dca_partitions import criteria_param
+from dca_profile import Profiler
+from dca_ratelimit import TokenBucket
+from dca_records import iter_records, key_string
+
+RESOURCE_PATH = "/api/x-xfdcawk"
+NIL_ID = '00000000-0000-0000-0000-000000000000'
+JOURNAL_FILE = 'dca_sync_journal.jsonl'
+PLAN_FILE = 'dca_sync_plan.jsonl'
+
+# Fields TEST does not take from PROD: JV processing state, the record id and the load date
+UNSYNCED_FIELDS = ('xfdcawkJvnumber', 'xfdcawkIsjvprocesseddate', 'id', 'xfdcawkCreatedon')
+# Fields a PUT copies from the TEST record it replaces
+TEST_OWNED_FIELDS = ('xfdcawkJvnumber', 'xfdcawkIsjvprocesseddate', 'xfdcawkCreatedon')
+
+SyncOp = namedtuple('SyncOp', ['op_id', 'op', 'key', 'test_id', 'body', 'fields'])
+
+def synced_fields(fields):
+    """Drop the fields TEST does not take from PROD from a field -> value dict"""
+    return {field: value for field, value in fields.items() if field not in UNSYNCED_FIELDS}
+
+def synced_values(record):
+    """Values compared between PROD and TEST, as a field -> value dict"""
+    return synced_fields(dict(zip(record.layout.fields, record.values)))
+
+def operation_id(op, key, test_id, values):
+    """Stable id of an operation: the same change against the same record always gets the same id"""
+    payload = json.dumps([op, key_string(key), test_id, values], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+def make_op(op, key, test_id='', values=None, kept=None, fields=()):
+    """Build a SyncOp; POST/PUT bodies follow the dcawk_create_test.py rules, a PUT adds the kept TEST fields"""
+    body = None
+    if op == 'POST':
+        body = dict(values, id=NIL_ID, xfdcawkCreatedon=date.today().strftime('%Y-%m-%d'))
+    elif op == 'PUT':
+        body = dict(values, id=test_id, **(kept or {}))
+    return SyncOp(operation_id(op, key, test_id, values), op, key, test_id, body, tuple(fields))
+
+def build_plan(prod_file, test_file):
+    """Classify every key of the two extracts; returns (operations, stats)"""
+    prod = {}
+    prod_rows = 0
+    for record in iter_records(prod_file):
+        prod_rows += 1
+        if record.key in prod:
+            print(f"WARNING: Duplicate PROD ID '{key_string(record.key)}' at row {record.row_number}; "
+                  f"the first occurrence is synced")
+            continue
+        prod[record.key] = synced_values(record)
+
+    test = {}
+    test_rows = 0
+    for record in iter_records(test_file):
+        test_rows += 1
+        test.setdefault(record.key, []).append(record)
+
+    deletes, puts, posts = [], [], []
+    for key, records in test.items():
+        values = prod.get(key)
+        if values is None:
+            deletes.extend(make_op('DELETE', key, record['id']) for record in records)
+            continue
+        # Keep the TEST row that already matches PROD, else the first one
+        keep = next((record for record in records if synced_values(record) == values), records[0])
+        deletes.extend(make_op('DELETE', key, record['id']) for record in records if record is not keep)
+        current = synced_values(keep)
+        if current != values:
+            changed = [field for field in values if current.get(field, '') != values[field]]
+            # A PUT replaces the whole record; an empty CSV value was null and is left out
+            kept = {field: keep.get(field) for field in TEST_OWNED_FIELDS if keep.get(field)}
+            puts.append(make_op('PUT', key, keep['id'], values, kept, changed))
+    for key, values in prod.items():
+        if key not in test:
+            posts.append(make_op('POST', key, values=values))
+
+    stats = {'prod_rows': prod_rows, 'prod_keys': len(prod), 'test_rows': test_rows, 'test_keys': len(test)}
+    return deletes + puts + posts, stats
+
+def write_plan(operations, plan_file=PLAN_FILE):
+    """Write the plan, one operation per line"""
+    with open(plan_file, 'w') as f:
+        for operation in operations:
+            f.write(json.dumps({'op_id': operation.op_id, 'op': operation.op, 'key': key_string(operation.key),
+                                'test_id': operation.test_id, 'fields': list(operation.fields)}) + "\n")
+
+def read_journal(journal_file=JOURNAL_FILE):
+    """Yield the entries of a JSONL journal (nothing if it does not exist)"""
+    if not os.path.exists(journal_file):
+        return
+    with open(journal_file, 'r') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+
+def load_journal(journal_file=JOURNAL_FILE):
+    """(op_ids that completed, op_ids an earlier run sent without a definite outcome)"""
+    done, pending = set(), set()
+    for entry in read_journal(journal_file):
+        if 'op_id' not in entry:
+            continue
+        # Only an HTTP error response proves a failed operation never took effect
+        if entry.get('status') == 'pending' or (entry.get('status') == 'failed' and not entry.get('http_status')):
+            pending.add(entry['op_id'])
+        else:
+            pending.discard(entry['op_id'])
+            if entry.get('status') == 'done':
+                done.add(entry['op_id'])
+    return done, pending - done
+
+def existing_id(client, key):
+    """id of a TEST record that already has this key, or None"""
+    criteria = {'xfdcawkFilename': key[0], 'xfdcawkFiscalyear': key[1]}
+    response = client.get(RESOURCE_PATH, 'sync_lookup', {'criteria': criteria_param(criteria), 'limit': '1'})
+    records = response.json()
+    return records[0].get('id', '') if records else None
+
+def apply_op(client, operation, uncertain=False):
+    """Run one operation against TEST and return the affected TEST id; uncertain = an interrupted run may have applied it"""
+    if operation.op == 'POST':
+        if uncertain:
+            record_id = existing_id(client, operation.key)
+            if record_id is not None:
+                print(f"⏭️  POST {key_string(operation.key)} already reached TEST (id {record_id})")
+                return record_id
+        response = client.request('POST', RESOURCE_PATH, 'sync_post', json=operation.body)
+        return response.json().get('id', '')
+    if operation.op == 'PUT':
+        client.request('PUT', f"{RESOURCE_PATH}/{operation.test_id}", 'sync_put', json=operation.body)
+    else:
+        try:
+            client.request('DELETE', f"{RESOURCE_PATH}/{operation.test_id}", 'sync_delete')
+        except requests.exceptions.HTTPError as e:
+            if not (uncertain and e.response is not None and e.response.status_code == 404):
+                raise
+    return operation.test_id
+
+def run_sync(client, operations, journal_file=JOURNAL_FILE, batch_size=200, workers=8):
+    """Apply the operations in journaled batches; returns (applied, skipped, failed) counts"""
+    done, pending = load_journal(journal_file)
+    todo = [operation for operation in operations if operation.op_id not in done]
+    skipped = len(operations) - len(todo)
+    if skipped:
+        print(f"⏭️  {skipped} operation(s) already in the journal are skipped")
+    uncertain = sum(1 for operation in todo if operation.op_id in pending)
+    if uncertain:
+        print(f"🔎 {uncertain} operation(s) left without a definite outcome by an earlier run are checked against TEST first")
+    counts = {'done': 0, 'failed': 0}
+    run = datetime.now().isoformat(timespec='seconds')
+
+    def write_entry(journal, operation, **fields):
+        entry = {'run': run, 'op_id': operation.op_id, 'op': operation.op, 'key': key_string(operation.key),
+                 'test_id': operation.test_id, 'at': datetime.now().isoformat(timespec='seconds')}
+        entry.update(fields)
+        journal.write(json.dumps(entry) + "\n")
+        journal.flush()
+
+    def record_outcome(journal, operation, future):
+        try:
+            write_entry(journal, operation, status='done', id=future.result())
+            counts['done'] += 1
+        except Exception as e:
+            print(f"❌ {operation.op} {key_string(operation.key)} failed: {e}")
+            response = getattr(e, 'response', None)
+            if response is not None:
+                write_entry(journal, operation, status='failed', error=str(e), http_status=response.status_code)
+            else:
+                write_entry(journal, operation, status='failed', error=str(e))
+            counts['failed'] += 1
+
+    with open(journal_file, 'a') as journal, ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(todo), batch_size):
+            batch = todo[start:start + batch_size]
+            # Written ahead, so a rerun knows which operations may already have reached TEST
+            for operation in batch:
+                write_entry(journal, operation, status='pending')
+            os.fsync(journal.fileno())
+            futures = {executor.submit(apply_op, client, operation, operation.op_id in pending): operation
+                       for operation in batch}
+            try:
+                for future in as_completed(futures):
+                    record_outcome(journal, futures.pop(future), future)
+            finally:
+                # Interrupted: stop what has not started, journal whatever still finishes
+                for future in list(futures):
+                    if future.cancel():
+                        futures.pop(future)
+                for future, operation in futures.items():
+                    record_outcome(journal, operation, future)
+                os.fsync(journal.fileno())
+            print(f"📦 Batch {start // batch_size + 1}: {start + len(batch)}/{len(todo)} operations")
+    return counts['done'], skipped, counts['failed']
+
+def count_test(client):
+    """x-total-count of TEST"""
+    response = client.get(RESOURCE_PATH, 'sync_count', {'limit': '1'})
+    return int(response.headers['x-total-count'])
+
+def print_plan(operations, stats, show=5):
+    """Summarise the plan with a few examples of each operation"""
+    print(f"Prod file: {stats['prod_rows']} rows, {stats['prod_keys']} unique IDs")
+    print(f"Test file: {stats['test_rows']} rows, {stats['test_keys']} unique IDs")
+    for op, label in (('POST', 'PROD-only records to create'), ('PUT', 'changed records to update'),
+                      ('DELETE', 'TEST-only/duplicate records to delete')):
+        selected = [operation for operation in operations if operation.op == op]
+        print(f"  {op:<6} {len(selected):>6}  {label}")
+        for operation in selected[:show]:
+            detail = f" ({', '.join(operation.fields)})" if operation.fields else ''
+            target = f" id={operation.test_id}" if operation.test_id else ''
+            print(f"         {key_string(operation.key)}{target}{detail}")
+        if len(selected) > show:
+            print(f"         ... {len(selected) - show} more")
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Sync TEST to PROD with POST/PUT/DELETE from the extracts")
+    parser.add_argument('--apply', action='store_true', help="execute the plan (default: dry run)")
+    parser.add_argument('--prod-file', help="PROD extract (default xdcawk_2025_prod.csv)")
+    parser.add_argument('--test-file', help="TEST extract (default xdcawk_2025_test.csv)")
+    parser.add_argument('--journal', default=JOURNAL_FILE, help=f"journal file (default {JOURNAL_FILE})")
+    parser.add_argument('--batch-size', type=int, default=200,
+                        help="operations per journaled batch (default 200)")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent requests (default 8)")
+    parser.add_argument('--rate', type=float, default=10.0, help="requests per second to TEST (default 10)")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    return parser.parse_args()
+
+def main(args):
+    """Plan the sync and, with --apply, run and verify it"""
+    prod_file = args.prod_file or find_csv('xdcawk_2025_prod.csv')
+    test_file = args.test_file or find_csv('xdcawk_2025_test.csv')
+    for filename in (prod_file, test_file):
+        if not os.path.exists(filename):
+            print(f"❌ {filename} not found; run the PROD and TEST extractions first")
+            sys.exit(1)
+
+    print(f"🔍 Planning sync of {test_file} to {prod_file}...")
+    operations, stats = build_plan(prod_file, test_file)
+    print_plan(operations, stats)
+    write_plan(operations)
+    print(f"📁 Plan written to {PLAN_FILE}")
+    if not args.apply:
+        print("💡 Dry run only; rerun with --apply to execute the plan")
+        return
+    if not operations:
+        print("✅ TEST is already in sync with PROD")
+        return
+
+    api_key = get_env_api_key('test')
+    if not api_key:
+        print("❌ No test API key found (set ELLUCIAN_API_KEY_TEST or api_config.json)")
+        sys.exit(1)
+    start_time = time.time()
+    metrics = MetricsRecorder('sync')
+    client = EthosClient(api_key, metrics, limiter=TokenBucket(args.rate), pool_size=args.workers, env='test')
+    try:
+        client.authenticate()
+        print("✅ Authentication successful")
+        applied, skipped, failed = run_sync(client, operations, args.journal, args.batch_size, args.workers)
+        test_count = count_test(client)
+    finally:
+        client.close()
+
+    duration = time.time() - start_time
+    print(f"\n🎉 Sync completed!")
+    print(f"📊 Applied: {applied}, skipped (journal): {skipped}, failed: {failed}")
+    print(f"🔎 TEST now holds {test_count} records; PROD has {stats['prod_keys']} unique IDs")
+    verified = test_count == stats['prod_keys']
+    if verified:
+        print("✅ Verification count matches")
+    else:
+        print(f"MISMATCH: TEST differs from PROD by {test_count - stats['prod_keys']} records")
+    print(f"📁 Journal: {args.journal}")
+    print(f"⏱️  Total time: {duration:.2f} seconds")
+    metrics.print_summary()
+    metrics.write()
+    if failed or not verified:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    args = parse_args()
+    with Profiler(enabled=args.profile).stage('sync'):
+        main(args)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+DCA Tenant Registry
+The colleges (Ethos tenants) the fan-out runner extracts, read from
+dca_tenants.json next to the scripts:
+
+    {
+      "default_rate": 5,
+      "tenants": [
+        {"name": "Isothermal CC", "api_key_env": "ELLUCIAN_API_KEY_ISOTHERMAL"},
+        {"name": "Wake Tech", "api_key": "...", "rate": 10}
+      ]
+    }
+
+Each tenant needs a name and either an inline api_key or the name of an
+environment variable holding it; rate (requests/second) is optional.
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+
+TENANTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dca_tenants.json')
+DEFAULT_RATE = 5.0
+
+Tenant = namedtuple('Tenant', ['name', 'slug', 'api_key', 'rate'])
+
+def tenant_slug(name):
+    """Directory-safe form of a tenant name"""
+    return re.sub(r'[^a-z0-9]+', '_', name.strip().lower()).strip('_')
+
+def load_tenants(tenants_file=TENANTS_FILE, only=None):
+    """Load the registry; `only` restricts it to the given names or slugs"""
+    try:
+        with open(tenants_file, 'r') as f:
+            registry = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"Tenant registry not found: {tenants_file}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in tenant registry {tenants_file}: {e}")
+
+    default_rate = float(registry.get('default_rate', DEFAULT_RATE))
+    wanted = {tenant_slug(name) for name in only} if only else None
+    tenants = []
+    seen = set()
+    for entry in registry.get('tenants', []):
+        name = entry.get('name', '').strip()
+        if not name:
+            raise ValueError(f"Tenant entry without a name in {tenants_file}: {entry}")
+        slug = tenant_slug(name)
+        if slug in seen:
+            raise ValueError(f"Duplicate tenant {name!r} in {tenants_file}")
+        seen.add(slug)
+        if wanted is not None and slug not in wanted:
+            continue
+        api_key = entry.get('api_key') or os.getenv(entry.get('api_key_env', ''), '')
+        if not api_key.strip():
+            raise ValueError(f"No API key for tenant {name!r} (set api_key or api_key_env)")
+        tenants.append(Tenant(name, slug, api_key.strip(), float(entry.get('rate', default_rate))))
+
+    if wanted is not None and len(tenants) != len(wanted):
+        missing = wanted - {tenant.slug for tenant in tenants}
+        raise ValueError(f"Unknown tenant(s): {', '.join(sorted(missing))}")
+    return tenants
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+DCA Timeline Tracing
+Lightweight span instrumentation exported in Chrome trace-event format, so
+an extraction or load run can be opened in chrome://tracing or Perfetto
+(https://ui.perfetto.dev) to see stragglers, idle workers and head-of-line
+blocking in the ordered write loop.
+
+Each span becomes a complete ("X") event on the row of the thread that ran
+it. When tracing is disabled span() returns a shared null context.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_NULL_SPAN = nullcontext()
+
+class Tracer:
+    """Records timed spans per thread when enabled"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._events = []
+        self._thread_names = {}
+        self._origin = time.perf_counter()
+
+    def span(self, name, category='dca', **args):
+        """Context manager timing one span (a shared no-op when disabled)"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, category, args)
+
+    @contextmanager
+    def _span(self, name, category, args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round((start - self._origin) * 1e6, 1),
+                'dur': round((end - start) * 1e6, 1),
+                'pid': os.getpid(),
+                'tid': thread.ident,
+            }
+            if args:
+                event['args'] = args
+            with self._lock:
+                self._events.append(event)
+                self._thread_names.setdefault(thread.ident, thread.name)
+
+    def write(self, filename):
+        """Write all recorded spans as a Chrome trace-event JSON file"""
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+            for tid, name in thread_names.items()
+        ]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f)
+        print(f"🧵 Trace with {len(events)} spans written to {filename}")
+        return filename
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+DCA HTTP Transport
+One requests session setup shared by every script that talks to Ethos:
+- The connection pool is sized to the number of workers using it
+  (pool_block=True), so concurrent workers reuse pooled keep-alive
+  connections instead of opening and discarding extra ones
+- Compression is negotiated explicitly (Accept-Encoding: gzip)
+- TransportStats counts requests, TCP/TLS connections opened (the rest
+  were served from the keep-alive pool), bytes on the wire and decoded
+  body bytes, so compression and reuse can be checked on every run
+
+The benchmark fetches the same pages through three setups and prints
+latency, wire bytes and connections for each:
+
+    plain    requests.get per call, no session, uncompressed
+    default  requests.Session() with the stock adapter
+    tuned    TunedSession sized to --workers
+
+Usage:
+    python dca_transport.py --env prod --pages 10 --workers 5
+"""
+
+import argparse
+import contextlib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+
+from dca_metrics import percentile
+
+BASE_URL = "https://integrate.elluciancloud.com"
+RESOURCE_PATH = "/api/x-xfdcawk"
+PAGE_SIZE = 1000
+ACCEPT_ENCODING = 'gzip'
+SETUPS = ('plain', 'default', 'tuned')
+
+class TransportStats:
+    """Thread-safe request, connection and byte counters of one or more sessions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zero the counters (a long-lived session starting a new run)"""
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+            self.compressed = 0
+            self.wire_bytes = 0
+            self.body_bytes = 0
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def record_response(self, response):
+        """Count a response whose body has been read"""
+        raw = getattr(response, 'raw', None)
+        wire = raw.tell() if raw is not None and hasattr(raw, 'tell') else len(response.content)
+        with self._lock:
+            self.requests += 1
+            self.wire_bytes += wire
+            self.body_bytes += len(response.content)
+            if response.headers.get('Content-Encoding'):
+                self.compressed += 1
+
+    @property
+    def reused(self):
+        """Requests served over an already open keep-alive connection"""
+        return max(0, self.requests - self.connections)
+
+    def print_summary(self, label='Transport'):
+        if not self.requests:
+            return
+        saved = 1 - self.wire_bytes / self.body_bytes if self.body_bytes else 0
+        print(f"🔌 {label}: {self.requests} request(s) over {self.connections} connection(s) "
+              f"({self.reused} reused), {self.compressed} compressed response(s)")
+        print(f"📦 {label} wire: {self.wire_bytes / 1024 / 1024:.2f} MiB for {self.body_bytes / 1024 / 1024:.2f} MiB "
+              f"of response bodies ({saved:.0%} saved)")
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter that reports every new connection its pools open"""
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def _watch(self, pool):
+        if not getattr(pool, '_dca_watched', False):
+            new_conn = pool._new_conn
+
+            def counted_new_conn():
+                self.stats.record_connection()
+                return new_conn()
+            pool._new_conn = counted_new_conn
+            pool._dca_watched = True
+        return pool
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        return self._watch(super().get_connection_with_tls_context(*args, **kwargs))
+
+    def get_connection(self, *args, **kwargs):
+        # requests < 2.32 only has get_connection
+        return self._watch(super().get_connection(*args, **kwargs))
+
+class TunedSession(requests.Session):
+    """requests.Session with a pool sized to its workers, explicit compression and transport counters"""
+
+    def __init__(self, pool_size=DEFAULT_POOLSIZE, stats=None, compression=True):
+        super().__init__()
+        self.stats = stats if stats is not None else TransportStats()
+        adapter = CountingAdapter(self.stats, pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        # None keeps requests' own default header (the benchmark's "default" setup)
+        if compression is not None:
+            self.headers['Accept-Encoding'] = ACCEPT_ENCODING if compression else 'identity'
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        # Streamed bodies are not read yet, so their bytes cannot be counted here
+        if not kwargs.get('stream'):
+            self.stats.record_response(response)
+        return response
+
+def session_scope(session=None, pool_size=DEFAULT_POOLSIZE, stats=None):
+    """Context for a run's session: the caller's (left open) or a new TunedSession closed on exit"""
+    if session is not None:
+        return contextlib.nullcontext(session)
+    return TunedSession(pool_size=pool_size, stats=stats)
+
+class BenchmarkRun:
+    """Latencies and transport counters of one setup"""
+
+    def __init__(self, name, stats):
+        self.name = name
+        self.stats = stats
+        self.latencies = []
+        self.errors = 0
+        self.duration = 0.0
+
+    def print_row(self):
+        latencies = sorted(self.latencies)
+        print(f"  {self.name:<8} {percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+              f"{self.duration:>8.2f} {self.stats.wire_bytes / 1024 / 1024:>9.2f} "
+              f"{self.stats.body_bytes / 1024 / 1024:>9.2f} {self.stats.connections:>6} {self.errors:>6}")
+
+def benchmark_setup(name, token, limiter, pages, workers):
+    """Fetch `pages` pages with `workers` threads through one transport setup"""
+    stats = TransportStats()
+    run = BenchmarkRun(name, stats)
+    headers = {'Accept': 'application/json', 'Authorization': f"Bearer {token}"}
+    shared = None
+    if name == 'default':
+        shared = TunedSession(stats=stats, compression=None)
+    elif name == 'tuned':
+        shared = TunedSession(pool_size=workers, stats=stats)
+    lock = threading.Lock()
+
+    def fetch(page):
+        # "plain" opens a fresh session per call, like requests.get() does
+        session = shared or TunedSession(pool_size=1, stats=stats, compression=False)
+        params = {'limit': str(PAGE_SIZE), 'offset': str(page * PAGE_SIZE)}
+        started = time.perf_counter()
+        try:
+            response = limiter.send(lambda: session.get(f"{BASE_URL}{RESOURCE_PATH}", headers=headers,
+                                                        params=params, timeout=60))
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            with lock:
+                run.errors += 1
+            return
+        finally:
+            if shared is None:
+                session.close()
+        with lock:
+            run.latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(fetch, range(pages)))
+    run.duration = time.perf_counter() - started
+    if shared is not None:
+        shared.close()
+    return run
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Compare wire bytes, latency and connection reuse of HTTP setups")
+    parser.add_argument('--env', choices=['prod', 'test'], default='prod')
+    parser.add_argument('--pages', type=int, default=10, help="pages of 1000 records fetched per setup (default 10)")
+    parser.add_argument('--workers', type=int, default=5, help="concurrent requests (default 5)")
+    parser.add_argument('--setups', default='plain,default,tuned',
+                        help="comma-separated setups to run (default plain,default,tuned)")
+    return parser.parse_args()
+
+def main(args):
+    from dca_fingerprint import get_env_api_key
+    from dca_ratelimit import RateLimiter
+
+    api_key = get_env_api_key(args.env)
+    if not api_key:
+        print(f"❌ No {args.env} API key found (set ELLUCIAN_API_KEY_{args.env.upper()} or api_config.json)")
+        sys.exit(1)
+    limiter = RateLimiter(args.env, api_key)
+    with TunedSession(pool_size=1) as session:
+        response = limiter.send(lambda: session.post(f"{BASE_URL}/auth", timeout=30, headers={
+            'Authorization': 'Basic ' + api_key, 'Content-Type': 'text/plain'}))
+    response.raise_for_status()
+    token = response.text
+
+    setups = [name.strip() for name in args.setups.split(',') if name.strip()]
+    unknown = [name for name in setups if name not in SETUPS]
+    if unknown:
+        print(f"❌ Unknown setup(s) {', '.join(unknown)}; choose from {', '.join(SETUPS)}")
+        sys.exit(2)
+    print(f"🚀 Fetching {args.pages} page(s) from {args.env.upper()} with {args.workers} worker(s) per setup...")
+    runs = [benchmark_setup(name, token, limiter, args.pages, args.workers) for name in setups]
+    print(f"  {'setup':<8} {'p50 ms':>8} {'p95 ms':>8} {'total s':>8} {'wire MiB':>9} {'body MiB':>9} "
+          f"{'conns':>6} {'errors':>6}")
+    for run in runs:
+        run.print_row()
+    limiter.print_summary()
+    limiter.close()
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+DCA Load Verification
+Confirms a load without re-extracting TEST. Only the keys written by the
+latest run of dcawk_create_test.py (dca_load_journal.jsonl) or dca_sync.py
+(dca_sync_journal.jsonl) are checked:
+
+- POSTed/PUT records are fetched by the id TEST returned and compared with
+  the PROD values they were loaded from (the diff file, then the PROD
+  extract); JV fields, id and xfdcawkCreatedon are not compared
+- A record whose id is unknown or no longer found is looked up by a
+  criteria query on (xfdcawkFilename, xfdcawkFiscalyear)
+- DELETEd ids must be gone
+
+The lookups run concurrently, so a load of N records costs about N requests
+however large the table is. Keys that are missing, mismatched or still
+present are reported and written to dca_verify_summary.json.
+
+Usage:
+    python dca_verify.py [--journal dca_sync_journal.jsonl] [--all-runs]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from dca_extract import EthosClient
+from dca_fingerprint import get_env_api_key
+from dca_io import find_csv
+from dca_metrics import MetricsRecorder
+from dca_partitions import criteria_param
+from dca_profile import Profiler
+from dca_ratelimit import TokenBucket
+from dca_records import CSV_HEADER, csv_value, iter_records, parse_key, record_key
+from dca_sync import JOURNAL_FILE, read_journal, synced_fields, synced_values
+from dcawk_query_prod import process_record
+
+RESOURCE_PATH = "/api/x-xfdcawk"
+LOAD_JOURNAL_FILE = 'dca_load_journal.jsonl'
+SUMMARY_FILE = 'dca_verify_summary.json'
+
+def journal_entries(journal_files, all_runs=False):
+    """Entries of the latest run of each journal (every run with all_runs)"""
+    entries = []
+    for journal_file in journal_files:
+        journal = [entry for entry in read_journal(journal_file) if entry.get('op') in ('POST', 'PUT', 'DELETE')]
+        if journal and not all_runs:
+            latest = journal[-1].get('run')
+            journal = [entry for entry in journal if entry.get('run') == latest]
+        # dca_sync.py writes a pending entry before each operation; only those never finished are kept
+        finished = {(entry.get('run'), entry.get('op_id')) for entry in journal if entry.get('status') != 'pending'}
+        entries.extend(entry for entry in journal
+                       if entry.get('status') != 'pending' or (entry.get('run'), entry.get('op_id')) not in finished)
+    return entries
+
+def load_expected(keys, expected_files):
+    """PROD values of the given keys, taken from the first file that holds each key"""
+    expected = {}
+    for filename in expected_files:
+        if not os.path.exists(filename):
+            continue
+        for record in iter_records(filename):
+            if record.key in keys and record.key not in expected:
+                expected[record.key] = synced_values(record)
+        if len(expected) == len(keys):
+            break
+    return expected
+
+def differing_fields(record, key, values):
+    """Fields of a fetched TEST record that differ from the expected PROD values"""
+    # Compare the values the way they would appear in an extract CSV
+    fetched = dict(zip(CSV_HEADER, map(csv_value, process_record(record))))
+    if record_key(fetched['xfdcawkFilename'], fetched['xfdcawkFiscalyear']) != record_key(*key):
+        return ['xfdcawkFilename', 'xfdcawkFiscalyear']
+    if values is None:
+        return []
+    fetched = synced_fields(fetched)
+    return [field for field in values if fetched.get(field, '') != values[field]]
+
+class Verifier:
+    """Checks journal entries against TEST one targeted request at a time"""
+
+    def __init__(self, client, expected):
+        self.client = client
+        self.expected = expected
+
+    def get_by_id(self, record_id):
+        """The TEST record with this id, or None if it does not exist"""
+        try:
+            return self.client.get(f"{RESOURCE_PATH}/{record_id}", 'verify_get').json()
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    def find_by_key(self, key):
+        """Every TEST record with this key"""
+        criteria = {'xfdcawkFilename': key[0], 'xfdcawkFiscalyear': key[1]}
+        response = self.client.get(RESOURCE_PATH, 'verify_criteria',
+                                   {'criteria': criteria_param(criteria), 'limit': '10'})
+        return response.json()
+
+    def check(self, entry):
+        """Returns (entry, status, detail) with status ok/missing/mismatched/not_deleted/not_loaded"""
+        if entry.get('status') != 'done':
+            return entry, 'not_loaded', entry.get('error', 'operation did not complete')
+        key = parse_key(entry['key'])
+        record_id = entry.get('id') or entry.get('test_id')
+        if entry['op'] == 'DELETE':
+            if self.get_by_id(record_id) is None:
+                return entry, 'ok', ''
+            return entry, 'not_deleted', f"id {record_id} still exists"
+
+        record = self.get_by_id(record_id) if record_id else None
+        if record is None:
+            matches = self.find_by_key(key)
+            if not matches:
+                return entry, 'missing', f"no TEST record (id {record_id or 'unknown'})"
+            if len(matches) > 1:
+                return entry, 'mismatched', f"{len(matches)} TEST records share the key"
+            record = matches[0]
+        fields = differing_fields(record, key, self.expected.get(key))
+        if fields:
+            return entry, 'mismatched', f"differs in {', '.join(fields)}"
+        return entry, 'ok', ''
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Verify only the keys written by the latest load")
+    parser.add_argument('--journal', action='append',
+                        help=f"journal to verify (repeatable; default {LOAD_JOURNAL_FILE} and {JOURNAL_FILE})")
+    parser.add_argument('--all-runs', action='store_true', help="verify every run in the journal, not only the latest")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent requests (default 8)")
+    parser.add_argument('--rate', type=float, default=10.0, help="requests per second to TEST (default 10)")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    return parser.parse_args()
+
+def main(args):
+    """Verify the latest load and report missing or mismatched keys"""
+    journal_files = args.journal or [path for path in (LOAD_JOURNAL_FILE, JOURNAL_FILE) if os.path.exists(path)]
+    entries = journal_entries(journal_files, args.all_runs)
+    if not entries:
+        print("❌ No journaled loads to verify; run dcawk_create_test.py or dca_sync.py --apply first")
+        sys.exit(1)
+    print(f"🔍 Verifying {len(entries)} journaled operation(s) from {', '.join(journal_files)}...")
+    keys = {parse_key(entry['key']) for entry in entries if entry['op'] != 'DELETE'}
+    expected = load_expected(keys, [find_csv('xdcawk_2025_diff.csv'), find_csv('xdcawk_2025_prod.csv')])
+    if len(expected) < len(keys):
+        print(f"⚠️  No PROD values for {len(keys) - len(expected)} key(s); only their presence is checked")
+
+    api_key = get_env_api_key('test')
+    if not api_key:
+        print("❌ No test API key found (set ELLUCIAN_API_KEY_TEST or api_config.json)")
+        sys.exit(1)
+    start_time = time.time()
+    metrics = MetricsRecorder('verify')
+    client = EthosClient(api_key, metrics, limiter=TokenBucket(args.rate), pool_size=args.workers, env='test')
+    try:
+        client.authenticate()
+        verifier = Verifier(client, expected)
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(verifier.check, entries))
+    finally:
+        client.close()
+
+    counts = Counter(status for _, status, _ in results)
+    problems = [{'op': entry['op'], 'key': entry['key'], 'id': entry.get('id') or entry.get('test_id', ''),
+                 'status': status, 'detail': detail}
+                for entry, status, detail in results if status != 'ok']
+    for problem in problems:
+        print(f"❌ {problem['op']} {problem['key']}: {problem['status']} ({problem['detail']})")
+    requests_made = sum(stats['count'] for stats in metrics.snapshot()['operations'].values())
+    duration = time.time() - start_time
+    print(f"\n📊 Verified: {counts['ok']} ok, {counts['missing']} missing, {counts['mismatched']} mismatched, "
+          f"{counts['not_deleted']} not deleted, {counts['not_loaded']} not loaded")
+    print(f"📦 {requests_made} requests for {len(entries)} operations")
+    print(f"⏱️  Total time: {duration:.2f} seconds")
+    with open(SUMMARY_FILE, 'w') as f:
+        json.dump({'journals': journal_files, 'operations': len(entries), 'counts': dict(counts),
+                   'problems': problems, 'requests': requests_made, 'seconds': round(duration, 3)}, f, indent=2)
+    print(f"📁 Summary: {SUMMARY_FILE}")
+    metrics.write()
+    if problems:
+        sys.exit(1)
+    print("✅ Load verified")
+
+if __name__ == "__main__":
+    args = parse_args()
+    with Profiler(enabled=args.profile).stage('verify'):
+        main(args)
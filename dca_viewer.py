@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+DCA CSV Viewer
+Terminal pager for multi-hundred-MB extracts. The CSV is memory-mapped
+through dca_index.py, so opening is instant once the index exists and only
+the rows on screen are ever parsed.
+
+Commands inside the viewer:
+    Enter / n        next page            b        previous page
+    g ROW            jump to row          v ROW    show every field of a row
+    / FILENAME[|FY]  find a key           c COLS   show only these columns
+    c all            show every column    c        back to the default columns
+    h                help                 q        quit
+
+Usage:
+    python dca_viewer.py xdcawk_2025_diff.csv
+    python dca_viewer.py xdcawk_2025_prod.csv --key "TOM_844_227.1X_20634.SEQ|2324"
+    python dca_viewer.py xdcawk_2025_test.csv --row 120000 --columns Filename,Fiscalyear,id
+"""
+
+import argparse
+import os
+import shutil
+import sys
+
+from dca_index import CsvIndex
+
+DEFAULT_COLUMNS = ('xfdcawkFilename', 'xfdcawkFiscalyear', 'xfdcawkInstname', 'xfdcawkDepdate',
+                   'xfdcawkTotaldep', 'xfdcawkTotalrev', 'id')
+MAX_WIDTH = 40
+
+HELP = """Enter/n next page, b previous page, g ROW jump, v ROW full record,
+/ FILENAME[|FY] find key, c COLS project columns (c all / c for default), q quit"""
+
+class CsvViewer:
+    """Pages through an indexed CSV showing a projection of its columns"""
+
+    def __init__(self, index, columns=None, page_size=None):
+        self.index = index
+        self.page_size = page_size or max(5, shutil.get_terminal_size().lines - 6)
+        self.top = 1
+        self.set_columns(columns)
+
+    def resolve_column(self, name):
+        """Column position from a name, a name without the xfdcawk prefix, or a 1-based number"""
+        name = name.strip()
+        if name.isdigit() and 1 <= int(name) <= len(self.index.fields):
+            return int(name) - 1
+        for candidate in (name, f"xfdcawk{name[:1].upper()}{name[1:]}"):
+            if candidate in self.index.field_index:
+                return self.index.field_index[candidate]
+        raise ValueError(f"Unknown column: {name}")
+
+    def set_columns(self, spec=None):
+        """Project onto the given comma-separated columns, 'all', or the default set"""
+        if spec == 'all':
+            self.columns = list(range(len(self.index.fields)))
+        elif spec:
+            self.columns = [self.resolve_column(name) for name in spec.split(',') if name.strip()]
+        else:
+            self.columns = [self.index.field_index[field] for field in DEFAULT_COLUMNS
+                            if field in self.index.field_index] or list(range(len(self.index.fields)))
+
+    def print_rows(self, row_numbers):
+        """Print rows as a table of the projected columns"""
+        labels = [self.index.fields[column].replace('xfdcawk', '') for column in self.columns]
+        table = []
+        for row in row_numbers:
+            values = self.index.row(row)
+            table.append([str(row)] + [values[column] if column < len(values) else '' for column in self.columns])
+        widths = [max([len('row')] + [len(line[0]) for line in table])] + [
+            min(MAX_WIDTH, max([len(label)] + [len(line[i + 1]) for line in table])) for i, label in enumerate(labels)]
+        print('  '.join(text.ljust(width) for text, width in zip(['row'] + labels, widths)))
+        for line in table:
+            print('  '.join(text[:width].ljust(width) for text, width in zip(line, widths)))
+
+    def print_record(self, row):
+        """Print every field of one row, one per line"""
+        values = self.index.row(row)
+        width = max(len(field) for field in self.index.fields)
+        print(f"Row {row} of {self.index.rows}")
+        for position, field in enumerate(self.index.fields):
+            print(f"  {field.ljust(width)}  {values[position] if position < len(values) else ''}")
+
+    def show_page(self):
+        last = min(self.index.rows, self.top + self.page_size - 1)
+        print(f"\n📄 {self.index.path}: rows {self.top}-{last} of {self.index.rows}")
+        self.print_rows(range(self.top, last + 1))
+
+    def find(self, text):
+        """Rows matching FILENAME or FILENAME|FISCALYEAR"""
+        filename, separator, fiscalyear = text.rpartition('|')
+        if not separator:
+            filename, fiscalyear = text, None
+        return self.index.find_filename(filename, fiscalyear)
+
+    def show_matches(self, text):
+        rows = self.find(text)
+        if not rows:
+            print(f"🔍 No rows for {text}")
+        elif len(rows) == 1:
+            self.print_record(rows[0])
+            self.top = rows[0]
+        else:
+            print(f"🔍 {len(rows)} rows for {text}")
+            self.print_rows(rows)
+            self.top = rows[0]
+
+    def run(self):
+        """Interactive command loop"""
+        if not self.index.rows:
+            print(f"📄 {self.index.path} has no data rows")
+            return
+        self.show_page()
+        while True:
+            try:
+                command = input("\n[n]ext [b]ack [g]oto [v]iew [/]find [c]olumns [h]elp [q]uit> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                return
+            action, _, argument = command.partition(' ')
+            if command.startswith('/'):
+                action, argument = '/', command[1:]
+            argument = argument.strip()
+            try:
+                if action in ('', 'n'):
+                    if self.top + self.page_size <= self.index.rows:
+                        self.top += self.page_size
+                    self.show_page()
+                elif action == 'b':
+                    self.top = max(1, self.top - self.page_size)
+                    self.show_page()
+                elif action == 'g':
+                    self.top = min(max(1, int(argument)), self.index.rows)
+                    self.show_page()
+                elif action == 'v':
+                    self.print_record(int(argument) if argument else self.top)
+                elif action == '/':
+                    self.show_matches(argument)
+                elif action == 'c':
+                    self.set_columns(argument)
+                    self.show_page()
+                elif action == 'q':
+                    return
+                else:
+                    print(HELP)
+            except (ValueError, IndexError) as e:
+                print(f"⚠️  {e}")
+
+def open_index(path, rebuild=False):
+    """Open the CSV index, saying so when it has to be built"""
+    index = CsvIndex(path, rebuild=rebuild)
+    if index.built:
+        print(f"🗂️  Indexed {index.rows} rows of {path}")
+    return index
+
+def view_csv(path):
+    """Open the interactive viewer on a CSV; returns False if it cannot be viewed"""
+    if not os.path.exists(path):
+        print(f"❌ File {path} not found")
+        return False
+    try:
+        with open_index(path) as index:
+            CsvViewer(index).run()
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Page through a large DCA CSV using a memory-mapped index")
+    parser.add_argument('file', help="plain (uncompressed) CSV to view")
+    parser.add_argument('--row', type=int, help="print this row and exit")
+    parser.add_argument('--key', help="print the rows for FILENAME or FILENAME|FISCALYEAR and exit")
+    parser.add_argument('--columns', help="comma-separated columns to show (names, short names or numbers; 'all')")
+    parser.add_argument('--rebuild-index', action='store_true', help="rebuild the index even if it is current")
+    return parser.parse_args()
+
+def main(args):
+    if not os.path.exists(args.file):
+        print(f"❌ File {args.file} not found")
+        sys.exit(1)
+    try:
+        with open_index(args.file, args.rebuild_index) as index:
+            viewer = CsvViewer(index, args.columns)
+            if args.key:
+                viewer.show_matches(args.key)
+            elif args.row and args.columns:
+                viewer.print_rows([args.row])
+            elif args.row:
+                viewer.print_record(args.row)
+            else:
+                viewer.run()
+    except (ValueError, IndexError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(parse_args())
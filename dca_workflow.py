@@ -7,14 +7,71 @@ This script runs the complete DCA comparison workflow:
 3. Runs dcawk_compare.py
 4. Checks if differences match expected count
 5. Prompts user for next action (analyze_duplicates or dcawk_create_test)
+
+Stages whose input fingerprint matches the last successful run are skipped;
+pass --force to run every stage regardless. Pass --profile to have every
+stage capture cProfile/tracemalloc stats beside the log, and --trace to
+have each stage write a Chrome trace timeline (dca_trace_<script>.json).
+--columnar makes the extractions also write .dcol snapshots and the
+compare read only their key columns. --streaming replaces steps 1-3 with
+dca_stream_compare.py, which compares the pages while they are fetched.
+Every run is appended to the SQLite run history (see dca_history.py), and
+every extract written is saved to the snapshot history (see
+dca_snapshots.py) unless --no-snapshots is given.
 """
 
+import argparse
 import subprocess
 import sys
 import os
 import csv
+import time
+from contextlib import closing
 from pathlib import Path
 from datetime import datetime
+from dca_columnar import snapshot_path
+from dca_io import compression_of, csv_path, find_csv, open_csv, strip_compression
+from dca_history import connect, find_regressions, load_request_metrics, print_regressions, record_run
+from dca_profile import Profiler
+from dca_snapshots import SnapshotStore
+from dca_viewer import view_csv
+from dca_fingerprint import (file_digest, load_state, record_stage, remote_fingerprint,
+                             save_state, stage_is_current)
+
+# Files each stage produces, used for fingerprinting
+STAGE_OUTPUTS = {
+    'dcawk_query_prod.py': [csv_path('xdcawk_2025_prod.csv')],
+    'dcawk_query_test.py': [csv_path('xdcawk_2025_test.csv')],
+    'dcawk_compare.py': [csv_path('xdcawk_2025_diff.csv')],
+    'dca_stream_compare.py': [csv_path('xdcawk_2025_prod.csv'), csv_path('xdcawk_2025_test.csv'),
+                              csv_path('xdcawk_2025_diff.csv')],
+}
+
+# Remote environments fingerprinted by each extraction stage
+STAGE_REMOTE_ENV = {
+    'dcawk_query_prod.py': 'prod',
+    'dcawk_query_test.py': 'test',
+    'dca_stream_compare.py': ('prod', 'test'),
+}
+
+# Metrics job written by each extraction stage (see dca_metrics.py)
+STAGE_METRICS_JOB = {
+    'dcawk_query_prod.py': 'prod',
+    'dcawk_query_test.py': 'test',
+    'dca_stream_compare.py': 'stream',
+}
+
+# Extraction and load stages that accept --trace
+TRACED_STAGES = {'dcawk_query_prod.py', 'dcawk_query_test.py', 'dcawk_create_test.py', 'dca_stream_compare.py'}
+
+# Stages that accept --columnar
+COLUMNAR_STAGES = {'dcawk_query_prod.py', 'dcawk_query_test.py', 'dcawk_compare.py'}
+CACHED_STAGES = {'dcawk_query_prod.py', 'dcawk_query_test.py'}
+
+# Local files consumed by each non-extraction stage
+STAGE_INPUT_FILES = {
+    'dcawk_compare.py': ['xdcawk_2025_prod.csv', 'xdcawk_2025_test.csv'],
+}
 
 def write_log_header():
     """Initialize the log file with header information"""
@@ -40,7 +97,7 @@ def log_section(log_file, section_title, content=""):
             f.write(content)
             f.write("\n")
 
-def run_script(script_name, description, log_file):
+def run_script(script_name, description, log_file, extra_args=None):
     """Run a Python script and return success status with logging"""
     print(f"\n{'='*60}")
     print(f"Running {description}...")
@@ -50,7 +107,7 @@ def run_script(script_name, description, log_file):
     log_section(log_file, f"RUNNING: {description} ({script_name})")
     
     try:
-        result = subprocess.run([sys.executable, script_name], 
+        result = subprocess.run([sys.executable, script_name] + (extra_args or []), 
                               capture_output=True, 
                               text=True, 
                               check=True)
@@ -112,10 +169,82 @@ def run_script(script_name, description, log_file):
         print(f"❌ Script {script_name} not found")
         return False
 
+def stage_args(script_name, args):
+    """Command-line options forwarded to a stage script"""
+    extra_args = ['--profile'] if args.profile else []
+    if args.trace and script_name in TRACED_STAGES:
+        extra_args += ['--trace', f"dca_trace_{Path(script_name).stem}.json"]
+    if args.columnar and script_name in COLUMNAR_STAGES:
+        extra_args.append('--columnar')
+    if args.cache and script_name in CACHED_STAGES:
+        extra_args.append('--cache')
+    if script_name in CACHED_STAGES and (args.cache or os.getenv('DCA_PAGE_CACHE') == '1'):
+        # An extraction only runs when its remote may have changed, so no cached page is served unchecked
+        extra_args += ['--cache-ttl', '0']
+    return extra_args
+
+def compute_stage_inputs(script_name):
+    """Fingerprint the inputs of a workflow stage"""
+    inputs = {'script': file_digest(script_name)}
+    remote_env = STAGE_REMOTE_ENV.get(script_name)
+    if isinstance(remote_env, tuple):
+        for env in remote_env:
+            inputs[f"remote_{env}"] = remote_fingerprint(env)
+    elif remote_env:
+        inputs['remote'] = remote_fingerprint(remote_env)
+    for filename in STAGE_INPUT_FILES.get(script_name, []):
+        inputs[filename] = file_digest(find_csv(filename))
+        # --columnar compares the snapshot instead while it is current
+        snapshot = snapshot_path(filename)
+        if os.path.exists(snapshot):
+            inputs[snapshot] = file_digest(snapshot)
+    return inputs
+
+def decide_stage(script_name, description, state, force, log_file):
+    """Decide whether a stage must run; returns (should_run, inputs) and logs the decision"""
+    inputs = None
+    if force:
+        should_run, reason = True, "--force given"
+    else:
+        try:
+            inputs = compute_stage_inputs(script_name)
+        except Exception as e:
+            should_run, reason = True, f"could not fingerprint inputs ({e})"
+        else:
+            is_current, reason = stage_is_current(state, script_name, inputs, STAGE_OUTPUTS[script_name])
+            should_run = not is_current
+
+    decision = "RUN" if should_run else "SKIP"
+    if should_run:
+        print(f"\n▶️  {description}: running ({reason})")
+    else:
+        print(f"\n⏭️  {description}: skipped ({reason})")
+    with open(log_file, 'a') as f:
+        f.write(f"\nStage Decision: {decision} {description} ({script_name}) - {reason}\n")
+    return should_run, inputs
+
+def save_snapshots(script_name, log_file):
+    """Save the extracts an extraction stage just wrote to the snapshot history"""
+    remote_env = STAGE_REMOTE_ENV[script_name]
+    store = SnapshotStore()
+    for env in (remote_env if isinstance(remote_env, tuple) else (remote_env,)):
+        try:
+            manifest = store.save(env, find_csv(f"xdcawk_2025_{env}.csv"))
+        except (ValueError, OSError) as e:
+            message = f"Could not save the {env.upper()} snapshot: {e}"
+            print(f"⚠️  {message}")
+        else:
+            message = (f"Snapshot {manifest['snapshot']}: {manifest['rows']} rows, "
+                       f"{manifest['bytes_written']:,} new bytes stored")
+            print(f"📸 {message}")
+        with open(log_file, 'a') as f:
+            f.write(f"{message}\n")
+
 def count_csv_rows(filename):
-    """Count rows in CSV file"""
+    """Count rows in CSV file (plain, .gz or .xz)"""
+    filename = find_csv(filename)
     try:
-        with open(filename, 'r') as file:
+        with open_csv(filename) as file:
             return sum(1 for row in csv.DictReader(file))
     except FileNotFoundError:
         print(f"❌ File {filename} not found")
@@ -158,10 +287,44 @@ def check_expected_differences(log_file):
     
     if diff_count == expected_diff:
         print("✅ Difference count matches expected!")
-        return True, expected_diff, diff_count
+        return True, expected_diff, diff_count, prod_count, test_count
     else:
         print(f"⚠️  Difference count mismatch: Expected {expected_diff}, Found {diff_count}")
-        return False, expected_diff, diff_count
+        return False, expected_diff, diff_count, prod_count, test_count
+
+def record_run_history(log_file, run_started, forced, stage_results, counts=None):
+    """Append this run to the SQLite run history and flag throughput regressions"""
+    run = {
+        'started': run_started.strftime('%Y-%m-%d %H:%M:%S'),
+        'finished': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'forced': forced,
+        'stages': stage_results,
+    }
+    if counts:
+        run.update(counts)
+        # Extraction throughput is measured against the rows the stage wrote
+        for script_name, count_key in (('dcawk_query_prod.py', 'prod_records'),
+                                       ('dcawk_query_test.py', 'test_records')):
+            if stage_results.get(script_name, {}).get('status') == 'ran':
+                stage_results[script_name]['records'] = counts[count_key]
+        if stage_results.get('dca_stream_compare.py', {}).get('status') == 'ran':
+            stage_results['dca_stream_compare.py']['records'] = counts['prod_records'] + counts['test_records']
+
+    try:
+        run_id = record_run(run)
+        with closing(connect()) as conn:
+            regressions = find_regressions(conn, run_id=run_id)
+    except Exception as e:
+        print(f"⚠️  Could not record run history: {e}")
+        return
+
+    print(f"🗄️  Run {run_id} recorded in run history")
+    print_regressions(regressions, 0.25)
+    with open(log_file, 'a') as f:
+        f.write(f"\nRun History: recorded as run {run_id}\n")
+        for item in regressions:
+            f.write(f"THROUGHPUT REGRESSION: {item['stage']} {item['rows_per_sec']:.1f} rows/sec "
+                    f"vs baseline {item['baseline']:.1f} ({item['drop']:.0%} slower)\n")
 
 def get_user_choice(matches_expected, expected_diff, actual_diff):
     """Get user choice for next action"""
@@ -176,9 +339,9 @@ def get_user_choice(matches_expected, expected_diff, actual_diff):
     
     print("1. Run analyze_duplicates.py (investigate duplicate IDs)")
     print("2. Run dcawk_create_test.py (create test data)")
-    print("3. Open PROD CSV in nano editor")
-    print("4. Open TEST CSV in nano editor")
-    print("5. Open DIFF CSV in nano editor")
+    print("3. View PROD CSV")
+    print("4. View TEST CSV")
+    print("5. View DIFF CSV")
     print("6. Exit")
     
     while True:
@@ -193,10 +356,21 @@ def get_user_choice(matches_expected, expected_diff, actual_diff):
             return '6'
 
 def open_file_in_nano(filename):
-    """Open a file in nano editor"""
+    """Open a file in nano editor (compressed CSVs open in zless/xzless)"""
     if not os.path.exists(filename):
         print(f"❌ File {filename} not found")
         return False
+
+    pager = {'gz': 'zless', 'xz': 'xzless'}.get(compression_of(filename))
+    if pager:
+        try:
+            print(f"📝 {filename} is compressed; opening it in {pager}...")
+            print("💡 Press q to exit and return to menu")
+            subprocess.run([pager, filename], check=True)
+            return True
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            print(f"❌ Failed to open {filename} in {pager}")
+            return False
     
     try:
         print(f"📝 Opening {filename} in nano editor...")
@@ -211,7 +385,13 @@ def open_file_in_nano(filename):
         print("❌ nano editor not found. Please install nano or use a different editor.")
         return False
 
-def run_analyze_duplicates(log_file):
+def view_file(filename):
+    """Open a CSV in the indexed viewer (compressed CSVs fall back to a pager)"""
+    if compression_of(filename):
+        return open_file_in_nano(filename)
+    return view_csv(filename)
+
+def run_analyze_duplicates(log_file, extra_args=None):
     """Run analyze_duplicates.py and save output to file, then open in nano"""
     output_file = 'xdca_duplicates.txt'
     
@@ -224,7 +404,7 @@ def run_analyze_duplicates(log_file):
     
     try:
         # Run the script and capture output
-        result = subprocess.run([sys.executable, 'analyze_duplicates.py'], 
+        result = subprocess.run([sys.executable, 'analyze_duplicates.py'] + (extra_args or []), 
                               capture_output=True, 
                               text=True, 
                               check=True)
@@ -292,8 +472,29 @@ def run_analyze_duplicates(log_file):
         print("❌ analyze_duplicates.py not found or nano editor not available")
         return False
 
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Run the DCA comparison workflow")
+    parser.add_argument('--force', action='store_true',
+                        help="run every stage even if its inputs have not changed")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile every stage that runs (combine with --force to profile skipped stages)")
+    parser.add_argument('--trace', action='store_true',
+                        help="write a Chrome trace timeline for every extraction/load stage that runs")
+    parser.add_argument('--columnar', action='store_true',
+                        help="write .dcol snapshots during extraction and compare them by key columns only")
+    parser.add_argument('--streaming', action='store_true',
+                        help="extract PROD and TEST concurrently and compare pages as they arrive")
+    parser.add_argument('--cache', action='store_true',
+                        help="serve extraction pages from the on-disk page cache (see dca_cache.py)")
+    parser.add_argument('--no-snapshots', action='store_true',
+                        help="do not save the new extracts to the snapshot history (see dca_snapshots.py)")
+    return parser.parse_args()
+
 def main():
     """Main orchestration function"""
+    args = parse_args()
+    profiler = Profiler(enabled=args.profile)
     print("🚀 Starting DCA Workflow Orchestrator")
     print("=" * 60)
     
@@ -314,19 +515,61 @@ def main():
         ('dcawk_query_test.py', 'Test Data Query'),
         ('dcawk_compare.py', 'Data Comparison')
     ]
+    if args.streaming:
+        if args.columnar:
+            print("⚠️  --columnar is ignored in streaming mode")
+        scripts_to_run = [('dca_stream_compare.py', 'Streaming Extraction and Comparison')]
     
-    # Run the main workflow scripts
+    # Run the main workflow scripts, skipping stages whose fingerprint is unchanged
+    state = load_state()
+    run_started = datetime.now()
+    stage_results = {}
     for script_name, description in scripts_to_run:
-        success = run_script(script_name, description, log_file)
-        if not success:
+        should_run, inputs = decide_stage(script_name, description, state, args.force, log_file)
+        if not should_run:
+            stage_results[script_name] = {'status': 'skipped'}
+            continue
+
+        stage_start = time.time()
+        success = run_script(script_name, description, log_file, stage_args(script_name, args))
+        stage_results[script_name] = {'status': 'ran' if success else 'failed',
+                                      'seconds': time.time() - stage_start}
+        if script_name in STAGE_METRICS_JOB:
+            requests_made, retries = load_request_metrics(STAGE_METRICS_JOB[script_name], stage_start)
+            stage_results[script_name].update(requests=requests_made, retries=retries)
+        if success:
+            if inputs is None:
+                try:
+                    inputs = compute_stage_inputs(script_name)
+                except Exception as e:
+                    print(f"⚠️  Could not record fingerprint for {description}: {e}")
+            if inputs is not None:
+                record_stage(state, script_name, inputs, STAGE_OUTPUTS[script_name],
+                             datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                save_state(state)
+            if script_name in STAGE_REMOTE_ENV and not args.no_snapshots:
+                save_snapshots(script_name, log_file)
+        else:
+            state.pop(script_name, None)
+            save_state(state)
             error_msg = f"Workflow stopped due to failure in {description}"
             print(f"\n❌ {error_msg}")
             with open(log_file, 'a') as f:
                 f.write(f"\nWORKFLOW STOPPED: {error_msg}\n")
+            record_run_history(log_file, run_started, args.force, stage_results)
             sys.exit(1)
     
     # Check if differences match expected
-    matches_expected, expected_diff, actual_diff = check_expected_differences(log_file)
+    with profiler.stage('workflow_check'):
+        matches_expected, expected_diff, actual_diff, prod_count, test_count = check_expected_differences(log_file)
+
+    record_run_history(log_file, run_started, args.force, stage_results, {
+        'prod_records': prod_count,
+        'test_records': test_count,
+        'diff_count': actual_diff,
+        'expected_diff': expected_diff,
+        'matches_expected': matches_expected,
+    })
     
     # Log the start of interactive session
     log_section(log_file, "INTERACTIVE MENU SESSION STARTED")
@@ -341,7 +584,7 @@ def main():
             f.write(f"\nUser Choice: {choice} at {datetime.now().strftime('%H:%M:%S')}\n")
         
         if choice == '1':
-            success = run_analyze_duplicates(log_file)
+            success = run_analyze_duplicates(log_file, stage_args('analyze_duplicates.py', args))
             if success:
                 print("\n✅ Duplicate analysis completed and reviewed.")
             
@@ -349,24 +592,29 @@ def main():
             print(f"\n{'='*60}")
             print("Running Test Data Creation...")
             print(f"{'='*60}")
-            success = run_script('dcawk_create_test.py', 'Test Data Creation', log_file)
+            success = run_script('dcawk_create_test.py', 'Test Data Creation', log_file,
+                                 stage_args('dcawk_create_test.py', args))
             if success:
                 print("\n✅ Test data creation completed.")
+                success = run_script('dca_verify.py', 'Load Verification', log_file,
+                                     stage_args('dca_verify.py', args) + ['--journal', 'dca_load_journal.jsonl'])
+                if success:
+                    print("\n✅ Every loaded key was verified in TEST.")
             
         elif choice == '3':
             with open(log_file, 'a') as f:
-                f.write("Action: Opening PROD CSV in nano\n")
-            success = open_file_in_nano('xdcawk_2025_prod.csv')
+                f.write("Action: Viewing PROD CSV\n")
+            success = view_file(find_csv('xdcawk_2025_prod.csv'))
             
         elif choice == '4':
             with open(log_file, 'a') as f:
-                f.write("Action: Opening TEST CSV in nano\n")
-            success = open_file_in_nano('xdcawk_2025_test.csv')
+                f.write("Action: Viewing TEST CSV\n")
+            success = view_file(find_csv('xdcawk_2025_test.csv'))
             
         elif choice == '5':
             with open(log_file, 'a') as f:
-                f.write("Action: Opening DIFF CSV in nano\n")
-            success = open_file_in_nano('xdcawk_2025_diff.csv')
+                f.write("Action: Viewing DIFF CSV\n")
+            success = view_file(find_csv('xdcawk_2025_diff.csv'))
             
         elif choice == '6':
             with open(log_file, 'a') as f:
@@ -389,9 +637,9 @@ def main():
     # Summary of generated files
     print("\nGenerated files:")
     files_to_check = [
-        'xdcawk_2025_prod.csv',
-        'xdcawk_2025_test.csv', 
-        'xdcawk_2025_diff.csv',
+        find_csv('xdcawk_2025_prod.csv'),
+        find_csv('xdcawk_2025_test.csv'),
+        find_csv('xdcawk_2025_diff.csv'),
         'xdca_duplicates.txt',
         'dca_workflow.log'
     ]
@@ -399,7 +647,7 @@ def main():
     file_summary = "Generated files summary:\n"
     for filename in files_to_check:
         if os.path.exists(filename):
-            if filename.endswith('.csv'):
+            if strip_compression(filename).endswith('.csv'):
                 row_count = count_csv_rows(filename)
                 line = f"  📄 {filename}: {row_count} rows"
                 print(line)
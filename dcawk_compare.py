@@ -1,65 +1,206 @@
+import argparse
 import csv
+import os
+import sys
+from dca_columnar import iter_rows, read_rows_at, read_schema, snapshot_is_current, snapshot_path
+from dca_daemon import forward_to_daemon
+from dca_io import csv_path, find_csv, open_csv
+from dca_keyset import KeyHashSet, describe_memory
+from dca_partitions import add_partition_arguments, discover_partitions, partition_path, partitions_from_args
+from dca_profile import Profiler
+from dca_records import KEY_FIELDS, key_string, load_records, read_fieldnames, record_key
 
-with open('xdcawk_2025_prod.csv', 'r') as prodFile, open('xdcawk_2025_test.csv', 'r') as testFile, open('xdcawk_2025_diff.csv', 'w', newline='') as diffFile:
-    prodData = csv.DictReader(prodFile)
-    testData = csv.DictReader(testFile)
-    diffData = csv.DictWriter(diffFile, fieldnames=prodData.fieldnames)
-    diffData.writeheader()
+def compare_files(prod_file=None, test_file=None, diff_file=None, low_memory=False):
+    """Write PROD rows whose (xfdcawkFilename, xfdcawkFiscalyear) ID is missing in TEST to the diff file"""
+    prod_file = prod_file or find_csv('xdcawk_2025_prod.csv')
+    test_file = test_file or find_csv('xdcawk_2025_test.csv')
+    diff_file = diff_file or csv_path('xdcawk_2025_diff.csv')
+    with open_csv(diff_file, 'w') as diffFile:
+        diffData = csv.writer(diffFile)
+        diffData.writerow(read_fieldnames(prod_file))
+
+        # Create a set of test IDs for much faster lookup; only the key tuples (or their fingerprints) are kept
+        testIds = KeyHashSet() if low_memory else set()
+        testCount = 0
+        for testRow in load_records(test_file):
+            testCount += 1
+            testId = testRow.key
+        
+            # Check for duplicates in test data
+            if testId in testIds:
+                print(f"WARNING: Duplicate TEST ID found: \"xfdcawkFilename\":\"{testRow.filename}\", \"xfdcawkFiscalyear\":\"{testRow.fiscalyear}\" at row {testRow.row_number}")
+            else:
+                testIds.add(testId)
+    
+        print(f"Test file: {testCount} rows, {len(testIds)} unique IDs")
+    
+        totalCount = 0
+        diffCount = 0
+        prodIds = KeyHashSet() if low_memory else set()  # Track prod IDs for duplicate detection
+
+        for prodRow in load_records(prod_file):
+            totalCount += 1
+            prodId = prodRow.key
+        
+            # Check for duplicates in prod data
+            if prodId in prodIds:
+                print(f"WARNING: Duplicate PROD ID found: \"xfdcawkFilename\":\"{prodRow.filename}\", \"xfdcawkFiscalyear\":\"{prodRow.fiscalyear}\" at row {prodRow.row_number}")
+            else:
+                prodIds.add(prodId)
+        
+            # Check if this prod ID exists in test (much faster with set lookup)
+            if prodId not in testIds:
+                print(f"Row {prodRow.row_number}: PROD ID='{key_string(prodId)}' (missing in test)")
+                diffData.writerow(prodRow.values)
+                diffCount += 1
+    
+        print(f"Prod file: {totalCount} rows, {len(prodIds)} unique IDs")
+        print(f"Differences found: {diffCount} out of {totalCount} total rows")
+    
+        # Additional validation
+        if len(prodIds) != totalCount:
+            print(f"WARNING: Found {totalCount - len(prodIds)} duplicate IDs in PROD file")
+    
+        if len(testIds) != testCount:
+            print(f"WARNING: Found {testCount - len(testIds)} duplicate IDs in TEST file")
+    
+        expected_diff = len(prodIds) - len(testIds)
+        print(f"Expected differences based on unique IDs: {expected_diff}")
+    
+        if diffCount != expected_diff:
+            print(f"MISMATCH: Found {diffCount} differences but expected {expected_diff}")
+            print("This suggests there might be duplicate IDs or other data issues.")
+
+        if low_memory:
+            print(describe_memory("TEST", testIds))
+            print(describe_memory("PROD", prodIds))
+
+
+def compare_snapshots(prod_snapshot, test_snapshot, diff_file=None, low_memory=False):
+    """Columnar compare: reads only the key columns, then full PROD rows just for the differences"""
+    diff_file = diff_file or csv_path('xdcawk_2025_diff.csv')
+    key_columns = list(KEY_FIELDS)
 
     # Create a set of test IDs for much faster lookup
-    testIds = set()
+    testIds = KeyHashSet() if low_memory else set()
     testCount = 0
-    for i, testRow in enumerate(testData):
+    for i, (filename, fiscalyear) in enumerate(iter_rows(test_snapshot, key_columns)):
         testCount += 1
-        testId = testRow['xfdcawkFilename'] + '|' + testRow['xfdcawkFiscalyear']
-
-        testId = testId.strip()  # Remove whitespace
-        
-        # Check for duplicates in test data
+        testId = record_key(filename, fiscalyear)
         if testId in testIds:
-            print(f"WARNING: Duplicate TEST ID found: \"xfdcawkFilename\":\"{testRow['xfdcawkFilename']}\", \"xfdcawkFiscalyear\":\"{testRow['xfdcawkFiscalyear']}\" at row {i+1}")
+            print(f"WARNING: Duplicate TEST ID found: \"xfdcawkFilename\":\"{filename}\", \"xfdcawkFiscalyear\":\"{fiscalyear}\" at row {i+1}")
         else:
             testIds.add(testId)
-    
+
     print(f"Test file: {testCount} rows, {len(testIds)} unique IDs")
-    
-    totalCount = 0
-    diffCount = 0
-    prodIds = set()  # Track prod IDs for duplicate detection
 
-    for i, prodRow in enumerate(prodData):
+    totalCount = 0
+    diffRows = []
+    prodIds = KeyHashSet() if low_memory else set()
+    for i, (filename, fiscalyear) in enumerate(iter_rows(prod_snapshot, key_columns)):
         totalCount += 1
-        prodId = prodRow['xfdcawkFilename'] + '|' + prodRow['xfdcawkFiscalyear']
-        prodId = prodId.strip()  # Remove whitespace
-        
-        # Check for duplicates in prod data
+        prodId = record_key(filename, fiscalyear)
         if prodId in prodIds:
-            print(f"WARNING: Duplicate PROD ID found: \"xfdcawkFilename\":\"{prodRow['xfdcawkFilename']}\", \"xfdcawkFiscalyear\":\"{prodRow['xfdcawkFiscalyear']}\" at row {i+1}")
+            print(f"WARNING: Duplicate PROD ID found: \"xfdcawkFilename\":\"{filename}\", \"xfdcawkFiscalyear\":\"{fiscalyear}\" at row {i+1}")
         else:
             prodIds.add(prodId)
-        
-        # Check if this prod ID exists in test (much faster with set lookup)
         if prodId not in testIds:
-            print(f"Row {i+1}: PROD ID='{prodId}' (missing in test)")
-            diffData.writerow(prodRow)
-            diffCount += 1
-    
+            print(f"Row {i+1}: PROD ID='{key_string(prodId)}' (missing in test)")
+            diffRows.append(i)
+
+    # Only the row groups holding differences are decoded in full
+    fieldnames, _ = read_schema(prod_snapshot)
+    with open_csv(diff_file, 'w') as diffFile:
+        diffData = csv.writer(diffFile)
+        diffData.writerow(fieldnames)
+        for _, row in read_rows_at(prod_snapshot, diffRows):
+            diffData.writerow(row)
+
+    diffCount = len(diffRows)
     print(f"Prod file: {totalCount} rows, {len(prodIds)} unique IDs")
     print(f"Differences found: {diffCount} out of {totalCount} total rows")
-    
-    # Additional validation
+
     if len(prodIds) != totalCount:
         print(f"WARNING: Found {totalCount - len(prodIds)} duplicate IDs in PROD file")
-    
+
     if len(testIds) != testCount:
         print(f"WARNING: Found {testCount - len(testIds)} duplicate IDs in TEST file")
-    
+
     expected_diff = len(prodIds) - len(testIds)
     print(f"Expected differences based on unique IDs: {expected_diff}")
-    
+
     if diffCount != expected_diff:
         print(f"MISMATCH: Found {diffCount} differences but expected {expected_diff}")
         print("This suggests there might be duplicate IDs or other data issues.")
 
+    if low_memory:
+        print(describe_memory("TEST", testIds))
+        print(describe_memory("PROD", prodIds))
+
+def compare_artifacts(prod_file, test_file, diff_file, columnar=False, low_memory=False):
+    """Compare one PROD/TEST pair, using their columnar snapshots when requested, present and current"""
+    prod_file, test_file = find_csv(prod_file), find_csv(test_file)
+    if columnar:
+        pairs = [(snapshot_path(prod_file), prod_file), (snapshot_path(test_file), test_file)]
+        missing = [snapshot for snapshot, _ in pairs if not os.path.exists(snapshot)]
+        stale = [snapshot for snapshot, csv_file in pairs
+                 if snapshot not in missing and not snapshot_is_current(snapshot, csv_file)]
+        if not missing and not stale:
+            print(f"📦 Comparing columnar snapshots {pairs[0][0]} and {pairs[1][0]}")
+            compare_snapshots(pairs[0][0], pairs[1][0], diff_file, low_memory)
+            return
+        if missing:
+            print("⚠️  Columnar snapshots not found; comparing the CSV files instead")
+        else:
+            print(f"⚠️  {', '.join(stale)} older than its CSV; comparing the CSV files instead")
+    compare_files(prod_file, test_file, diff_file, low_memory)
+
+def compare_partitions(names, columnar=False, low_memory=False):
+    """Diff each PROD/TEST partition pair independently into its own diff file"""
+    for name in names:
+        prod_file = find_csv(partition_path('xdcawk_2025_prod.csv', name))
+        test_file = find_csv(partition_path('xdcawk_2025_test.csv', name))
+        print(f"\n=== PARTITION {name} ===")
+        missing = [path for path in (prod_file, test_file) if not os.path.exists(path)]
+        if missing:
+            print(f"⚠️  Skipping partition {name}: {', '.join(missing)} not found")
+            continue
+        compare_artifacts(prod_file, test_file, partition_path('xdcawk_2025_diff.csv', name), columnar, low_memory)
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Compare PROD and TEST DCA extracts")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    parser.add_argument('--columnar', action='store_true',
+                        help="compare the .dcol snapshots (reads only the key columns) when present")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="match keys by 128-bit fingerprint in compact hash tables instead of exact "
+                             "Python sets (fingerprint collisions are not re-checked)")
+    parser.add_argument('--partitioned', action='store_true',
+                        help="compare every partition extracted for both PROD and TEST")
+    add_partition_arguments(parser)
+    return parser.parse_args()
+
+def main(args):
+    with Profiler(enabled=args.profile).stage('compare'):
+        partitions = [partition.name for partition in partitions_from_args(args)]
+        if args.partitioned and not partitions:
+            test_partitions = set(discover_partitions('xdcawk_2025_test.csv'))
+            partitions = [name for name in discover_partitions('xdcawk_2025_prod.csv') if name in test_partitions]
+            if not partitions:
+                print("⚠️  No partitions found in both PROD and TEST")
+        if partitions:
+            compare_partitions(partitions, args.columnar, args.low_memory)
+        elif not args.partitioned:
+            compare_artifacts('xdcawk_2025_prod.csv', 'xdcawk_2025_test.csv', csv_path('xdcawk_2025_diff.csv'),
+                              args.columnar, args.low_memory)
+
+    print("Comparison complete!")
 
-print("Comparison complete!")
\ No newline at end of file
+if __name__ == "__main__":
+    # A running dca_daemon.py answers from its warm record cache
+    exit_code = forward_to_daemon('compare', sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+    main(parse_args())
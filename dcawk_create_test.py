@@ -1,13 +1,33 @@
 #from college_records import college_records_list 
 #import cbas_module
+import argparse
 import requests
 import csv
 from collections import Counter
 import datetime
 import math
 import json
+from dca_metrics import MetricsRecorder
+from dca_profile import Profiler
+from dca_trace import Tracer
+from dca_io import find_csv, open_csv
+from dca_records import key_string, record_key
+from dca_ratelimit import RateLimiter
+from dca_transport import TransportStats, TunedSession
 
-def get_token(api_key):
+# Per-request metrics for this load (written after the last POST)
+METRICS = MetricsRecorder('create_test')
+
+# Disabled unless --trace is given
+TRACER = Tracer()
+
+# Host-wide TEST request budget shared with the extraction scripts
+RATE_LIMITER = RateLimiter('test')
+
+# Requests, connections opened/reused and wire bytes of the load session
+TRANSPORT = TransportStats()
+
+def get_token(api_key, session=None):
     # Set the URL of the login page
     url = f"https://integrate.elluciancloud.com/auth"
 
@@ -18,7 +38,11 @@ def get_token(api_key):
 
     # Send the login request and store the response
     #response = requests.post(url, json=data, headers=headers)
-    response = requests.post(url, headers=headers)
+    requester = session if session else requests
+    RATE_LIMITER.configure('test', api_key)
+    with METRICS.track('get_token') as sample, TRACER.span('get_token'):
+        response = RATE_LIMITER.send(lambda: requester.post(url, headers=headers), sample=sample)
+        sample.observe_response(response)
     # Get the JSON response body
     #print(response.text)
     #json_response = response.json()
@@ -27,7 +51,7 @@ def get_token(api_key):
     awt_token = response.text
     return awt_token
 
-def post_xfdcawk(data, bearer_token):
+def post_xfdcawk(data, bearer_token, session=None):
 
     url = "https://integrate.elluciancloud.com/api/x-xfdcawk"
 
@@ -37,57 +61,105 @@ def post_xfdcawk(data, bearer_token):
     #headers = {"Authorization": f"Bearer {token}"}
     headers = {'content-type' : 'application/json', 'Accept' : 'application/json', "Authorization": f"Bearer {bearer_token}"}
 
-    response = requests.post(url, headers=headers, data=data)
+    # Use provided session (one keep-alive connection for the whole load) or requests module
+    requester = session if session else requests
+
+    with METRICS.track('post_xfdcawk') as sample, TRACER.span('post_xfdcawk'):
+        response = RATE_LIMITER.send(lambda: requester.post(url, headers=headers, data=data), sample=sample)
+        sample.observe_response(response)
+        # A rejected POST must be journaled as failed, not as done with an empty id
+        response.raise_for_status()
 
     #print(response.json())  
     return response.json()
 
-total_count = 0
 read_directory_in_str = "./"
 read_file = "xdcawk_2025_diff.csv"
+# One line per POST with the id TEST assigned; dca_verify.py checks the latest run
+load_journal = "dca_load_journal.jsonl"
 csv_header = ["xfdcawkAltbranch","xfdcawkBankacct","xfdcawkBankcity","xfdcawkBankname","xfdcawkBranch","xfdcawkCaprefund","xfdcawkCreatedon","xfdcawkCurrefund","xfdcawkDcasubmitted","xfdcawkDepaddoper",
                 "xfdcawkDepdate","xfdcawkDepno","xfdcawkErrormessage","xfdcawkErrorstatus","xfdcawkFilename","xfdcawkFiscalperiod","xfdcawkFiscalyear","xfdcawkFiscalyearendon",
                 "xfdcawkFiscalyearstarton","xfdcawkInstname","xfdcawkIsjvprocesseddate","xfdcawkIsprocessed","xfdcawkIsprocesseddate","xfdcawkJvnumber","xfdcawkKeyeddate",
                 "xfdcawkNspsubmitted","xfdcawkPyrlrefund","xfdcawkRecdate","xfdcawkTotaldep","xfdcawkTotalrev","id"]
 
 
-todays_date_str = str(datetime.datetime.now().strftime('%Y-%m-%d'))
-#print(todays_date_str)
-
-with open(f"{read_directory_in_str}{read_file}", newline='') as f:
-    reader = csv.reader(f)
-    data = list(reader)
-
-    for idx, line in enumerate(data): 
-            bearer_token = get_token("88ca9670-45d2-4385-a6e1-de1aa1de750d") #TEST
-            '''
-            if idx%100 == 0: #refresh token every 100 records
-                bearer_token = get_token("88ca9670-45d2-4385-a6e1-de1aa1de750d") #TEST
-                #bearer_token = get_token("dec4f29a-1f79-4b01-9efd-4265155d9de7") #PPRD 
-                print(f"Refreshing token at {idx}")   
-            '''
-            #skip header line             
-            if idx == 0:
-                 continue                 
-            total_count += 1 
-            dcawk_json = dict(zip(csv_header, line))
-            #remove JV fields and set id to NULL
-            del dcawk_json["xfdcawkJvnumber"]
-            del dcawk_json["xfdcawkIsjvprocesseddate"]
-            dcawk_json['id'] = '00000000-0000-0000-0000-000000000000'
-            dcawk_json['xfdcawkCreatedon'] = todays_date_str            
-            json_string = json.dumps(dcawk_json) 
-            #print(json_string)
-            if 1 == 1:
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="POST the records in the diff CSV to the TEST environment")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write a Chrome trace-event JSON timeline of this run to FILE")
+    return parser.parse_args()
+
+def main():
+    """POST every record in the diff CSV to TEST"""
+    total_count = 0
+    todays_date_str = str(datetime.datetime.now().strftime('%Y-%m-%d'))
+    run = datetime.datetime.now().isoformat(timespec='seconds')
+    journal = open(load_journal, 'a')
+    # The POSTs are sequential, so one pooled connection is enough
+    session = TunedSession(pool_size=1, stats=TRANSPORT)
+    #print(todays_date_str)
+
+    with open_csv(find_csv(f"{read_directory_in_str}{read_file}")) as f:
+        reader = csv.reader(f)
+        data = list(reader)
+
+        for idx, line in enumerate(data): 
+                bearer_token = get_token("88ca9670-45d2-4385-a6e1-de1aa1de750d", session) #TEST
+                '''
+                if idx%100 == 0: #refresh token every 100 records
+                    bearer_token = get_token("88ca9670-45d2-4385-a6e1-de1aa1de750d") #TEST
+                    #bearer_token = get_token("dec4f29a-1f79-4b01-9efd-4265155d9de7") #PPRD 
+                    print(f"Refreshing token at {idx}")   
+                '''
+                #skip header line             
+                if idx == 0:
+                     continue                 
+                total_count += 1 
+                dcawk_json = dict(zip(csv_header, line))
+                entry = {'run': run, 'op': 'POST',
+                         'key': key_string(record_key(dcawk_json['xfdcawkFilename'], dcawk_json['xfdcawkFiscalyear']))}
+                #remove JV fields and set id to NULL
+                del dcawk_json["xfdcawkJvnumber"]
+                del dcawk_json["xfdcawkIsjvprocesseddate"]
+                dcawk_json['id'] = '00000000-0000-0000-0000-000000000000'
+                dcawk_json['xfdcawkCreatedon'] = todays_date_str            
+                json_string = json.dumps(dcawk_json) 
                 #print(json_string)
-                try:
-                    post_response = post_xfdcawk(json_string, bearer_token)		
-                    print(post_response)		
-                except Exception as e:
-                    print(f"error {e} with record {json_string}")
-            #print(line) 
-print(f"total count={total_count}")
-f.close()
+                if 1 == 1:
+                    #print(json_string)
+                    try:
+                        post_response = post_xfdcawk(json_string, bearer_token, session)		
+                        print(post_response)		
+                        entry.update(status='done', id=post_response.get('id', ''))
+                    except Exception as e:
+                        print(f"error {e} with record {json_string}")
+                        entry.update(status='failed', error=str(e))
+                    entry['at'] = datetime.datetime.now().isoformat(timespec='seconds')
+                    journal.write(json.dumps(entry) + "\n")
+                    journal.flush()
+                #print(line) 
+    print(f"total count={total_count}")
+    f.close()
+    journal.close()
+    session.close()
+    print(f"📒 Load journal: {load_journal}")
+
+    TRANSPORT.print_summary()
+    RATE_LIMITER.print_summary()
+    METRICS.print_summary()
+    json_file, prom_file = METRICS.write()
+    print(f"📈 Metrics written to {json_file} and {prom_file}")
+
+if __name__ == "__main__":
+    args = parse_args()
+    TRACER.enabled = bool(args.trace)
+    with Profiler(enabled=args.profile).stage('create_test'):
+        main()
+    if args.trace:
+        TRACER.write(args.trace)
 
 '''
 TEST INSERT BODY FOR BRUNO CALL
@@ -1,5 +1,6 @@
 #from college_records import college_records_list 
 #import cbas_module
+import argparse
 import requests
 import csv
 from collections import Counter
@@ -10,6 +11,38 @@ import sys
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
+from dca_metrics import MetricsRecorder
+from dca_profile import Profiler
+from dca_trace import Tracer
+from dca_io import csv_path, open_csv
+from dca_columnar import ColumnarWriter, snapshot_path
+from dca_partitions import add_partition_arguments, criteria_param, extract_partitions, partitions_from_args
+from dca_records import CSV_HEADER
+from dca_cache import PageCache, add_cache_arguments, configure_cache
+from dca_ratelimit import RateLimiter
+from dca_daemon import forward_to_daemon
+from dca_transport import TransportStats, session_scope
+
+# Per-request metrics for this run (written at the end of main)
+METRICS = MetricsRecorder('test')
+
+# Disabled unless --profile is given
+PROFILER = Profiler()
+
+# Disabled unless --trace is given
+TRACER = Tracer()
+
+# Disabled unless --cache is given
+PAGE_CACHE = PageCache()
+
+# Host-wide request budget shared with every other Ethos script (tenant bucket added in main)
+RATE_LIMITER = RateLimiter('test')
+
+# Concurrent page requests; the session pool holds one keep-alive connection per worker
+MAX_WORKERS = 5
+
+# Requests, connections opened/reused and wire bytes of the page sessions
+TRANSPORT = TransportStats()
 
 def load_api_config():
     """Load API configuration from JSON file"""
@@ -69,17 +102,21 @@ def get_token(api_key):
     headers = {'Authorization' : 'Basic ' + api_key, 'Content-Type' : 'text/plain'}
     
     try:
-        response = requests.post(url, headers=headers, timeout=30)
-        response.raise_for_status()
+        with METRICS.track('get_token') as sample, TRACER.span('get_token'):
+            response = RATE_LIMITER.send(lambda: requests.post(url, headers=headers, timeout=30), sample=sample)
+            sample.observe_response(response)
+            response.raise_for_status()
         return response.text
     except requests.exceptions.RequestException as e:
         print(f"❌ Failed to get authentication token: {e}")
         sys.exit(1)
 
-def query_table(offset, bearer_token, session=None):
+def query_table(offset, bearer_token, session=None, criteria=None):
     """Query table with session reuse and error handling"""
     url = "https://integrate.elluciancloud.com/api/x-xfdcawk"
     querystring = {"limit": "1000", "offset": f"{str(offset*1000)}"}
+    if criteria:
+        querystring["criteria"] = criteria_param(criteria)
     headers = {
         'content-type': 'application/json', 
         'Accept': 'application/json', 
@@ -89,17 +126,32 @@ def query_table(offset, bearer_token, session=None):
     # Use provided session or requests module
     requester = session if session else requests
     
+    def send(extra_headers):
+        with METRICS.track('query_table') as sample, TRACER.span('page_request', offset=offset*1000):
+            response = RATE_LIMITER.send(lambda: requester.get(url, headers=dict(headers, **extra_headers),
+                                                               params=querystring, timeout=60),
+                                         sample=sample)
+            sample.observe_response(response)
+            response.raise_for_status()
+        return response
+
+    cache_key = PAGE_CACHE.key('test', 'x-xfdcawk', querystring)
     try:
-        response = requester.get(url, headers=headers, params=querystring, timeout=60)
-        response.raise_for_status()
-        print(f"✅ Retrieved 1,000 records starting at {str(offset*1000)}")
-        return response.json()
+        body, source = PAGE_CACHE.fetch(cache_key, send)
+        print(f"✅ Retrieved 1,000 records starting at {str(offset*1000)}" + ("" if source == 'network' else f" ({source})"))
+        with TRACER.span('decode', offset=offset*1000):
+            return json.loads(body)
     except requests.exceptions.RequestException as e:
         print(f"❌ Failed to retrieve records at offset {offset*1000}: {e}")
         return None
+    except ValueError as e:
+        # Truncated or non-JSON body; drop it so a cached copy is not served again
+        PAGE_CACHE.discard(cache_key)
+        print(f"❌ Invalid JSON in records at offset {offset*1000}: {e}")
+        return None
 
-def query_count(bearer_token):
-    """Query total count with error handling"""
+def query_count(bearer_token, criteria=None):
+    """Query total count (optionally of one partition) with error handling"""
     url = "https://integrate.elluciancloud.com/api/x-xfdcawk"
     headers = {
         'content-type': 'application/json', 
@@ -108,8 +160,12 @@ def query_count(bearer_token):
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
+        with METRICS.track('query_count') as sample, TRACER.span('query_count'):
+            params = {"criteria": criteria_param(criteria)} if criteria else None
+            response = RATE_LIMITER.send(lambda: requests.get(url, headers=headers, params=params, timeout=30),
+                                         sample=sample)
+            sample.observe_response(response)
+            response.raise_for_status()
         return int(response.headers['x-total-count'])
     except requests.exceptions.RequestException as e:
         print(f"❌ Failed to get record count: {e}")
@@ -161,23 +217,79 @@ def process_record(line):
         safe_get_field(line, 'id')
     ]
 
-def fetch_batch(offset, bearer_token, session):
+def fetch_batch(offset, bearer_token, session, criteria=None):
     """Fetch a single batch of records"""
-    response_data = query_table(offset, bearer_token, session)
+    response_data = query_table(offset, bearer_token, session, criteria)
     if response_data:
-        return [process_record(line) for line in response_data]
+        with TRACER.span('row_build', offset=offset*1000):
+            return [process_record(line) for line in response_data]
     return []
 
-def main():
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Extract test x-xfdcawk records to CSV")
+    parser.add_argument('--profile', action='store_true',
+                        help="capture cProfile/tracemalloc stats for this run")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write a Chrome trace-event JSON timeline of this run to FILE")
+    parser.add_argument('--columnar', action='store_true',
+                        help="also write a columnar .dcol snapshot alongside the CSV")
+    add_partition_arguments(parser)
+    add_cache_arguments(parser)
+    return parser.parse_args()
+
+def extract_partitioned(bearer_token, partitions, columnar, start_time, session=None):
+    """Fetch each partition with a server-side filter through one shared pool, one CSV per partition"""
+    print(f"🧩 Extracting {len(partitions)} partition(s): {', '.join(p.name for p in partitions)}")
+    with session_scope(session, MAX_WORKERS, TRANSPORT) as session:
+        session.headers.update({
+            'content-type': 'application/json',
+            'Accept': 'application/json',
+            'Authorization': f'Bearer {bearer_token}'
+        })
+        results = extract_partitions(
+            partitions, "xdcawk_2025_test.csv", CSV_HEADER,
+            count_records=lambda criteria: query_count(bearer_token, criteria),
+            fetch_batch=lambda page, criteria: fetch_batch(page, bearer_token, session, criteria),
+            max_workers=MAX_WORKERS, columnar=columnar, tracer=TRACER, wrap=PROFILER.wrap)
+
+    record_count = sum(records for _, _, records, _ in results)
+    failed_batches = sum(failed for _, _, _, failed in results)
+    duration = time.time() - start_time
+    print(f"\n🎉 TEST partitioned query completed!")
+    print(f"📊 Total records processed: {record_count}")
+    for partition, write_file, records, failed in results:
+        incomplete = f", {failed} batch(es) missing" if failed else ""
+        print(f"📁 {partition.name}: {write_file} ({records} records{incomplete})")
+    print(f"⏱️  Total time: {duration:.2f} seconds")
+    print(f"🚀 Average speed: {record_count/duration:.1f} records/second")
+
+    PAGE_CACHE.print_summary()
+    TRANSPORT.print_summary()
+    RATE_LIMITER.print_summary()
+    METRICS.print_summary()
+    json_file, prom_file = METRICS.write()
+    print(f"📈 Metrics written to {json_file} and {prom_file}")
+    if failed_batches:
+        print(f"❌ {failed_batches} batch(es) could not be fetched; the partition files are incomplete")
+        sys.exit(1)
+
+def main(columnar=False, partitions=None, api_key=None, bearer_token=None, session=None):
     """Main execution function with performance optimizations"""
     print(f"🚀 Starting TEST Data Query...")
     start_time = time.time()
     
-    # Get test API key
-    api_key = get_api_key()
-    bearer_token = get_token(api_key)
+    # Get test API key (dca_daemon.py passes the key and token it has already checked)
+    if bearer_token is None:
+        api_key = api_key or get_api_key()
+        RATE_LIMITER.configure('test', api_key)
+        bearer_token = get_token(api_key)
     print("✅ Authentication successful")
     
+    if partitions:
+        extract_partitioned(bearer_token, partitions, columnar, start_time, session)
+        return
+    
     # Get total count
     total_count = query_count(bearer_token)
     offset = math.ceil(int(total_count) / 1000)
@@ -185,7 +297,7 @@ def main():
     print(f"📦 Batches to fetch: {offset}")
     
     # Setup CSV file for test
-    write_file = f"xdcawk_2025_test.csv"
+    write_file = csv_path("xdcawk_2025_test.csv")
     csv_header = [
         "xfdcawkAltbranch", "xfdcawkBankacct", "xfdcawkBankcity", "xfdcawkBankname", 
         "xfdcawkBranch", "xfdcawkCaprefund", "xfdcawkCreatedon", "xfdcawkCurrefund", 
@@ -197,14 +309,16 @@ def main():
         "xfdcawkPyrlrefund", "xfdcawkRecdate", "xfdcawkTotaldep", "xfdcawkTotalrev", "id"
     ]
     
-    with open(write_file, 'w', newline='') as f_write:
+    with open_csv(write_file, 'w') as f_write:
         csvwrite = csv.writer(f_write)
         csvwrite.writerow(csv_header)
+        columnar_writer = ColumnarWriter(snapshot_path(write_file), csv_header) if columnar else None
         
         record_count = 0
+        failed_batches = []
         
-        # Use session for connection pooling
-        with requests.Session() as session:
+        # Use session for connection pooling (the daemon's warm one when it runs this)
+        with session_scope(session, MAX_WORKERS, TRANSPORT) as session:
             # Configure session for better performance
             session.headers.update({
                 'content-type': 'application/json',
@@ -218,44 +332,59 @@ def main():
                 for i in range(offset):
                     batch_rows = fetch_batch(i, bearer_token, session)
                     if batch_rows:
-                        csvwrite.writerows(batch_rows)
+                        with TRACER.span('csv_write', batch=i):
+                            csvwrite.writerows(batch_rows)
+                            if columnar_writer:
+                                columnar_writer.writerows(batch_rows)
                         record_count += len(batch_rows)
                         print(f"✅ Processed batch {i+1}/{offset} ({len(batch_rows)} records)")
                     else:
+                        failed_batches.append(i)
                         print(f"⚠️  Skipped batch {i+1} due to error")
             
             # Option 2: Parallel processing (faster for large datasets)
             else:
                 print("🚀 Using parallel processing...")
-                max_workers = min(5, offset)  # Limit concurrent requests
+                max_workers = min(MAX_WORKERS, offset)  # Limit concurrent requests
                 
                 with ThreadPoolExecutor(max_workers=max_workers) as executor:
                     # Submit all batch requests
                     future_to_offset = {
-                        executor.submit(fetch_batch, i, bearer_token, session): i 
+                        executor.submit(PROFILER.wrap(fetch_batch), i, bearer_token, session): i 
                         for i in range(offset)
                     }
                     
                     # Process completed batches in order
                     batch_results = {}
-                    for future in as_completed(future_to_offset):
-                        batch_offset = future_to_offset[future]
-                        try:
-                            batch_rows = future.result()
-                            if batch_rows:
-                                batch_results[batch_offset] = batch_rows
-                                print(f"✅ Fetched batch {batch_offset+1}/{offset} ({len(batch_rows)} records)")
-                            else:
-                                print(f"⚠️  Failed to fetch batch {batch_offset+1}")
-                        except Exception as e:
-                            print(f"❌ Error in batch {batch_offset+1}: {e}")
+                    with TRACER.span('await_batches'):
+                        for future in as_completed(future_to_offset):
+                            batch_offset = future_to_offset[future]
+                            try:
+                                batch_rows = future.result()
+                                if batch_rows:
+                                    batch_results[batch_offset] = batch_rows
+                                    print(f"✅ Fetched batch {batch_offset+1}/{offset} ({len(batch_rows)} records)")
+                                else:
+                                    failed_batches.append(batch_offset)
+                                    print(f"⚠️  Failed to fetch batch {batch_offset+1}")
+                            except Exception as e:
+                                failed_batches.append(batch_offset)
+                                print(f"❌ Error in batch {batch_offset+1}: {e}")
                     
                     # Write batches in order
                     for i in range(offset):
                         if i in batch_results:
-                            csvwrite.writerows(batch_results[i])
+                            with TRACER.span('csv_write', batch=i):
+                                csvwrite.writerows(batch_results[i])
+                                if columnar_writer:
+                                    columnar_writer.writerows(batch_results[i])
                             record_count += len(batch_results[i])
     
+    # Finished after the CSV is closed, so a current snapshot is never older than its CSV
+    if columnar_writer:
+        columnar_writer.close()
+        print(f"📦 Columnar snapshot: {columnar_writer.path}")
+    
     # Performance summary
     end_time = time.time()
     duration = end_time - start_time
@@ -266,106 +395,36 @@ def main():
     print(f"⏱️  Total time: {duration:.2f} seconds")
     print(f"🚀 Average speed: {record_count/duration:.1f} records/second")
 
+    # Per-request metrics
+    PAGE_CACHE.print_summary()
+    TRANSPORT.print_summary()
+    RATE_LIMITER.print_summary()
+    METRICS.print_summary()
+    json_file, prom_file = METRICS.write()
+    print(f"📈 Metrics written to {json_file} and {prom_file}")
+    # A partial extract must not pass for a finished stage (dca_workflow.py records it as current)
+    if failed_batches:
+        print(f"❌ {len(failed_batches)} batch(es) could not be fetched; {write_file} is incomplete")
+        sys.exit(1)
+
 if __name__ == "__main__":
-    main()
+    # A plain run is handed to a running dca_daemon.py, which runs main() with its warm session
+    if len(sys.argv) == 1:
+        exit_code = forward_to_daemon('extract', ['test'])
+        if exit_code is not None:
+            sys.exit(exit_code)
+    args = parse_args()
+    PROFILER.enabled = args.profile
+    TRACER.enabled = bool(args.trace)
+    configure_cache(PAGE_CACHE, args)
+    with PROFILER.stage('test_query'):
+        main(columnar=args.columnar, partitions=partitions_from_args(args))
+    if args.trace:
+        TRACER.write(args.trace)
 
 # Legacy code for backward compatibility (will be removed)
 # Keeping the old variables for any scripts that might import them
 april_count = 0
 april_string = "2025-04"
 june_string = "2025-06"
-july_string = "2025-07"
-
-
-
-def query_count(bearer_token):
-
-    url = "https://integrate.elluciancloud.com/api/x-xfdcawk"
-
-    querystring = {}
-
-    headers = {'content-type' : 'application/json', 'Accept' : 'application/json', "Authorization": f"Bearer {bearer_token}"}
-
-    response = requests.get(url, headers=headers, params=querystring)
-
-    return response.headers['x-total-count']
-
-april_count = 0
-april_string = "2025-04"
-june_string = "2025-06"
-july_string = "2025-07"
-bearer_token = get_token("88ca9670-45d2-4385-a6e1-de1aa1de750d") #TEST
-
-total_count = query_count(bearer_token)
-offset = math.ceil(int(total_count)/1000)
-print(f"total count={total_count}")
-print(f"offset={str(offset)}")
-
-write_directory_in_str = "./"
-write_file = "xdcawk_2025_test.csv"
-csv_header = ["xfdcawkAltbranch","xfdcawkBankacct","xfdcawkBankcity","xfdcawkBankname","xfdcawkBranch","xfdcawkCaprefund","xfdcawkCreatedon","xfdcawkCurrefund","xfdcawkDcasubmitted","xfdcawkDepaddoper",
-                "xfdcawkDepdate","xfdcawkDepno","xfdcawkErrormessage","xfdcawkErrorstatus","xfdcawkFilename","xfdcawkFiscalperiod","xfdcawkFiscalyear","xfdcawkFiscalyearendon",
-                "xfdcawkFiscalyearstarton","xfdcawkInstname","xfdcawkIsjvprocesseddate","xfdcawkIsprocessed","xfdcawkIsprocesseddate","xfdcawkJvnumber","xfdcawkKeyeddate",
-                "xfdcawkNspsubmitted","xfdcawkPyrlrefund","xfdcawkRecdate","xfdcawkTotaldep","xfdcawkTotalrev","id"]
-
-
-f_write = open(f"{write_directory_in_str}{write_file}", 'w', newline='') 
-csvwrite = csv.writer(f_write)  
-csvwrite.writerow(csv_header)
-
-for i in range(offset):
-    query_data = query_table(i, bearer_token)
-    for line in query_data:
-        april_count += 1
-        try:
-            xfdcawkAltbranch = 	line['xfdcawkAltbranch']
-        except Exception as e:
-            xfdcawkAltbranch = 	""
-        xfdcawkBankacct = 	line['xfdcawkBankacct']
-        xfdcawkBankcity = 	line['xfdcawkBankcity']
-        xfdcawkBankname = 	line['xfdcawkBankname']
-        xfdcawkBranch = 	line['xfdcawkBranch']
-        xfdcawkCaprefund = 	line['xfdcawkCaprefund']
-        xfdcawkCreatedon = 	line['xfdcawkCreatedon']
-        xfdcawkCurrefund = 	line['xfdcawkCurrefund']
-        xfdcawkDcasubmitted = 	line['xfdcawkDcasubmitted']
-        xfdcawkDepaddoper = 	line['xfdcawkDepaddoper']
-        xfdcawkDepdate = 	line['xfdcawkDepdate']
-        xfdcawkDepno = 	line['xfdcawkDepno']
-        try:
-            xfdcawkErrormessage = 	line['xfdcawkErrormessage']
-        except Exception as e:
-            xfdcawkErrormessage = 	""
-        xfdcawkErrorstatus = 	line['xfdcawkErrorstatus']
-        xfdcawkFilename = 	line['xfdcawkFilename']
-        try:
-            xfdcawkFiscalperiod = 	line['xfdcawkFiscalperiod']
-        except Exception as e:
-            xfdcawkFiscalperiod = 	""
-        xfdcawkFiscalyear = 	line['xfdcawkFiscalyear']
-        xfdcawkFiscalyearendon = 	line['xfdcawkFiscalyearendon']
-        xfdcawkFiscalyearstarton = 	line['xfdcawkFiscalyearstarton']
-        xfdcawkInstname = 	line['xfdcawkInstname']
-        try:
-            xfdcawkIsjvprocesseddate = 	line['xfdcawkIsjvprocesseddate']
-            xfdcawkJvnumber = 	line['xfdcawkJvnumber']
-        except Exception as e:
-            xfdcawkIsjvprocesseddate = 	""
-            xfdcawkJvnumber = 	""
-        xfdcawkIsprocessed = 	line['xfdcawkIsprocessed']
-        xfdcawkIsprocesseddate = 	line['xfdcawkIsprocesseddate']
-        xfdcawkKeyeddate = 	line['xfdcawkKeyeddate']
-        xfdcawkNspsubmitted = 	line['xfdcawkNspsubmitted']
-        xfdcawkPyrlrefund = 	line['xfdcawkPyrlrefund']
-        xfdcawkRecdate = 	line['xfdcawkRecdate']
-        xfdcawkTotaldep = 	line['xfdcawkTotaldep']
-        xfdcawkTotalrev = 	line['xfdcawkTotalrev']
-        xid =	line['id']
-        csv_line = [xfdcawkAltbranch,xfdcawkBankacct,xfdcawkBankcity,xfdcawkBankname,xfdcawkBranch,xfdcawkCaprefund,xfdcawkCreatedon,xfdcawkCurrefund,xfdcawkDcasubmitted,xfdcawkDepaddoper,
-            xfdcawkDepdate,xfdcawkDepno,xfdcawkErrormessage,xfdcawkErrorstatus,xfdcawkFilename,xfdcawkFiscalperiod,xfdcawkFiscalyear,xfdcawkFiscalyearendon,
-            xfdcawkFiscalyearstarton,xfdcawkInstname,xfdcawkIsjvprocesseddate,xfdcawkIsprocessed,xfdcawkIsprocesseddate,xfdcawkJvnumber,xfdcawkKeyeddate,
-            xfdcawkNspsubmitted,xfdcawkPyrlrefund,xfdcawkRecdate,xfdcawkTotaldep,xfdcawkTotalrev,xid]
-        csvwrite.writerow(csv_line)
-print(f"Count is {april_count}")
-
-f_write.close()
\ No newline at end of file
+july_string = "2025-07"
\ No newline at end of file